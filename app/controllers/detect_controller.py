@@ -0,0 +1,78 @@
+from __future__ import annotations
+import logging
+import os, time
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+from app.domain.models import Rect, RevisionDetection
+from app.services.revision_detection import build_consensus, pick_samples, sample_table_rows
+from app.worker import worker_context
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class DetectionJob:
+    executor: ProcessPoolExecutor
+    futures: List[Future]
+    started_at: float
+    tables: Optional[list] = None  # sampled tables, kept for rescoring
+
+
+class DetectController:
+    """Runs revision pattern detection on sampled PDFs in a background process pool."""
+
+    def start(
+        self,
+        pdf_paths: Sequence[Path],
+        clip: Rect,
+        first: Optional[Path] = None,
+        sample_size: Optional[int] = None,
+        first_page: int = 0,
+    ) -> DetectionJob:
+        """`first` is sampled on `first_page` (the page on screen), the others on page 0."""
+        samples = pick_samples(pdf_paths, sample_size, first)
+        workers = max(1, min(len(samples), (os.cpu_count() or 2) - 1))
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=worker_context())
+        futures = [
+            executor.submit(sample_table_rows, (p, tuple(clip), first_page if first is not None and i == 0 else 0))
+            for i, p in enumerate(samples)
+        ]
+        return DetectionJob(executor=executor, futures=futures, started_at=time.time())
+
+    def poll(self, job: DetectionJob) -> Optional[tuple[int, int]]:
+        """(done, total) while samples are still running; None once all are finished."""
+        done = sum(1 for f in job.futures if f.done())
+        if done < len(job.futures):
+            return (done, len(job.futures))
+        return None
+
+    def finish(self, job: DetectionJob) -> RevisionDetection:
+        tables = []
+        for f in job.futures:
+            try:
+                res = f.result(timeout=0)
+            except Exception:
+                continue
+            if res.get("ok") and res.get("rows"):
+                tables.append(res["rows"])
+            elif not res.get("ok"):
+                logger.warning("[DetectPattern] Sample failed: %s: %s", res.get("path"), res.get("error"))
+        try:
+            job.executor.shutdown(wait=False)
+        except Exception:
+            pass
+        job.tables = tables
+        return build_consensus(tables, samples_total=len(job.futures))
+
+    def rescore(self, job: DetectionJob, rev_idx: Optional[int]) -> RevisionDetection:
+        """Score the patterns again on another rev column (e.g. the one the user confirmed)."""
+        return build_consensus(job.tables or [], samples_total=len(job.futures), rev_idx=rev_idx)
+
+    def cancel(self, job: DetectionJob) -> None:
+        try:
+            job.executor.shutdown(wait=False, cancel_futures=True)
+        except Exception:
+            pass
@@ -1,93 +1,138 @@
 from __future__ import annotations
-import multiprocessing as mp, time
-from dataclasses import dataclass
+import queue, threading, time
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional, Iterable
+from typing import List, Optional
 
-from app.domain.models import ExtractionRequest
-from app.services.extraction_service import ExtractionService
-from app.infra.pdf_adapter import PdfAdapter
+from app.domain.events import ExtractionEvent, Failed, FileFailed, Finished, PhaseChanged, Progress, RunStarted, RunSummary
+from app.domain.models import ExtractionRequest, InlineResult
+from app.controllers.extraction_host import KEEP_HOST, ExtractionHost
+from app.services.extraction_service import ExtractionService, is_small_job
 
 
 @dataclass
 class ExtractionJob:
-    process: mp.Process
-    total_pages: mp.Value
-    progress: mp.Value
-    cancel_event: mp.Event
-    manager: mp.Manager
-    final_output_path: "mp.managers.ValueProxy[str]"
+    job_id: int
     started_at: float
+    processed: int = 0
+    total_pages: int = 0
+    phase: str = ""
+    resume_token: str = ""
+    output: str = ""
+    error: str = ""
+    done: bool = False
+    cancelled: bool = False
+    failures: List[FileFailed] = field(default_factory=list)
+    summary: List[str] = field(default_factory=list)
+    # events applied to the fields above, not yet handed to the GUI
+    pending: List[ExtractionEvent] = field(default_factory=list)
+    events: queue.Queue = field(default_factory=queue.Queue)
+    # small jobs: run on a thread of this process, rows kept in memory
+    thread: Optional[threading.Thread] = None
+    cancel_flag: threading.Event = field(default_factory=threading.Event)
+    inline: Optional[InlineResult] = None
 
-def _run_service(
-    req: ExtractionRequest,
-    progress: mp.Value,
-    total: mp.Value,
-    final_output_path: "mp.managers.ValueProxy[str]",
-    cancel_evt: mp.Event
-):
-    svc = ExtractionService()
-    pdf = PdfAdapter()
 
-    try:
-        total.value = sum(pdf.page_count(p) for p in req.pdf_paths)
-    except Exception:
-        total.value = 0
-
-    def on_progress(proc: int, tot: int):
-        progress.value = proc
+class ExtractController:
+    """
+    Sends runs to the session's extraction host (started once, pools kept warm);
+    small runs skip it and execute on a background thread of this process.
+    Either way the run reports through one stream of app.domain.events.
+    """
 
-    def should_cancel() -> bool:
-        return cancel_evt.is_set()
+    def __init__(self):
+        self.host = ExtractionHost()
 
-    out = svc.extract(req, on_progress=on_progress, should_cancel=should_cancel)
-    final_output_path.value = str(out)
+    def warm_up(self) -> None:
+        """Start the host early so the first Extract click finds warm workers."""
+        if KEEP_HOST:
+            try:
+                self.host.start()
+            except Exception:
+                pass
 
-class ExtractController:
     def start(self, req: ExtractionRequest) -> ExtractionJob:
-        progress = mp.Value('i', 0)
-        total = mp.Value('i', 0)
-        cancel_evt = mp.Event()
-        manager = mp.Manager()
-        final_out = manager.Value("s", "")
-
-        p = mp.Process(
-            target=_run_service,
-            args=(req, progress, total, final_out, cancel_evt),
-            daemon=False
-        )
-        p.start()
-
-        return ExtractionJob(
-            process=p,
-            total_pages=total,
-            progress=progress,
-            cancel_event=cancel_evt,
-            manager=manager,
-            final_output_path=final_out,
-            started_at=time.time(),
-        )
+        if is_small_job(req):
+            return self._start_inline(req)
+        job_id = self.host.submit(req)
+        return ExtractionJob(job_id=job_id, started_at=time.time())
+
+    def _start_inline(self, req: ExtractionRequest) -> ExtractionJob:
+        job = ExtractionJob(job_id=0, started_at=time.time())
+
+        def run():
+            try:
+                job.inline = ExtractionService().extract_inline(
+                    req, should_cancel=job.cancel_flag.is_set, on_event=job.events.put
+                )
+                job.events.put(Finished("", job.inline.cancelled, len(job.inline.errors)))
+            except Exception as e:
+                job.events.put(Failed(f"{type(e).__name__}: {e}"))
+
+        job.thread = threading.Thread(target=run, name="xtractor-inline", daemon=True)
+        job.thread.start()
+        return job
+
+    def export(self, result: InlineResult, output_excel: Path) -> Path:
+        return ExtractionService().export_inline(result, output_excel)
+
+    def _apply(self, job: ExtractionJob, ev: ExtractionEvent) -> None:
+        if isinstance(ev, Progress):
+            job.processed, job.total_pages = ev.processed, ev.total
+        elif isinstance(ev, RunStarted):
+            job.resume_token = ev.resume_token
+        elif isinstance(ev, PhaseChanged):
+            job.phase = ev.phase
+        elif isinstance(ev, FileFailed):
+            job.failures.append(ev)
+        elif isinstance(ev, RunSummary):
+            job.summary = list(ev.lines)
+        elif isinstance(ev, Finished):
+            job.output, job.cancelled, job.done = ev.output_path, ev.cancelled, True
+        elif isinstance(ev, Failed):
+            job.error, job.done = ev.error, True
+        job.pending.append(ev)
+
+    def _drain(self, job: ExtractionJob) -> None:
+        if job.thread is None:
+            for msg in self.host.messages():
+                if msg[0] == "event" and msg[1] == job.job_id:
+                    job.events.put(msg[2])  # (late messages of earlier runs are dropped)
+        while True:
+            try:
+                ev = job.events.get_nowait()
+            except queue.Empty:
+                break
+            self._apply(job, ev)
+        if not job.done and job.thread is None and not self.host.alive():
+            self._apply(job, Failed("extraction host exited"))
+
+    def events(self, job: ExtractionJob) -> List[ExtractionEvent]:
+        """Events since the last call, oldest first."""
+        self._drain(job)
+        out, job.pending = job.pending, []
+        return out
 
     def poll(self, job: ExtractionJob) -> Optional[tuple[int, int]]:
-        if job.process.is_alive():
-            return (job.progress.value, job.total_pages.value)
-        return None
+        self._drain(job)
+        if job.done:
+            return None
+        return (job.processed, job.total_pages)
 
     def finish(self, job: ExtractionJob) -> Optional[Path]:
-        try:
-            job.process.join(timeout=2)
-            job.process.close()
-        except Exception:
-            pass
-        out = (job.final_output_path.value or "").strip()
-        try:
-            job.manager.shutdown()
-        except Exception:
-            pass
+        self._drain(job)
+        if job.error:
+            print(f"[Extract] {job.error}")
+        if not KEEP_HOST:
+            self.host.shutdown()
+        out = (job.output or "").strip()
         return Path(out) if out else None
 
     def cancel(self, job: ExtractionJob) -> None:
-        try:
-            job.cancel_event.set()
-        except Exception:
-            pass
+        if job.thread is not None:
+            job.cancel_flag.set()
+            return
+        self.host.cancel(job.job_id)
+
+    def shutdown(self) -> None:
+        self.host.shutdown()
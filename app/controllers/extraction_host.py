@@ -0,0 +1,154 @@
+from __future__ import annotations
+import logging, os, queue, threading
+
+from app.domain.events import Failed, FileFailed, Finished
+from app.services.task_runner import WarmPools
+from app.worker import worker_context
+
+logger = logging.getLogger(__name__)
+
+# keep one host (and its warm pools) for the whole GUI session; 0 = fresh host per run
+KEEP_HOST = os.getenv("EXTRACT_HOST", "1") == "1"
+
+
+def _host_main(conn) -> None:
+    """
+    Host process: runs extractions one at a time and keeps worker pools alive between
+    them. Messages in: ("extract", job_id, req) / ("cancel", job_id) / ("stop",).
+    Messages out: ("event", job_id, <app.domain.events instance>); every job ends with
+    Finished or Failed.
+    """
+    from app.services.extraction_service import ExtractionService, pool_shape
+
+    svc = ExtractionService()
+    pools = WarmPools(worker_context())  # one set of channels (cancel, heartbeats) for all
+    jobs: queue.Queue = queue.Queue()
+    cancelled: set = set()  # job ids; a cancel may arrive before its job starts
+    send_lock = threading.Lock()
+
+    def send(*msg):
+        with send_lock:
+            try:
+                conn.send(msg)
+            except Exception:
+                pass
+
+    def reader():
+        while True:
+            try:
+                msg = conn.recv()
+            except (EOFError, OSError):
+                msg = ("stop",)  # GUI went away
+            if msg[0] == "cancel":
+                cancelled.add(msg[1])
+                continue
+            jobs.put(msg)
+            if msg[0] == "stop":
+                return
+
+    threading.Thread(target=reader, daemon=True).start()
+
+    # warm the plain-mode pool before the first job arrives
+    try:
+        pools.lease(*pool_shape(False)[:2])
+    except Exception:
+        logger.exception("Extraction host: pool warm-up failed")
+
+    try:
+        while True:
+            msg = jobs.get()
+            if msg[0] == "stop":
+                break
+            _, job_id, req = msg
+            pools.channels.cancel.clear()  # the previous run drained its pool before returning
+            try:
+                failures = []
+
+                def on_event(ev, j=job_id):
+                    if isinstance(ev, FileFailed):
+                        failures.append(ev)
+                    send("event", j, ev)
+
+                out = svc.extract(
+                    req,
+                    should_cancel=lambda j=job_id: j in cancelled,
+                    pools=pools,
+                    on_event=on_event,
+                )
+                send("event", job_id, Finished(str(out) if out else "", job_id in cancelled, len(failures)))
+            except Exception as e:
+                logger.exception("Extraction host: job %s failed", job_id)
+                send("event", job_id, Failed(f"{type(e).__name__}: {e}"))
+            cancelled.discard(job_id)
+    finally:
+        try:
+            pools.close()
+        except Exception:
+            pass
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+class ExtractionHost:
+    """GUI-side handle on the host process; jobs and progress travel over one pipe."""
+
+    def __init__(self):
+        self.process = None
+        self.conn = None
+        self._next_id = 0
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    def start(self) -> None:
+        if self.alive():
+            return
+        ctx = worker_context()
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_host_main, args=(child,), name="xtractor-host", daemon=False)
+        self.process.start()
+        child.close()
+
+    def submit(self, req) -> int:
+        self.start()
+        self._next_id += 1
+        self.conn.send(("extract", self._next_id, req))
+        return self._next_id
+
+    def cancel(self, job_id: int) -> None:
+        try:
+            self.conn.send(("cancel", job_id))
+        except Exception:
+            pass
+
+    def messages(self) -> list:
+        out = []
+        try:
+            while self.conn is not None and self.conn.poll():
+                out.append(self.conn.recv())
+        except (EOFError, OSError):
+            pass
+        return out
+
+    def shutdown(self, timeout: float = 2.0) -> None:
+        if self.process is None:
+            return
+        try:
+            self.conn.send(("stop",))
+        except Exception:
+            pass
+        try:
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join(1)
+        except Exception:
+            pass
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+        self.process = self.conn = None
+
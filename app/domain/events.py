@@ -0,0 +1,55 @@
+from dataclasses import dataclass
+from typing import Optional, Tuple, Union
+
+# run phases, in order
+PHASES = ("discovery", "extract", "merge", "write")
+
+
+@dataclass(frozen=True)
+class RunStarted:
+    resume_token: str      # pass back as ExtractionRequest.resume_token to continue this run
+    resumed: bool = False
+
+@dataclass(frozen=True)
+class PhaseChanged:
+    phase: str  # one of PHASES
+
+@dataclass(frozen=True)
+class Progress:
+    processed: int  # pages done
+    total: int      # pages in the run (0 while unknown)
+
+@dataclass(frozen=True)
+class FileDone:
+    path: str
+    pages: int
+    seconds: float  # worker wall time for this PDF
+
+@dataclass(frozen=True)
+class FileFailed:
+    path: str
+    error: str
+
+@dataclass(frozen=True)
+class RunWarning:
+    message: str
+    path: Optional[str] = None
+
+@dataclass(frozen=True)
+class RunSummary:
+    lines: Tuple[str, ...]  # what the run learned (e.g. per-area tiers), for the completion message
+
+@dataclass(frozen=True)
+class Finished:
+    output_path: str         # "" for in-memory (inline) runs
+    cancelled: bool = False
+    errors: int = 0
+
+@dataclass(frozen=True)
+class Failed:
+    error: str
+
+
+# everything an extraction run reports; all plain frozen dataclasses so they pickle over a pipe
+ExtractionEvent = Union[RunStarted, PhaseChanged, Progress, FileDone, FileFailed, RunWarning, RunSummary,
+                        Finished, Failed]
@@ -8,6 +8,8 @@ Rect = Tuple[float, float, float, float]
 class AreaSpec:
     title: str
     rect: Rect
+    ocr_dpi: Optional[int] = None  # per-area OCR resolution (set by the DPI tuner); None = OcrSettings.dpi
+    scope: str = "page"            # "page" | "document" (read once per PDF, copied to every page row)
 
 @dataclass(frozen=True)
 class OcrSettings:
@@ -15,6 +17,8 @@ class OcrSettings:
     dpi: int
     tessdata_dir: Optional[Path] = None
     scale: Optional[float] = None  # optional upscale for images (kept for parity)
+    binarize: bool = False         # Otsu-binarize the trimmed grayscale crop before OCR
+    auto_dpi: bool = False         # calibrate a per-area DPI (capped at `dpi`) on sampled PDFs before the run
 
 @dataclass(frozen=True)
 class ExtractionRequest:
@@ -28,3 +32,44 @@ class ExtractionRequest:
     revision_column_index: Optional[int] = None
     revision_description_index: Optional[int] = None
     revision_date_index: Optional[int] = None
+    # optional-content (OCG) layer filters, case-insensitive globs such as "*HATCH*"
+    layers_include: Optional[List[str]] = None  # when set, only matching layers stay visible
+    layers_exclude: Optional[List[str]] = None  # matching layers are hidden
+    # token of an interrupted run (its temp dir name); finished PDFs are skipped and their rows reused
+    resume_token: Optional[str] = None
+    # base dir for the run's temp (spool) dirs; None = XTRACTOR_SPOOL_DIR or the OS temp dir
+    spool_dir: Optional[Path] = None
+
+@dataclass(frozen=True)
+class PatternScore:
+    key: str       # REVISION_PATTERNS key
+    matches: int   # rev cells matching the pattern, over all samples
+    total: int     # rev cells looked at, over all samples
+    samples: int   # sampled tables where the pattern alone clears the match threshold
+
+    @property
+    def confidence(self) -> float:
+        return self.matches / self.total if self.total else 0.0
+
+@dataclass(frozen=True)
+class RevisionDetection:
+    """Consensus of revision pattern/column detection over several sampled PDFs."""
+    pattern_key: Optional[str]                               # None when no pattern clears the threshold
+    patterns: List[PatternScore]                             # every pattern, best first
+    columns: Tuple[Optional[int], Optional[int], Optional[int]]  # (rev, desc, date)
+    column_confidence: Tuple[float, float, float]            # share of samples voting for each column
+    sample_rows: List[List[str]]                             # table of a sample that agrees with the consensus
+    samples_used: int                                        # samples that produced a table
+    samples_total: int
+
+@dataclass(frozen=True)
+class InlineResult:
+    """Rows of a small run done in-process, kept in memory until (optionally) exported."""
+    headers: List[str]            # combined-CSV order: UNID, base columns, areas, latest trio, Duplicate Of, revs
+    rows: List[List[str]]
+    area_headers: List[str]
+    max_revisions: int
+    pdf_root: Path
+    pages: int
+    errors: List[str]
+    cancelled: bool = False
@@ -44,7 +44,7 @@ def write_from_csv(
     """
     # Area + extra + dynamic revision headers
     area_headers = [unique_headers_mapping[i] for i in range(len(unique_headers_mapping))]
-    extra_headers = ["Latest Revision", "Latest Description", "Latest Date"]
+    extra_headers = ["Latest Revision", "Latest Description", "Latest Date", "Duplicate Of"]
     revision_headers = [f"Rev{i+1}" for i in range(max_revisions)]
 
     # Incoming base order fixed by the pipeline/combiner
@@ -87,7 +87,7 @@ def write_from_csv(
         next(reader, None)  # skip CSV header from combiner
         for row in reader:
             # row layout from combiner:
-            # [UNID, Size, DateMod, Folder, Filename, PageNo, PageSize, <areas...>, LatestRev, LatestDesc, LatestDate, Rev1, ..., RevN]
+            # [UNID, Size, DateMod, Folder, Filename, PageNo, PageSize, <areas...>, LatestRev, LatestDesc, LatestDate, DuplicateOf, Rev1, ..., RevN]
             unid = row[0]
             incoming_base = row[1:7]  # fixed order IN_BASE_ORDER
 
@@ -104,9 +104,10 @@ def write_from_csv(
             latest_rev = row[base_index] if len(row) > base_index else ""
             latest_desc = row[base_index + 1] if len(row) > base_index + 1 else ""
             latest_date = row[base_index + 2] if len(row) > base_index + 2 else ""
+            duplicate_of = row[base_index + 3] if len(row) > base_index + 3 else ""
 
             # Revision columns follow the latest fields
-            revision_start = base_index + 3
+            revision_start = base_index + 4
             if max_revisions:
                 padded = row[revision_start : revision_start + max_revisions]
                 if len(padded) < max_revisions:
@@ -119,7 +120,7 @@ def write_from_csv(
             # Build final row (same order as headers)
             row_values = [
                 _clean_cell_value(v)
-                for v in ([unid] + reordered_base + areas + [latest_rev, latest_desc, latest_date] + padded)
+                for v in ([unid] + reordered_base + areas + [latest_rev, latest_desc, latest_date, duplicate_of] + padded)
             ]
 
             if needs_images:
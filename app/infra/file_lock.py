@@ -0,0 +1,26 @@
+# app/infra/file_lock.py
+"""Non-blocking exclusive locks on a file (flock on POSIX, msvcrt.locking on Windows)."""
+from __future__ import annotations
+import sys
+from pathlib import Path
+from typing import IO, Optional
+
+
+def try_lock(path: Path) -> Optional[IO]:
+    """The open lock file (keep it open to hold the lock, close it to release), or None when held elsewhere."""
+    try:
+        f = open(path, "a+b")
+    except OSError:
+        return None
+    try:
+        if sys.platform.startswith("win"):
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return f
+    except OSError:
+        f.close()
+        return None
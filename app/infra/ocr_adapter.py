@@ -1,15 +1,160 @@
 from __future__ import annotations
 from pathlib import Path
 from typing import Optional, Tuple
+import math
+import os
 import pymupdf as fitz
 
+from app.worker import Cancelled, cancel_requested
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; OCR still works on the full render
+    np = None
+
+# Gray levels below this count as ink when trimming the render
+INK_THRESHOLD = 200
+# keep a little white border around the ink box – Tesseract dislikes glyphs touching the edge
+INK_MARGIN_PX = 12
+
+# Clips predicted to render above this many pixels are OCR'd as tiles
+OCR_PIXEL_BUDGET = int(os.getenv("OCR_PIXEL_BUDGET", str(24_000_000)))
+# tile overlap in points; must exceed the widest word we expect to read
+OCR_TILE_OVERLAP_PT = 96.0
+
+
+def _otsu_threshold(arr) -> int:
+    """Otsu threshold for a uint8 grayscale array."""
+    hist = np.bincount(arr.ravel(), minlength=256).astype(np.float64)
+    total = hist.sum()
+    if total == 0:
+        return 128
+    levels = np.arange(256, dtype=np.float64)
+    w0 = np.cumsum(hist)
+    w1 = total - w0
+    m0 = np.cumsum(hist * levels)
+    mt = m0[-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (mt * w0 / total - m0) ** 2 / (w0 * w1)
+    between = np.nan_to_num(between)
+    return int(np.argmax(between))
+
+
+def prepare_ocr_pixmap(pix: "fitz.Pixmap", binarize: bool = False) -> Optional[tuple["fitz.Pixmap", tuple[int, int]]]:
+    """
+    Trim a grayscale render to its ink bounding box (plus a margin) and optionally
+    binarize it. Returns (pixmap, (x_off, y_off)) where the offsets are the crop's
+    top-left corner in source pixels, or None when the render holds no ink at all.
+    The returned pixmap is RGB because MuPDF's OCR device ignores gray input.
+    """
+    if np is None or pix.n != 1:
+        return (fitz.Pixmap(fitz.csRGB, pix) if pix.n == 1 else pix), (0, 0)
+
+    h, w = pix.height, pix.width
+    arr = np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(h, pix.stride)[:, :w]
+
+    ink = arr < INK_THRESHOLD
+    rows = np.flatnonzero(ink.any(axis=1))
+    if rows.size == 0:
+        return None
+    cols = np.flatnonzero(ink.any(axis=0))
+
+    y0 = max(0, int(rows[0]) - INK_MARGIN_PX)
+    y1 = min(h, int(rows[-1]) + 1 + INK_MARGIN_PX)
+    x0 = max(0, int(cols[0]) - INK_MARGIN_PX)
+    x1 = min(w, int(cols[-1]) + 1 + INK_MARGIN_PX)
+    crop = arr[y0:y1, x0:x1]
+
+    if binarize:
+        thr = _otsu_threshold(crop)
+        crop = np.where(crop > thr, 255, 0).astype(np.uint8)
+
+    crop = np.ascontiguousarray(crop)
+    gray = fitz.Pixmap(fitz.csGRAY, crop.shape[1], crop.shape[0], crop.tobytes(), False)
+    gray.set_dpi(pix.xres, pix.yres)
+    rgb = fitz.Pixmap(fitz.csRGB, gray)
+    rgb.set_dpi(pix.xres, pix.yres)
+    return rgb, (x0, y0)
+
+
+def _tile_rects(clip: "fitz.Rect", tile_pt: float, overlap_pt: float) -> list["fitz.Rect"]:
+    """Split clip into a grid of tiles of at most tile_pt, overlapping by overlap_pt."""
+    step = max(1.0, tile_pt - overlap_pt)
+    nx = max(1, math.ceil((clip.width - overlap_pt) / step))
+    ny = max(1, math.ceil((clip.height - overlap_pt) / step))
+    tiles = []
+    for j in range(ny):
+        for i in range(nx):
+            x0 = clip.x0 + i * step
+            y0 = clip.y0 + j * step
+            tiles.append(fitz.Rect(x0, y0, min(clip.x1, x0 + tile_pt), min(clip.y1, y0 + tile_pt)))
+    return tiles
+
+
+def _dedupe_words(words: list[tuple]) -> list[tuple]:
+    """
+    Drop words read twice in the overlap of two tiles. Tesseract reports line-height
+    boxes in one tile and glyph-height boxes in another, so two words are the same when
+    their x-extents mostly coincide (IoU >= 0.5) and their vertical centres lie within
+    the shorter box. OCR may disagree on punctuation; the wider read wins. Short words
+    with the same text only need to cover half of the narrower box (their IoU drops
+    fast with a few pixels of jitter).
+    """
+    kept: list[tuple] = []
+    for w in sorted(words, key=lambda w: w[0] - w[2]):
+        dup = False
+        for k in kept:
+            inter = min(w[2], k[2]) - max(w[0], k[0])
+            if inter <= 0:
+                continue
+            half_h = min(w[3] - w[1], k[3] - k[1]) / 2
+            if abs((w[1] + w[3]) - (k[1] + k[3])) / 2 > half_h:
+                continue
+            if w[4].strip().lower() == k[4].strip().lower():
+                base = min(w[2] - w[0], k[2] - k[0])
+            else:
+                base = max(w[2], k[2]) - min(w[0], k[0])
+            if inter >= 0.5 * base:
+                dup = True
+                break
+        if not dup:
+            kept.append(w)
+    return kept
+
+
+def _words_to_text(words: list[tuple]) -> str:
+    """Stitch words back into reading order: lines top-to-bottom, words left-to-right."""
+    if not words:
+        return ""
+    words = sorted(words, key=lambda w: ((w[1] + w[3]) / 2, w[0]))
+    heights = sorted(w[3] - w[1] for w in words)
+    tol = max(1.0, heights[len(heights) // 2] / 2)
+
+    lines: list[list[tuple]] = []
+    line_y = None
+    for w in words:
+        yc = (w[1] + w[3]) / 2
+        if line_y is None or abs(yc - line_y) > tol:
+            lines.append([w])
+            line_y = yc
+        else:
+            lines[-1].append(w)
+    return "\n".join(" ".join(w[4] for w in sorted(ln, key=lambda w: w[0])) for ln in lines) + "\n"
+
+
 class OcrAdapter:
     """
     Uses MuPDF pdfocr bindings (same as your original `pdfocr_tobytes`).
     Returns text prefixed with `_OCR_` for styling later.
+
+    Clips are rendered in grayscale without alpha and trimmed to the ink box
+    before recognition, so Tesseract only sees the part of the area that has content.
+    Clips that would exceed OCR_PIXEL_BUDGET are rendered and OCR'd as overlapping
+    tiles so peak memory stays bounded regardless of area size and DPI.
     """
-    def __init__(self, tessdata_dir: Optional[Path]):
+    def __init__(self, tessdata_dir: Optional[Path], binarize: bool = False):
         self.tessdata_dir = str(tessdata_dir) if tessdata_dir else None
+        self.binarize = binarize
 
     def ocr_clip_to_text(
         self,
@@ -18,13 +163,18 @@ class OcrAdapter:
         dpi: int,
         scale: Optional[float]
     ) -> str:
-        if scale is not None:
-            mat = fitz.Matrix(scale, scale)
-            pix = page.get_pixmap(matrix=mat, clip=fitz.Rect(clip))
-        else:
-            pix = page.get_pixmap(clip=fitz.Rect(clip), dpi=dpi)
+        rect = fitz.Rect(clip)
+        zoom = scale if scale is not None else dpi / 72.0
+        if (rect.width * zoom) * (rect.height * zoom) > OCR_PIXEL_BUDGET:
+            return self._ocr_tiled(page, rect, zoom)
 
-        pdfdata = pix.pdfocr_tobytes(language="eng", tessdata=self.tessdata_dir)
+        prepared = self._render_prepared(page, rect, zoom)
+        if prepared is None:
+            # blank crop: skip Tesseract entirely
+            return ""
+
+        pdfdata = prepared[0].pdfocr_tobytes(language="eng", tessdata=self.tessdata_dir)
+        del prepared
         try:
             with fitz.open("pdf", pdfdata) as clipdoc:
                 return "_OCR_" + clipdoc[0].get_text()
@@ -33,3 +183,48 @@ class OcrAdapter:
                 del pdfdata
             except Exception:
                 pass
+
+    def _render_prepared(self, page: "fitz.Page", rect: "fitz.Rect", zoom: float):
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=rect, colorspace=fitz.csGRAY, alpha=False)
+        # matrix renders are tagged 96 DPI; Tesseract sizes its glyph models by the real resolution
+        res = max(1, round(72 * zoom))
+        pix.set_dpi(res, res)
+        try:
+            return prepare_ocr_pixmap(pix, self.binarize)
+        finally:
+            del pix
+
+    def _ocr_tiled(self, page: "fitz.Page", rect: "fitz.Rect", zoom: float) -> str:
+        tile_pt = math.sqrt(OCR_PIXEL_BUDGET) / zoom
+        overlap = min(OCR_TILE_OVERLAP_PT, tile_pt / 3)
+        words: list[tuple] = []
+
+        for tile in _tile_rects(rect, tile_pt, overlap):
+            if cancel_requested():
+                raise Cancelled("OCR stopped")  # part of the area read: never pass it off as the whole
+            prepared = self._render_prepared(page, tile, zoom)
+            if prepared is None:
+                continue
+            pix, (ox, oy) = prepared
+            px_per_pt = pix.xres / 72.0  # OCR page units -> crop pixels
+            pdfdata = pix.pdfocr_tobytes(language="eng", tessdata=self.tessdata_dir)
+            del pix, prepared
+            with fitz.open("pdf", pdfdata) as clipdoc:
+                tile_words = clipdoc[0].get_text("words")
+            del pdfdata
+
+            for w in tile_words:
+                # OCR page points -> page coordinates
+                x0 = tile.x0 + (ox + w[0] * px_per_pt) / zoom
+                y0 = tile.y0 + (oy + w[1] * px_per_pt) / zoom
+                x1 = tile.x0 + (ox + w[2] * px_per_pt) / zoom
+                y1 = tile.y0 + (oy + w[3] * px_per_pt) / zoom
+                # words cut by an interior seam are read whole by the neighbouring tile
+                if (x0 - tile.x0 < 1 and tile.x0 > rect.x0) or (tile.x1 - x1 < 1 and tile.x1 < rect.x1):
+                    continue
+                if (y0 - tile.y0 < 1 and tile.y0 > rect.y0) or (tile.y1 - y1 < 1 and tile.y1 < rect.y1):
+                    continue
+                words.append((x0, y0, x1, y1, w[4]))
+
+        text = _words_to_text(_dedupe_words(words))
+        return "_OCR_" + text if text else ""
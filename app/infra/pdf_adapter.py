@@ -2,28 +2,187 @@
 from __future__ import annotations
 from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Optional, Tuple
+from dataclasses import asdict
+from typing import Iterable, List, Optional, Tuple
+import fnmatch
+import hashlib
 import logging
+import mmap
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import pymupdf as fitz
 
+from app.infra.ruled_table import RuledTable, extract_ruled_table, upright_matrix
+from app.infra.spool_cache import SpoolIndex
+from app.worker import cancel_requested
+
 RectT = tuple[float, float, float, float]
 
+# classify_page() results
+PAGE_SCANNED = "scanned"    # no text layer, one image covering the page -> OCR only
+PAGE_TEXT = "text"          # fonts present: try the text layer first
+PAGE_GRAPHICS = "graphics"  # no fonts and no full-page image (vector linework, SHX drawn as lines)
+
+# share of the page an image must cover to count as a full-bleed scan
+FULL_BLEED_COVER = 0.9
+
+# AutoCAD marks the real strings behind SHX linework with this annotation subject
+SHX_ANNOT_MARKER = "autocad shx text"
+
+# how PdfAdapter.open reads a PDF: "file" (MuPDF seeks in the file), "memory" (one
+# sequential read, then open from the buffer) or "mmap"; see read_pdf_bytes().
+# In "memory" mode the next PDF is also read ahead: into a buffer for inline runs
+# (ReadAhead), into the OS cache by pool workers (warm_os_cache)
+READ_MODE = os.getenv("PDF_READ_MODE", "file").strip().lower()
+# files larger than this are always opened from the file
+MEMORY_MAX_MB = int(os.getenv("PDF_MEMORY_MAX_MB", "512"))
+
 logger = logging.getLogger(__name__)
 
-def _safe_clip(page: "fitz.Page", clip: RectT) -> Optional[fitz.Rect]:
-    r = fitz.Rect(clip).normalize() & page.rect
+# sequential runs: next PDF read on an I/O thread while the current one is processed
+_READ_AHEAD: Optional["ReadAhead"] = None
+# pool runs: a later task's PDF is read into the OS cache (see warm_os_cache())
+_WARMING = threading.Event()
+_WARM_CHUNK = 4 * 1024 * 1024
+
+
+def install_read_ahead(ra: Optional["ReadAhead"]) -> None:
+    global _READ_AHEAD
+    _READ_AHEAD = ra
+
+
+def read_pdf_bytes(path: str | Path) -> Optional[bytes]:
+    """Whole file in one sequential read; None when it is over MEMORY_MAX_MB."""
+    with open(path, "rb", buffering=0) as f:
+        size = os.fstat(f.fileno()).st_size
+        if size > MEMORY_MAX_MB * 1024 * 1024:
+            return None
+        buf = bytearray(size)
+        view = memoryview(buf)
+        got = 0
+        while got < size:  # a network read may return short
+            n = f.readinto(view[got:])
+            if not n:
+                break
+            got += n
+        return bytes(view[:got])
+
+
+class ReadAhead:
+    """
+    I/O thread for sequential runs: want() the next PDF while the current one is being
+    processed, and open() takes the buffer (waiting for it if the read is still going).
+    """
+    def __init__(self):
+        self._pool = ThreadPoolExecutor(1, thread_name_prefix="xtractor-readahead")
+        self._lock = threading.Lock()
+        self._pending: dict = {}  # path -> future; current + next at most
+
+    def want(self, path: str | Path) -> None:
+        with self._lock:
+            if str(path) not in self._pending:
+                self._pending[str(path)] = self._pool.submit(read_pdf_bytes, path)
+
+    def take(self, path: str | Path) -> Optional[bytes]:
+        with self._lock:
+            fut = self._pending.pop(str(path), None)
+        if fut is None:
+            return None
+        try:
+            return fut.result()
+        except Exception:
+            return None  # open() goes to the file and reports the real error
+
+    def close(self) -> None:
+        with self._lock:
+            self._pending.clear()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def warm_os_cache(path: str | Path) -> None:
+    """
+    Pool workers: read a PDF a later task will open on a background thread and drop
+    the bytes, so whichever worker gets that task reads it from the OS file cache.
+    One read at a time per worker; skipped while the previous one is still going.
+    """
+    if _WARMING.is_set():
+        return
+    _WARMING.set()
+    threading.Thread(target=_warm, args=(str(path),), name="xtractor-warm", daemon=True).start()
+
+
+def _warm(path: str) -> None:
+    try:
+        with open(path, "rb", buffering=0) as f:
+            if os.fstat(f.fileno()).st_size > MEMORY_MAX_MB * 1024 * 1024:
+                return  # opened from the file anyway
+            while not cancel_requested() and f.read(_WARM_CHUNK):
+                pass
+    except OSError:
+        pass
+    finally:
+        _WARMING.clear()
+
+
+def _clean_rows(data) -> List[List[str]]:
+    return [[(c if isinstance(c, str) else ("" if c is None else str(c))).strip()
+             for c in row] for row in data]
+
+
+def _table_col_edges(tab) -> List[float]:
+    """Column x-boundaries of a find_tables() table (empty if unavailable)."""
+    try:
+        xs = sorted({round(c[0], 1) for c in tab.cells if c} | {round(c[2], 1) for c in tab.cells if c})
+    except Exception:
+        return []
+    merged: List[float] = []
+    for x in xs:
+        if not merged or x - merged[-1] > 1.5:
+            merged.append(x)
+    return merged
+
+
+def clip_fingerprint(page: "fitz.Page", clip: "fitz.Rect", words: Optional[list] = None) -> Optional[str]:
+    """
+    Hash of the text content inside clip (words with rounded positions), the clip
+    itself and the page rotation. Title blocks placed as the same XObject on every
+    sheet produce the same fingerprint. None when the clip holds no text.
+    """
+    if words is None:
+        try:
+            words = page.get_text("words", clip=clip)
+        except Exception:
+            return None
+    if not words:
+        return None
+    h = hashlib.sha1()
+    h.update(f"{getattr(page, 'rotation', 0) % 360}|{clip.x0:.1f},{clip.y0:.1f},{clip.x1:.1f},{clip.y1:.1f}".encode())
+    for w in sorted(words, key=lambda w: (round(w[1], 1), round(w[0], 1))):
+        h.update(f"|{w[0]:.1f},{w[1]:.1f},{w[2]:.1f},{w[3]:.1f}:{w[4]}".encode("utf-8", "replace"))
+    return h.hexdigest()
+
+
+def _safe_clip(page: "fitz.Page", clip: RectT, visible: bool = False) -> Optional[fitz.Rect]:
+    # text/table clips live in unrotated page space (page.rect is the rotated, visible
+    # box); get_pixmap(clip=) takes visible coordinates, so pixmap clips pass visible=True
+    bounds = page.rect * page.derotation_matrix if page.rotation and not visible else page.rect
+    r = fitz.Rect(clip).normalize() & bounds
     if r.is_empty or r.width < 2 or r.height < 2:
         return None
     return r
 
 class PdfAdapter:
+    def __init__(self, table_cache: Optional[SpoolIndex] = None):
+        # fingerprint -> table; shared through the spool dir when the service passes one
+        self.table_cache = table_cache
+
     def page_count(self, path: str | Path) -> int:
         with fitz.open(str(path)) as doc:
             return doc.page_count
 
     def render_pixmap(self, page: "fitz.Page", clip: RectT, dpi: int = 150, scale: Optional[float] = None):
-        r = _safe_clip(page, clip)
+        r = _safe_clip(page, clip, visible=True)
         if r is None:
             raise ValueError("Empty/invalid clip for pixmap")
         if scale is not None:
@@ -33,15 +192,83 @@ class PdfAdapter:
 
 
     @contextmanager
-    def open(self, path: str | Path):
-        doc = fitz.open(str(path), filetype="pdf")
+    def open(
+        self,
+        path: str | Path,
+        layers_include: Optional[Iterable[str]] = None,
+        layers_exclude: Optional[Iterable[str]] = None,
+        read_mode: Optional[str] = None,
+    ):
+        mode = read_mode or READ_MODE
+        data = _READ_AHEAD.take(path) if _READ_AHEAD is not None else None
+        mm = None
+        if data is None and mode == "memory":
+            data = read_pdf_bytes(path)
+        elif data is None and mode == "mmap":
+            try:
+                with open(path, "rb") as f:
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                data = memoryview(mm)
+            except (OSError, ValueError):
+                mm = None  # empty file / no mmap on this share: plain open below
+        try:
+            doc = fitz.open(stream=data, filetype="pdf") if data is not None else fitz.open(str(path), filetype="pdf")
+        except Exception:
+            if mm is not None:
+                data.release()
+                mm.close()
+            raise
         try:
             if not doc.is_pdf:
                 raise ValueError("Not a valid PDF")
             fitz.TOOLS.set_small_glyph_heights(True)
+            if layers_include or layers_exclude:
+                self.apply_layer_filter(doc, layers_include, layers_exclude)
             yield doc
         finally:
             doc.close()
+            if mm is not None:
+                try:
+                    data.release()
+                    mm.close()
+                except Exception:
+                    pass
+
+    def apply_layer_filter(
+        self,
+        doc: "fitz.Document",
+        include: Optional[Iterable[str]] = None,
+        exclude: Optional[Iterable[str]] = None,
+    ) -> int:
+        """
+        Switch optional-content layers (OCGs) off by name. Patterns are case-insensitive
+        fnmatch globs ("*HATCH*"). With `include`, every layer not matching it is hidden;
+        `exclude` hides matching layers. The state lives on the document, so rendering
+        (render_pixmap, OCR) and text extraction all skip hidden layers.
+        Returns the number of layers switched off.
+        """
+        inc = [p.lower() for p in (include or []) if p]
+        exc = [p.lower() for p in (exclude or []) if p]
+        hidden = 0
+        try:
+            configs = doc.layer_ui_configs()
+        except Exception:
+            return 0
+        for cfg in configs:
+            if cfg.get("type") == "label":
+                continue
+            name = (cfg.get("text") or "").lower()
+            off = (inc and not any(fnmatch.fnmatchcase(name, p) for p in inc)) \
+                or any(fnmatch.fnmatchcase(name, p) for p in exc)
+            if off and cfg.get("on"):
+                try:
+                    doc.set_layer_ui_config(cfg["number"], 2)  # 2 = set OFF
+                    hidden += 1
+                except Exception:
+                    pass
+        if hidden:
+            logger.debug("PdfAdapter: %s optional-content layers hidden.", hidden)
+        return hidden
 
     def page_rect(self, page: "fitz.Page") -> RectT:
         r = page.rect
@@ -50,6 +277,87 @@ class PdfAdapter:
     def get_text(self, page: "fitz.Page", clip: RectT) -> str:
         return page.get_text("text", clip=fitz.Rect(clip))
 
+    def shx_annotations(self, page: "fitz.Page") -> List[Tuple["fitz.Rect", str]]:
+        """
+        Collect (rect, text) for every "AutoCAD SHX Text" annotation on the page.
+        Rects are in the same (unrotated) space as get_text clips.
+        """
+        out: List[Tuple[fitz.Rect, str]] = []
+        try:
+            if page.first_annot is None:
+                return out
+            for annot in page.annots():
+                info = annot.info or {}
+                marker = f"{info.get('subject', '')} {info.get('title', '')}".lower()
+                if SHX_ANNOT_MARKER not in marker:
+                    continue
+                text = (info.get("content") or "").strip()
+                if text:
+                    out.append((fitz.Rect(annot.rect), text))
+        except Exception:
+            pass
+        return out
+
+    def get_shx_text(self, page: "fitz.Page", clip: RectT, annots: Optional[List[Tuple["fitz.Rect", str]]] = None) -> str:
+        """
+        Text of the SHX annotations lying (mostly) inside clip, in reading order.
+        Pass `annots` from shx_annotations() to avoid re-walking the page per area.
+        """
+        if annots is None:
+            annots = self.shx_annotations(page)
+        if not annots:
+            return ""
+        r = fitz.Rect(clip).normalize()
+        hits = []
+        for rect, text in annots:
+            inter = rect & r
+            if inter.is_empty:
+                continue
+            if inter.get_area() >= 0.5 * max(rect.get_area(), 1e-6):
+                hits.append((round(rect.y0, 1), rect.x0, text))
+        hits.sort()
+        return "\n".join(t for _, _, t in hits)
+
+    def classify_page(self, page: "fitz.Page") -> str:
+        """
+        Cheap text-layer check from the page resources (nothing is extracted):
+        pages without fonts or annotations whose largest image covers the page are scans.
+        """
+        try:
+            if page.get_fonts(full=True) or page.first_annot is not None:
+                return PAGE_TEXT
+            area = abs(page.rect)
+            for info in page.get_image_info():
+                if area and abs(fitz.Rect(info["bbox"]) & page.rect) >= FULL_BLEED_COVER * area:
+                    return PAGE_SCANNED
+            return PAGE_GRAPHICS
+        except Exception:
+            return PAGE_TEXT
+
+    def page_fingerprint(self, page: "fitz.Page") -> Optional[str]:
+        """
+        Cheap identity of a page's visible content: page box + rotation, the content
+        streams, the raw streams of XObjects/images it uses and its annotations.
+        Raw (still compressed) streams are hashed, nothing is decoded or rendered.
+        None if the page could not be read.
+        """
+        try:
+            doc = page.parent
+            h = hashlib.sha1()
+            h.update(f"{tuple(page.mediabox)}|{tuple(page.cropbox)}|{page.rotation}".encode())
+            h.update(page.read_contents() or b"")
+            xrefs = {x[0] for x in page.get_xobjects()} | {img[0] for img in page.get_images(full=True)}
+            for xref in sorted(x for x in xrefs if x > 0):
+                h.update(b"|x")
+                h.update(doc.xref_stream_raw(xref) or b"")
+            for annot in page.annots():
+                info = annot.info
+                h.update(f"|a{annot.type[1]}|{tuple(annot.rect)}|{info.get('subject')}|{info.get('content')}"
+                         .encode("utf-8", "replace"))
+            return h.hexdigest()
+        except Exception:
+            return None
+
     def words_count(self, page: "fitz.Page", clip: RectT) -> int:
         try:
             return len(page.get_text("words", clip=fitz.Rect(clip)))
@@ -63,40 +371,95 @@ class PdfAdapter:
             pass
 
     def find_table_rows(self, page: "fitz.Page", clip: RectT) -> Optional[List[List[str]]]:
+        table = self.find_table(page, clip)
+        return table.rows if table is not None else None
+
+    def slice_table(self, page: "fitz.Page", clip: RectT, col_edges: List[float], row_rulings: bool = True) -> Optional[RuledTable]:
+        """Slice the clip with known column boundaries (learned layout), skipping all detection."""
+        r = _safe_clip(page, clip)
+        if r is None:
+            return None
+        try:
+            words = page.get_text("words", clip=r)
+            table = extract_ruled_table(page, r, words, col_edges=col_edges, row_rulings=row_rulings)
+        except Exception:
+            return None
+        if table is not None:
+            table.fingerprint = clip_fingerprint(page, r, words)
+        return table
+
+    def find_table(self, page: "fitz.Page", clip: RectT) -> Optional[RuledTable]:
         """
-        Table finder for revision tables.
-        - Try on-page first (cheap).
-        - If that fails and the page is rotated (90/270), copy the *clipped region*
-          to a tiny temp page and draw it with a compensating rotation so the table
-          is upright; then run find_tables() there.
-        - Optional heavy fallback (mini-doc without rotation) is still controlled by
-          REV_TABLE_FALLBACK=1.
+        Table finder for revision tables. Returns rows plus column edges in the
+        slicer's upright space (edges are empty when they cannot be reused).
+        - Try the ruled-table slicer first (words + ruling lines, linear-ish time).
+          Rotated pages are handled there by transforming words and rulings with
+          the page's rotation matrix; no temporary documents are built.
+        - If its confidence is low, try find_tables() on-page.
+        - A low-confidence slicer result is returned if find_tables() failed too.
+        With a table_cache, results are reused for clips with the same fingerprint.
         """
         r = _safe_clip(page, clip)
         if r is None:
             logger.debug("[DetectPattern] PdfAdapter: clip %s produced no valid rectangle.", clip)
             return None
 
-        # quick heuristics
         try:
-            wc = len(page.get_text("words", clip=r))
+            words = page.get_text("words", clip=r)
         except Exception:
-            wc = -1
+            words = None
+
+        fp = clip_fingerprint(page, r, words) if (self.table_cache is not None and words) else None
+        if fp:
+            hit = self.table_cache.get(fp)
+            if isinstance(hit, dict):
+                logger.debug("[DetectPattern] PdfAdapter: table cache hit %s", fp[:12])
+                try:
+                    return RuledTable(**hit["table"]) if hit.get("table") else None
+                except TypeError:
+                    pass
+
+        table = self._find_table(page, r, words)
+        if table is not None and words:
+            table.fingerprint = fp or clip_fingerprint(page, r, words)
+        if fp:
+            self.table_cache.put(fp, {"table": asdict(table) if table is not None else None})
+        return table
+
+    def _find_table(self, page: "fitz.Page", r: "fitz.Rect", words: Optional[list]) -> Optional[RuledTable]:
+        wc = len(words) if words is not None else -1
         logger.debug("[DetectPattern] PdfAdapter: word count in clip %s.", wc)
         if 0 <= wc < 6:
             logger.debug(
                 "[DetectPattern] PdfAdapter: word count very small; continuing with table detection attempt."
             )
+
+        # 0) ruled-table slicer: no vector-graphics analysis, fine for huge tables
+        fast = None
+        if words:
+            try:
+                fast = extract_ruled_table(page, r, words)
+            except Exception:
+                fast = None
+        MIN_CONF = float(os.getenv("REV_FAST_MIN_CONF", "0.8"))
+        if fast is not None:
+            logger.debug(
+                "[DetectPattern] PdfAdapter: ruled-table tier rows=%s cols=%s confidence=%.2f",
+                len(fast.rows), len(fast.col_edges) - 1, fast.confidence,
+            )
+            if fast.confidence >= MIN_CONF:
+                return fast
+
         MAX_WORDS = int(os.getenv("REV_MAX_WORDS", "1500"))
         if wc > MAX_WORDS:
             logger.debug(
-                "[DetectPattern] PdfAdapter: word count %s exceeds max %s, aborting table detection.",
+                "[DetectPattern] PdfAdapter: word count %s exceeds max %s, skipping find_tables.",
                 wc,
                 MAX_WORDS,
             )
-            return None
+            return fast
 
-        # 1) fast path: on original page
+        # 1) find_tables() on original page
         try:
             tabs = page.find_tables(clip=r)
             if tabs and getattr(tabs, "tables", None):
@@ -106,82 +469,12 @@ class PdfAdapter:
                         "[DetectPattern] PdfAdapter: table detected on page without rotation, rows=%s",
                         len(data),
                     )
-                    return [[(c if isinstance(c, str) else ("" if c is None else str(c))).strip()
-                             for c in row] for row in data]
+                    # find_tables() edges are page-space x; only reusable when the slicer works there too
+                    upright = words is None or upright_matrix(page, words) is None
+                    return RuledTable(rows=_clean_rows(data),
+                                      col_edges=_table_col_edges(tabs.tables[0]) if upright else [],
+                                      confidence=1.0, ruled=True, row_ruled=True)
         except Exception:
             pass
 
-        # 2) rotation-normalized fallback for 90/270 pages
-        try:
-            rotation = getattr(page, "rotation", 0) % 360
-        except Exception:
-            rotation = 0
-
-        if rotation in (90, 270):
-            logger.debug(
-                "[DetectPattern] PdfAdapter: page rotation %s detected, attempting fallback.",
-                rotation,
-            )
-            tmp = None
-            try:
-                # swap width/height for 90/270 to avoid clipping after rotate
-                dst_w, dst_h = (r.height, r.width)
-                tmp = fitz.open()
-                dst = tmp.new_page(width=dst_w, height=dst_h)
-
-                # draw the clipped region, compensating the page rotation so the content is upright
-                # rotate expects multiples of 90; use (360-rotation) to deskew
-                dst.show_pdf_page(
-                    fitz.Rect(0, 0, dst_w, dst_h),
-                    page.parent, page.number,
-                    clip=r,
-                    rotate=(360 - rotation) % 360
-                )
-                try:
-                    tabs = dst.find_tables()
-                    if tabs and getattr(tabs, "tables", None):
-                        data = tabs.tables[0].extract()
-                        if data and len(data) >= 2:
-                            logger.debug(
-                                "[DetectPattern] PdfAdapter: rotation fallback produced table, rows=%s",
-                                len(data),
-                            )
-                            return [[(c if isinstance(c, str) else ("" if c is None else str(c))).strip()
-                                     for c in row] for row in data]
-                except Exception:
-                    pass
-            finally:
-                if tmp is not None:
-                    tmp.close()
-                # aggressively release MuPDF caches used during show_pdf_page
-                try:
-                    fitz.TOOLS.store_shrink(100)
-                except Exception:
-                    pass
-
-        # 3) optional heavy fallback without rotation (kept behind env flag)
-        if os.getenv("REV_TABLE_FALLBACK", "0") == "1":
-            tmp = None
-            try:
-                tmp = fitz.open()
-                dst = tmp.new_page(width=r.width, height=r.height)
-                if r.width >= 2 and r.height >= 2:
-                    dst.show_pdf_page(fitz.Rect(0, 0, r.width, r.height), page.parent, page.number, clip=r)
-                    try:
-                        tabs = dst.find_tables()
-                        if tabs and getattr(tabs, "tables", None):
-                            data = tabs.tables[0].extract()
-                            if data and len(data) >= 2:
-                                return [[(c if isinstance(c, str) else ("" if c is None else str(c))).strip()
-                                         for c in row] for row in data]
-                    except Exception:
-                        pass
-            finally:
-                if tmp is not None:
-                    tmp.close()
-                try:
-                    fitz.TOOLS.store_shrink(100)
-                except Exception:
-                    pass
-
-        return None
+        return fast
@@ -0,0 +1,338 @@
+# app/infra/ruled_table.py
+"""
+Fast table slicer for revision blocks: words are grouped into rows by y-overlap
+(or by horizontal rulings when present) and into columns by the clip's vertical
+ruling lines. Only the linework touching the clip is read (see clip_drawings()).
+Runs in O(n log n) on the clip's words and never touches page.find_tables(), so it
+stays usable on very large tables.
+
+On rotated pages whose text runs sideways in page space, words, rulings and the
+clip are mapped through the page's rotation matrix first, so the table is sliced
+upright without rendering it into a temporary document.
+"""
+from __future__ import annotations
+import bisect
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import pymupdf as fitz
+from pymupdf import mupdf
+
+Word = Tuple[float, float, float, float, str]
+
+# rulings closer than this (pt) are the same line (double strokes, cell borders)
+_MERGE_TOL = 1.5
+# a vertical ruling must cover this share of the words' vertical span to split columns
+_MIN_V_COVER = 0.5
+# a horizontal ruling must cover this share of the words' horizontal span to split rows
+_MIN_H_COVER = 0.5
+# without rulings, a column gap must be at least this wide (pt)
+_MIN_GAP = 6.0
+
+
+@dataclass
+class RuledTable:
+    rows: List[List[str]]
+    col_edges: List[float]   # x boundaries, len == columns + 1
+    confidence: float        # 0..1; ruled tables without straddling words score high
+    ruled: bool              # True when columns came from ruling lines
+    row_ruled: bool = False  # True when rows came from horizontal rulings
+    fingerprint: Optional[str] = None  # content hash of the clip (set by PdfAdapter)
+
+
+def upright_matrix(page: "fitz.Page", words: Sequence) -> Optional["fitz.Matrix"]:
+    """
+    Matrix that maps page coordinates to upright reading space, or None when the
+    page's text already runs left-to-right in page space.
+    90/270 pages are only turned when most multi-character words are taller than
+    wide (sideways text); 180 pages are always turned.
+    """
+    rotation = getattr(page, "rotation", 0) % 360
+    if rotation == 0:
+        return None
+    if rotation in (90, 270):
+        tall = wide = 0
+        for w in words:
+            if len(str(w[4])) < 2:
+                continue
+            if w[3] - w[1] > w[2] - w[0]:
+                tall += 1
+            else:
+                wide += 1
+        if tall <= wide:
+            return None
+    return page.rotation_matrix
+
+
+def _tx_box(x0: float, y0: float, x1: float, y1: float, m: "fitz.Matrix") -> Tuple[float, float, float, float]:
+    # right-angle matrices only: the transformed corners still span the box
+    ax, ay = x0 * m.a + y0 * m.c + m.e, x0 * m.b + y0 * m.d + m.f
+    bx, by = x1 * m.a + y1 * m.c + m.e, x1 * m.b + y1 * m.d + m.f
+    return min(ax, bx), min(ay, by), max(ax, bx), max(ay, by)
+
+
+def _tx_words(words: Sequence, m: "fitz.Matrix") -> List[Word]:
+    return [(*_tx_box(w[0], w[1], w[2], w[3], m), w[4]) for w in words]
+
+
+def _tx_drawings(drawings: list, m: "fitz.Matrix", clip: "fitz.Rect") -> list:
+    """Line/rect items of the paths touching clip (page space), transformed by m."""
+    out = []
+    for path in drawings:
+        pr = path.get("rect")
+        if pr is not None and not fitz.Rect(pr).intersects(clip) and not _is_flat_inside(pr, clip):
+            continue
+        items = []
+        for item in path.get("items", ()):
+            kind = item[0]
+            if kind == "l":
+                (x0, y0), (x1, y1) = item[1], item[2]
+                p0 = (x0 * m.a + y0 * m.c + m.e, x0 * m.b + y0 * m.d + m.f)
+                p1 = (x1 * m.a + y1 * m.c + m.e, x1 * m.b + y1 * m.d + m.f)
+                items.append(("l", p0, p1))
+            elif kind == "re":
+                items.append(("re", _tx_box(*tuple(item[1]), m)))
+        out.append({"rect": _tx_box(*tuple(pr), m) if pr is not None else None, "items": items})
+    return out
+
+
+def clip_drawings(page: "fitz.Page", clip: "fitz.Rect") -> list:
+    """
+    page.get_cdrawings() restricted to paths whose bounds touch clip (unrotated page
+    space). The page's display list is replayed with clip as the cull area, so
+    linework elsewhere on a dense drawing is never turned into path dicts. The
+    replay undoes the page rotation itself; the (possibly shared) page is never
+    modified. Without PyMuPDF's line-art device (a private name) the page's public
+    get_drawings() is filtered instead.
+    """
+    lineart = getattr(fitz, "JM_new_lineart_device_Device", None)
+    if lineart is not None:
+        try:
+            fz_page = mupdf.FzPage(page.this) if isinstance(page.this, mupdf.PdfPage) else page.this
+            dlist = mupdf.fz_new_display_list_from_page(fz_page)
+            m = page.derotation_matrix  # rotated page space -> unrotated
+            prect = page.rect * m
+            out: list = []
+            dev = lineart(out, False, None)
+            dev.ptm = mupdf.FzMatrix(1, 0, 0, -1, 0, prect.y1)
+            mupdf.fz_run_display_list(dlist, dev, mupdf.FzMatrix(m.a, m.b, m.c, m.d, m.e, m.f),
+                                      mupdf.FzRect(*tuple(clip)), mupdf.FzCookie())
+            mupdf.fz_close_device(dev)
+            return out
+        except Exception:
+            pass
+    try:
+        drawings = page.get_drawings()
+    except Exception:
+        return []
+    out = []
+    for path in drawings:
+        pr = path.get("rect")
+        if pr is None or fitz.Rect(pr).intersects(clip) or _is_flat_inside(pr, clip):
+            out.append(path)
+    return out
+
+
+def _cluster(values: Sequence[Tuple[float, float]], tol: float) -> List[Tuple[float, float]]:
+    """Merge (position, coverage) pairs whose positions are within tol; coverage adds up."""
+    out: List[List[float]] = []
+    for pos, cover in sorted(values):
+        if out and pos - out[-1][0] <= tol:
+            out[-1][1] += cover
+        else:
+            out.append([pos, cover])
+    return [(p, c) for p, c in out]
+
+
+def ruling_lines(page: "fitz.Page", clip: "fitz.Rect", drawings: Optional[list] = None) -> Tuple[List[Tuple[float, float]], List[Tuple[float, float]]]:
+    """
+    Axis-aligned line segments inside clip, as (x, vertical coverage) and
+    (y, horizontal coverage) pairs. Rectangles contribute their four edges.
+    """
+    if drawings is None:
+        drawings = clip_drawings(page, clip)
+
+    vert: List[Tuple[float, float]] = []
+    horiz: List[Tuple[float, float]] = []
+
+    def add_segment(x0, y0, x1, y1):
+        if abs(x1 - x0) <= 1.0:
+            lo, hi = max(min(y0, y1), clip.y0), min(max(y0, y1), clip.y1)
+            if hi > lo and clip.x0 <= x0 <= clip.x1:
+                vert.append((x0, hi - lo))
+        elif abs(y1 - y0) <= 1.0:
+            lo, hi = max(min(x0, x1), clip.x0), min(max(x0, x1), clip.x1)
+            if hi > lo and clip.y0 <= y0 <= clip.y1:
+                horiz.append((y0, hi - lo))
+
+    for path in drawings:
+        pr = path.get("rect")
+        if pr is not None and not fitz.Rect(pr).intersects(clip) and not _is_flat_inside(pr, clip):
+            continue
+        for item in path.get("items", ()):
+            kind = item[0]
+            if kind == "l":
+                (x0, y0), (x1, y1) = item[1], item[2]
+                add_segment(x0, y0, x1, y1)
+            elif kind == "re":
+                rx0, ry0, rx1, ry1 = tuple(item[1])
+                if rx1 - rx0 <= 1.0 or ry1 - ry0 <= 1.0:
+                    # thin filled rectangle drawn as a line
+                    add_segment(rx0, ry0, rx1 if rx1 - rx0 > 1.0 else rx0, ry1 if ry1 - ry0 > 1.0 else ry0)
+                else:
+                    add_segment(rx0, ry0, rx0, ry1)
+                    add_segment(rx1, ry0, rx1, ry1)
+                    add_segment(rx0, ry0, rx1, ry0)
+                    add_segment(rx0, ry1, rx1, ry1)
+
+    return _cluster(vert, _MERGE_TOL), _cluster(horiz, _MERGE_TOL)
+
+
+def _is_flat_inside(pr, clip: "fitz.Rect") -> bool:
+    # zero-width/height path rects never "intersect" in fitz terms; test them by point
+    x0, y0, x1, y1 = tuple(pr)
+    return (x0 == x1 or y0 == y1) and clip.x0 <= x1 and x0 <= clip.x1 and clip.y0 <= y1 and y0 <= clip.y1
+
+
+def _group_lines(words: Sequence[Word]) -> List[List[Word]]:
+    """Group words into text lines by vertical overlap."""
+    lines: List[List[Word]] = []
+    cur_y0 = cur_y1 = None
+    for w in sorted(words, key=lambda w: (w[1], w[0])):
+        h = max(w[3] - w[1], 1e-3)
+        if lines and min(cur_y1, w[3]) - max(cur_y0, w[1]) >= 0.5 * min(h, cur_y1 - cur_y0):
+            lines[-1].append(w)
+            cur_y0, cur_y1 = min(cur_y0, w[1]), max(cur_y1, w[3])
+        else:
+            lines.append([w])
+            cur_y0, cur_y1 = w[1], w[3]
+    return lines
+
+
+def _gap_edges(words: Sequence[Word], x0: float, x1: float) -> List[float]:
+    """Column boundaries at vertical whitespace gutters shared by all rows."""
+    spans = sorted((w[0], w[2]) for w in words)
+    edges: List[float] = []
+    reach = None
+    for a, b in spans:
+        if reach is not None and a - reach >= _MIN_GAP:
+            edges.append((reach + a) / 2)
+        reach = b if reach is None else max(reach, b)
+    return [x0] + edges + [x1]
+
+
+def extract_ruled_table(
+    page: "fitz.Page",
+    clip: "fitz.Rect",
+    words: Optional[Sequence] = None,
+    drawings: Optional[list] = None,
+    col_edges: Optional[Sequence[float]] = None,
+    row_rulings: bool = True,
+) -> Optional[RuledTable]:
+    """
+    Slice the clip's words into a grid. Returns None when there is nothing that
+    looks like a table (fewer than 2 rows or 2 columns).
+    Pass `col_edges` (e.g. from a learned layout) to skip column detection, and
+    row_rulings=False to group rows by y-overlap without reading the page's drawings.
+    Returned column edges are x positions in upright space (see upright_matrix()).
+    """
+    if words is None:
+        words = page.get_text("words", clip=clip)
+    words = [(w[0], w[1], w[2], w[3], w[4]) for w in words if str(w[4]).strip()]
+    if len(words) < 2:
+        return None
+
+    m = upright_matrix(page, words)
+    if m is not None:
+        if drawings is None and not (col_edges is not None and not row_rulings):
+            drawings = clip_drawings(page, clip)
+        if drawings is not None:
+            drawings = _tx_drawings(drawings, m, clip)
+        words = _tx_words(words, m)
+        clip = fitz.Rect(_tx_box(*tuple(clip), m))
+
+    wx0 = min(w[0] for w in words); wx1 = max(w[2] for w in words)
+    wy0 = min(w[1] for w in words); wy1 = max(w[3] for w in words)
+
+    fixed_cols = col_edges is not None
+    if fixed_cols and not row_rulings:
+        vert, horiz = [], []
+    else:
+        vert, horiz = ruling_lines(page, clip, drawings)
+
+    # ----- columns -----
+    if fixed_cols:
+        col_edges = list(col_edges)
+        ruled = True
+        # words outside the learned table belong to neighbouring content, not to edge columns
+        words = [w for w in words if col_edges[0] <= (w[0] + w[2]) / 2 <= col_edges[-1]]
+        if len(words) < 2:
+            return None
+    else:
+        v_edges = [x for x, cover in vert if cover >= _MIN_V_COVER * (wy1 - wy0)]
+        ruled = len(v_edges) >= 2
+        if ruled:
+            col_edges = sorted({clip.x0, clip.x1, *v_edges})
+        else:
+            col_edges = _gap_edges(words, clip.x0, clip.x1)
+
+    # ----- rows -----
+    h_edges = [y for y, cover in horiz if cover >= _MIN_H_COVER * (wx1 - wx0)]
+    bands: List[List[Word]]
+    row_ruled = len(h_edges) >= 2
+    if row_ruled:
+        row_edges = sorted({clip.y0, clip.y1, *h_edges})
+        buckets: List[List[Word]] = [[] for _ in range(len(row_edges) - 1)]
+        for w in words:
+            yc = (w[1] + w[3]) / 2
+            i = min(max(bisect.bisect_right(row_edges, yc) - 1, 0), len(buckets) - 1)
+            buckets[i].append(w)
+        bands = [b for b in buckets if b]
+    else:
+        bands = _group_lines(words)
+
+    ncols = len(col_edges) - 1
+    if len(bands) < 2 or ncols < 2:
+        return None
+
+    straddle = 0
+    grid: List[List[List[Word]]] = []
+    for band in bands:
+        cells: List[List[Word]] = [[] for _ in range(ncols)]
+        for w in band:
+            xc = (w[0] + w[2]) / 2
+            ci = min(max(bisect.bisect_right(col_edges, xc) - 1, 0), ncols - 1)
+            if w[0] < col_edges[ci] - 1.0 or w[2] > col_edges[ci + 1] + 1.0:
+                straddle += 1
+            cells[ci].append(w)
+        grid.append(cells)
+
+    # drop outer columns that stayed empty in every row (clip wider than the table);
+    # learned layouts keep their column count so the stored indices stay valid
+    used = [any(row[c] for row in grid) for c in range(ncols)]
+    lo = 0 if fixed_cols else next((i for i, u in enumerate(used) if u), 0)
+    hi = ncols if fixed_cols else ncols - next((i for i, u in enumerate(reversed(used)) if u), 0)
+    grid = [row[lo:hi] for row in grid]
+    col_edges = col_edges[lo:hi + 1]
+    if len(col_edges) - 1 < 2:
+        return None
+
+    rows: List[List[str]] = []
+    for cells in grid:
+        out_row = []
+        for cell in cells:
+            cell_lines = _group_lines(cell)
+            out_row.append(" ".join(
+                " ".join(w[4] for w in sorted(ln, key=lambda w: w[0])) for ln in cell_lines
+            ).strip())
+        rows.append(out_row)
+
+    confidence = 1.0 - straddle / max(len(words), 1)
+    if not row_ruled and any(not all(r) and any(r) for r in rows):
+        # rows from y-overlap split wrapped cells (multi-line descriptions) into
+        # rows of their own; let find_tables() have a look
+        confidence = min(confidence, 0.6)
+    if not ruled:
+        # gutters are a guess; let find_tables() confirm unless it is unavailable
+        confidence = min(confidence, 0.75)
+    return RuledTable(rows=rows, col_edges=col_edges, confidence=confidence, ruled=ruled, row_ruled=row_ruled)
@@ -0,0 +1,338 @@
+# app/infra/spool_cache.py
+"""
+Small JSON caches that live in the run's temp (spool) dir, so results learned by
+one worker are visible to every other worker of the same run.
+
+SpoolCache: one file per key, for the few slots that are overwritten (layout
+templates, strategy reports). Each process keeps an in-memory LRU in front of the
+files; a hit is re-read when another worker has replaced (or deleted) the file since.
+
+SpoolIndex: write-once fingerprint -> result stores (page dedupe, tables, parsed
+revisions), which get an entry per unique page. Each process keeps an index in
+memory and appends its new entries in bulk to a segment file it holds a lock on;
+the other segments are merged into the index as they grow. Segments are reused by
+later workers, so a run has about as many of them as concurrent workers.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.infra.file_lock import try_lock
+
+_MISSING = object()
+
+# one cache object per (root, namespace) and process, so the LRU survives between PDFs;
+# only the current run's caches are kept (a warm worker serves one run after another)
+_REGISTRY: Dict[Tuple[str, str], "SpoolCache"] = {}
+_INDEXES: Dict[Tuple[str, str], "SpoolIndex"] = {}
+
+# SpoolIndex: entries buffered before a bulk append, and how often a miss may look
+# at the other workers' segments (seconds)
+INDEX_FLUSH_EVERY = 64
+INDEX_REFRESH_S = 1.0
+_OFFSET_BITS = 40
+
+
+def _digest(key: str) -> str:
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+class SpoolCache:
+    def __init__(self, root: Path, namespace: str, max_memory: int = 256):
+        self.dir = Path(root) / namespace
+        self.max_memory = max_memory
+        self._mem: "OrderedDict[str, Any]" = OrderedDict()
+        try:
+            self.dir.mkdir(parents=True, exist_ok=True)
+        except Exception:
+            pass
+
+    @classmethod
+    def shared(cls, root: Path, namespace: str) -> "SpoolCache":
+        k = (str(root), namespace)
+        cache = _REGISTRY.get(k)
+        if cache is None:
+            for old in [o for o in _REGISTRY if o[0] != k[0]]:
+                del _REGISTRY[old]  # an earlier run's
+            cache = _REGISTRY[k] = cls(root, namespace)
+        return cache
+
+    @staticmethod
+    def _stamp(path: Path) -> Optional[tuple]:
+        # os.replace() gives every write a new inode, so this changes even where mtime is coarse
+        try:
+            st = os.stat(path)
+            return st.st_ino, st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+
+    # ---------- single values ----------
+    def get(self, key: str, default: Any = None) -> Any:
+        d = _digest(key)
+        path = self.dir / f"{d}.json"
+        hit = self._mem.get(d, _MISSING)
+        stamp = self._stamp(path)
+        if hit is not _MISSING and hit[1] == stamp:
+            self._mem.move_to_end(d)
+            return hit[0]
+        if stamp is None:
+            self._mem.pop(d, None)  # deleted by another worker
+            return default
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                val = json.load(f)
+        except Exception:
+            return default
+        self._remember(d, val, stamp)
+        return val
+
+    def put(self, key: str, value: Any) -> None:
+        d = _digest(key)
+        path = self.dir / f"{d}.json"
+        self._write(path, value)
+        self._remember(d, value, self._stamp(path))
+
+    def delete(self, key: str) -> None:
+        d = _digest(key)
+        self._mem.pop(d, None)
+        try:
+            (self.dir / f"{d}.json").unlink(missing_ok=True)
+        except Exception:
+            pass
+
+    # ---------- multi-writer lists (one file per entry, no read-modify-write races) ----------
+    def append(self, key: str, value: Any) -> None:
+        self._write(self.dir / f"{_digest(key)}.{uuid.uuid4().hex}.item", value)
+
+    def collect(self, key: str, limit: Optional[int] = None) -> List[Any]:
+        # scandir streams the listing, so `limit` also bounds how much of a big dir is listed
+        prefix = f"{_digest(key)}."
+        out = []
+        n = 0
+        try:
+            with os.scandir(self.dir) as it:
+                for entry in it:
+                    if not (entry.name.startswith(prefix) and entry.name.endswith(".item")):
+                        continue
+                    if limit is not None and n >= limit:
+                        break
+                    n += 1
+                    try:
+                        with open(entry.path, "r", encoding="utf-8") as f:
+                            out.append(json.load(f))
+                    except Exception:
+                        pass
+        except OSError:
+            pass
+        return out
+
+    # ---------- internals ----------
+    def _remember(self, d: str, value: Any, stamp: Optional[tuple]) -> None:
+        self._mem[d] = (value, stamp)
+        self._mem.move_to_end(d)
+        while len(self._mem) > self.max_memory:
+            self._mem.popitem(last=False)
+
+    @staticmethod
+    def _write(path: Path, value: Any) -> None:
+        tmp = path.with_name(path.name + f".{os.getpid()}.tmp")
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(value, f)
+            os.replace(tmp, path)  # atomic: readers never see half a file
+        except Exception:
+            try:
+                tmp.unlink(missing_ok=True)
+            except Exception:
+                pass
+
+
+class SpoolIndex:
+    """
+    Write-once store: every writer of a key puts the same value (it is derived from
+    the key's content), so entries are never invalidated. Lines in the segment files
+    are ["<sha1 of key>", value]; a torn last line (crashed worker) is skipped.
+    """
+    def __init__(self, root: Path, namespace: str, max_memory: int = 256):
+        self.dir = Path(root) / namespace
+        self.max_memory = max_memory
+        self._index: Dict[int, int] = {}      # first 64 bits of the digest -> segment << 40 | offset
+        self._offsets: Dict[int, int] = {}    # segment -> bytes merged into the index
+        self._mem: "OrderedDict[str, Any]" = OrderedDict()  # recently used values
+        self._pending: Dict[str, Any] = {}    # written on the next flush
+        self._seg: Optional[Tuple[int, Path, Any]] = None   # (number, path, held lock)
+        self._refreshed = 0.0
+        try:
+            self.dir.mkdir(parents=True, exist_ok=True)
+        except Exception:
+            pass
+
+    @classmethod
+    def shared(cls, root: Path, namespace: str) -> "SpoolIndex":
+        k = (str(root), namespace)
+        index = _INDEXES.get(k)
+        if index is None:
+            for old in [o for o in _INDEXES if o[0] != k[0]]:
+                _INDEXES.pop(old).close()  # an earlier run's
+            index = _INDEXES[k] = cls(root, namespace)
+        return index
+
+    def get(self, key: str, default: Any = None) -> Any:
+        d = _digest(key)
+        if d in self._pending:
+            return self._pending[d]
+        hit = self._mem.get(d, _MISSING)
+        if hit is not _MISSING:
+            self._mem.move_to_end(d)
+            return hit
+        h = int(d[:16], 16)
+        loc = self._index.get(h)
+        if loc is None and time.monotonic() - self._refreshed >= INDEX_REFRESH_S:
+            self._refresh()
+            loc = self._index.get(h)
+        if loc is None:
+            return default
+        val = self._read_at(loc, d)
+        if val is _MISSING:
+            return default
+        self._remember(d, val)
+        return val
+
+    def put(self, key: str, value: Any) -> None:
+        d = _digest(key)
+        self._pending[d] = value
+        self._remember(d, value)
+        if len(self._pending) >= INDEX_FLUSH_EVERY:
+            self.flush()
+
+    def flush(self) -> None:
+        """Append the buffered entries to this process's segment in one write."""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        seg = self._claim()
+        if seg is None:
+            return  # entries stay in this process's LRU only
+        n, path, _ = seg
+        lines = [(d, (json.dumps([d, v], separators=(",", ":")) + "\n").encode("utf-8"))
+                 for d, v in pending.items()]
+        try:
+            with open(path, "ab") as f:
+                pos = f.seek(0, os.SEEK_END)
+                f.write(b"".join(line for _, line in lines))
+        except Exception:
+            return
+        for d, line in lines:
+            self._index[int(d[:16], 16)] = (n << _OFFSET_BITS) | pos
+            pos += len(line)
+        self._offsets[n] = pos
+
+    def close(self) -> None:
+        """Flush and give the segment back (the next task or worker may take it)."""
+        try:
+            self.flush()
+        finally:
+            if self._seg is not None:
+                try:
+                    self._seg[2].close()
+                except Exception:
+                    pass
+                self._seg = None
+
+    # ---------- internals ----------
+    def _claim(self) -> Optional[Tuple[int, Path, Any]]:
+        if self._seg is not None:
+            return self._seg
+        for n in range(4096):
+            held = try_lock(self.dir / f"seg-{n}.lock")
+            if held is not None:
+                break
+        else:
+            return None
+        path = self.dir / f"seg-{n}.jsonl"
+        self._refresh()  # what earlier holders wrote is merged before we append
+        try:
+            size = path.stat().st_size
+        except OSError:
+            size = 0  # new segment
+        if size:
+            try:
+                with open(path, "rb+") as f:
+                    f.seek(size - 1)
+                    if f.read(1) != b"\n":
+                        f.write(b"\n")  # end a torn line so ours start clean
+                        size += 1
+            except OSError:
+                pass
+        self._offsets[n] = size
+        self._seg = (n, path, held)
+        return self._seg
+
+    def _refresh(self) -> None:
+        self._refreshed = time.monotonic()
+        try:
+            names = os.listdir(self.dir)
+        except OSError:
+            return
+        own = self._seg[0] if self._seg is not None else None
+        for name in names:
+            if not (name.startswith("seg-") and name.endswith(".jsonl")):
+                continue
+            try:
+                n = int(name[4:-6])
+            except ValueError:
+                continue
+            if n == own:
+                continue  # indexed as written
+            start = self._offsets.get(n, 0)
+            path = self.dir / name
+            try:
+                if os.path.getsize(path) <= start:
+                    continue
+                with open(path, "rb") as f:
+                    f.seek(start)
+                    data = f.read()
+            except OSError:
+                continue
+            end = data.rfind(b"\n") + 1  # complete lines only
+            pos = start
+            for line in data[:end].splitlines(keepends=True):
+                # the key is at a fixed place: no need to parse the value
+                if line[:2] == b'["' and line[42:44] == b'",':
+                    try:
+                        self._index[int(line[2:18], 16)] = (n << _OFFSET_BITS) | pos
+                    except ValueError:
+                        pass
+                pos += len(line)
+            self._offsets[n] = start + end
+
+    def _read_at(self, loc: int, d: str) -> Any:
+        n, pos = loc >> _OFFSET_BITS, loc & ((1 << _OFFSET_BITS) - 1)
+        try:
+            with open(self.dir / f"seg-{n}.jsonl", "rb") as f:
+                f.seek(pos)
+                key, val = json.loads(f.readline())
+        except Exception:
+            return _MISSING
+        return val if key == d else _MISSING  # 64-bit index collision
+
+    def _remember(self, d: str, value: Any) -> None:
+        self._mem[d] = value
+        self._mem.move_to_end(d)
+        while len(self._mem) > self.max_memory:
+            self._mem.popitem(last=False)
+
+
+def close_indexes() -> None:
+    """End of a task: write out every index's buffer and release the segments."""
+    for index in list(_INDEXES.values()):
+        try:
+            index.close()
+        except Exception:
+            pass
@@ -0,0 +1,204 @@
+# app/infra/staging.py
+"""
+Local staging of PDFs that live on slow (network) shares. The run's parent copies
+upcoming PDFs with a few threads into a local dir, bounded by a byte cap; workers
+open the staged copy when it is there and fall back to the share otherwise.
+Copies of finished PDFs stay around (LRU) until the space is needed, so a retried
+PDF does not go back to the share. A run holds a lock on its staging dir; dirs
+nobody holds (left by a crashed run) are swept when the next run starts.
+"""
+from __future__ import annotations
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+from app.infra.file_lock import try_lock
+
+logger = logging.getLogger(__name__)
+
+# "auto" = only when the PDFs sit on a network filesystem, "1" = always, "0" = never
+PREFETCH = os.getenv("PREFETCH", "auto").strip().lower()
+PREFETCH_MAX_MB = int(os.getenv("PREFETCH_MAX_MB", "2048"))
+PREFETCH_THREADS = int(os.getenv("PREFETCH_THREADS", "4"))
+# where staged copies go (default: the OS temp dir)
+PREFETCH_DIR = os.getenv("PREFETCH_DIR", "")
+
+_CHUNK = 4 * 1024 * 1024
+_LOCK = ".lock"
+_NETWORK_FS = {"cifs", "smb3", "smbfs", "nfs", "nfs4", "afs", "9p", "fuse.sshfs", "fuse.rclone", "davfs"}
+
+
+def staged_path(staging_dir: Optional[str], prefix: str) -> Optional[Path]:
+    """Worker side: the local copy for this PDF, if it finished staging."""
+    if not staging_dir:
+        return None
+    p = Path(staging_dir) / f"{prefix}.pdf"
+    return p if p.is_file() else None
+
+
+def sweep_staging(base: Path) -> None:
+    """Drop staging dirs whose run is gone (a live run holds its dir's lock)."""
+    try:
+        dirs = [d for d in base.iterdir() if d.is_dir()]
+    except OSError:
+        return
+    for d in dirs:
+        held = try_lock(d / _LOCK)
+        if held is None:
+            continue  # another run is using it
+        held.close()
+        shutil.rmtree(d, ignore_errors=True)
+        logger.info("Removed stale staging dir %s", d)
+
+
+def is_remote(path: Path) -> bool:
+    """Best effort: UNC paths / network drives on Windows, network mounts on Linux."""
+    try:
+        s = str(Path(path).resolve())
+    except Exception:
+        s = str(path)
+    if sys.platform.startswith("win"):
+        if s.startswith("\\\\"):
+            return True
+        try:
+            import ctypes
+            return ctypes.windll.kernel32.GetDriveTypeW(s[:3]) == 4  # DRIVE_REMOTE
+        except Exception:
+            return False
+    try:
+        best, fstype = "", ""
+        with open("/proc/mounts", "r", encoding="utf-8") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) < 3:
+                    continue
+                mnt = parts[1].replace("\\040", " ")
+                if (s == mnt or s.startswith(mnt.rstrip("/") + "/")) and len(mnt) > len(best):
+                    best, fstype = mnt, parts[2]
+        return fstype in _NETWORK_FS
+    except Exception:
+        return False
+
+
+def wants_prefetch(pdf_root: Path) -> bool:
+    if PREFETCH in ("0", "off", "false", "no"):
+        return False
+    if PREFETCH in ("1", "on", "true", "yes"):
+        return True
+    return is_remote(pdf_root)
+
+
+class PdfStager:
+    """
+    Copies (path, prefix) items in order to <root>/<prefix>.pdf, at most `threads` at
+    a time and `max_bytes` on disk. Copies of released (finished) PDFs are evicted
+    oldest first; a PDF that does not fit (or fails to copy) is simply not staged.
+    """
+    def __init__(self, root: Path, max_bytes: int = PREFETCH_MAX_MB * 1024 * 1024,
+                 threads: int = PREFETCH_THREADS):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._held = try_lock(self.root / _LOCK)  # tells the sweep of other runs we are alive
+        self.max_bytes = max_bytes
+        self._cond = threading.Condition()
+        self._sizes: dict = {}                       # prefix -> bytes on disk (or reserved)
+        self._released: "OrderedDict[str, None]" = OrderedDict()  # evictable, oldest first
+        self._bytes = 0
+        self._closed = False
+        self._pool = ThreadPoolExecutor(max(1, threads), thread_name_prefix="xtractor-stage")
+        self.staged = 0
+
+    def stage(self, items: Iterable[Tuple[Path, str]]) -> None:
+        for path, prefix in items:
+            self._pool.submit(self._copy, Path(path), prefix)
+
+    def release(self, prefix: str) -> None:
+        """The PDF's task finished: its copy may be evicted (not deleted yet, a retry may want it)."""
+        with self._cond:
+            self._released[prefix] = None  # also stops a copy that is still queued
+            self._cond.notify_all()
+
+    def _evict_one(self) -> bool:
+        for prefix in self._released:
+            size = self._sizes.pop(prefix, None)
+            if size is None:
+                continue
+            del self._released[prefix]
+            self._bytes -= size
+            try:
+                (self.root / f"{prefix}.pdf").unlink(missing_ok=True)
+            except Exception:
+                pass
+            return True
+        return False
+
+    def _copy(self, src: Path, prefix: str) -> None:
+        try:
+            size = src.stat().st_size
+        except OSError:
+            return  # the worker reports the missing file
+        if size > self.max_bytes:
+            return
+        with self._cond:
+            while True:
+                if self._closed or prefix in self._released:
+                    return  # cancelled, or the worker already did it from the share
+                if self._bytes + size <= self.max_bytes:
+                    break
+                if not self._evict_one():
+                    self._cond.wait(0.5)  # full of copies still to be used
+            self._sizes[prefix] = size
+            self._bytes += size
+        dst = self.root / f"{prefix}.pdf"
+        part = dst.with_name(dst.name + ".part")
+        try:
+            with open(src, "rb") as fi, open(part, "wb") as fo:
+                while not self._closed:
+                    chunk = fi.read(_CHUNK)  # large sequential reads suit SMB far better than MuPDF's seeks
+                    if not chunk:
+                        break
+                    fo.write(chunk)
+            if self._closed:
+                raise RuntimeError("cancelled")
+            os.replace(part, dst)  # workers only ever see complete copies
+            with self._cond:
+                self.staged += 1
+        except Exception as e:
+            logger.debug("Staging %s failed: %s", src, e)
+            try:
+                part.unlink(missing_ok=True)
+            except Exception:
+                pass
+            with self._cond:
+                if self._sizes.pop(prefix, None) is not None:
+                    self._bytes -= size
+                self._cond.notify_all()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        if self._held is not None:
+            self._held.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def stager_for(pdf_root: Path, token: str) -> Optional[PdfStager]:
+    """A stager for this run, or None when prefetching is off / not worth it."""
+    base = Path(PREFETCH_DIR) if PREFETCH_DIR else Path(tempfile.gettempdir()) / "xtractor-staging"
+    sweep_staging(base)  # copies a crashed run left behind
+    if PREFETCH_MAX_MB <= 0 or not wants_prefetch(pdf_root):
+        return None
+    try:
+        return PdfStager(base / token)
+    except Exception:
+        logger.exception("PDF staging unavailable")
+        return None
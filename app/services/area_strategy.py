@@ -0,0 +1,107 @@
+# app/services/area_strategy.py
+"""
+Per-area extraction strategy learned while the run goes. Each area keeps counts of
+which tier (text layer, SHX annotations, OCR) produced its text. After a warm-up,
+tiers that never succeed for an area are skipped; every RECHECK_EVERY-th page of an
+area runs the full chain again so a changing drawing set is noticed.
+Counts are pooled across workers through the spool dir.
+"""
+from __future__ import annotations
+import os
+from typing import Dict, List, Optional
+
+from app.infra.spool_cache import SpoolCache
+
+TIERS = ("text", "shx", "ocr")
+
+# pages per area before any tier may be skipped
+WARMUP_PAGES = int(os.getenv("AREA_WARMUP_PAGES", "20"))
+# run the full chain every n-th page of an area to re-check a skip
+RECHECK_EVERY = int(os.getenv("AREA_RECHECK_EVERY", "50"))
+
+_STATS_KEY = "area-stats"
+# worker reports read as prior (enough to decide; keeps big runs from re-reading everything)
+PRIOR_REPORTS = 200
+
+# spool dir -> counts this process has seen: read once per worker and run, then this
+# worker's own flushes are added in memory (no re-listing of the reports per PDF)
+_PRIOR: Dict[str, List[Dict[str, int]]] = {}
+
+
+def _empty() -> Dict[str, int]:
+    return {"pages": 0, **{f"{t}_tried": 0 for t in TIERS}, **{f"{t}_hits": 0 for t in TIERS}}
+
+
+def decide(stats: Dict[str, int]) -> Dict[str, bool]:
+    """Tier -> run it? (all True until the warm-up is over)"""
+    run = {t: True for t in TIERS}
+    if stats.get("pages", 0) < WARMUP_PAGES:
+        return run
+    for t in TIERS:
+        if stats.get(f"{t}_tried", 0) >= WARMUP_PAGES and stats.get(f"{t}_hits", 0) == 0:
+            run[t] = False
+    return run
+
+
+class AreaStrategy:
+    def __init__(self, n_areas: int, cache: Optional[SpoolCache] = None):
+        self.cache = cache
+        self.local: List[Dict[str, int]] = [_empty() for _ in range(n_areas)]
+        # counts other workers reported before this one started
+        self.prior: List[Dict[str, int]] = [_empty() for _ in range(n_areas)]
+        if cache is not None:
+            key = str(cache.dir)
+            if key not in _PRIOR or len(_PRIOR[key]) != n_areas:
+                _PRIOR.clear()  # one run at a time per process
+                for item in cache.collect(_STATS_KEY, limit=PRIOR_REPORTS):
+                    _add_into(self.prior, item)
+                _PRIOR[key] = self.prior
+            self.prior = _PRIOR[key]
+
+    def _stats(self, idx: int) -> Dict[str, int]:
+        return {k: self.prior[idx][k] + self.local[idx][k] for k in self.local[idx]}
+
+    def plan(self, idx: int) -> Dict[str, bool]:
+        stats = self._stats(idx)
+        if RECHECK_EVERY > 0 and stats["pages"] >= WARMUP_PAGES and stats["pages"] % RECHECK_EVERY == 0:
+            return {t: True for t in TIERS}
+        return decide(stats)
+
+    def record(self, idx: int, tried: List[str], hit: Optional[str]) -> None:
+        s = self.local[idx]
+        s["pages"] += 1
+        for t in tried:
+            s[f"{t}_tried"] += 1
+        if hit:
+            s[f"{hit}_hits"] += 1
+
+    def flush(self) -> None:
+        """Publish this worker's counts for the workers that start after it."""
+        if self.cache is not None and any(s["pages"] for s in self.local):
+            self.cache.append(_STATS_KEY, self.local)
+            _add_into(self.prior, self.local)  # the next PDF of this worker still counts them
+            self.local = [_empty() for _ in self.local]
+
+
+def _add_into(acc: List[Dict[str, int]], item) -> None:
+    if not isinstance(item, list):
+        return
+    for i, s in enumerate(item[:len(acc)]):
+        if isinstance(s, dict):
+            for k in acc[i]:
+                acc[i][k] += int(s.get(k, 0) or 0)
+
+
+def run_summary(cache: SpoolCache, titles: List[str]) -> List[str]:
+    """One line per area: tier hit rates and the tiers the run ended up skipping."""
+    totals = [_empty() for _ in titles]
+    for item in cache.collect(_STATS_KEY):
+        _add_into(totals, item)
+    lines = []
+    for title, s in zip(titles, totals):
+        if not s["pages"]:
+            continue
+        rates = ", ".join(f"{t} {s[f'{t}_hits']}/{s[f'{t}_tried']}" for t in TIERS)
+        skipped = [t for t, run in decide(s).items() if not run]
+        lines.append(f"{title}: {s['pages']} pages; {rates}; skipping: {', '.join(skipped) or 'none'}")
+    return lines
@@ -0,0 +1,106 @@
+# app/services/dpi_tuner.py
+from __future__ import annotations
+import dataclasses
+import difflib
+import logging
+import os
+import re
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import pymupdf as fitz
+
+from app.domain.models import ExtractionRequest
+from app.infra.ocr_adapter import OcrAdapter
+from app.infra.pdf_adapter import PdfAdapter
+
+logger = logging.getLogger(__name__)
+
+# Ascending resolutions tried per area; anything above the user's DPI is dropped.
+DPI_LADDER = (150, 200, 300, 450, 600, 900, 1200)
+
+# Two consecutive renders whose OCR text is at least this similar count as stable.
+# (MuPDF's OCR device exposes no per-word confidence, so agreement between
+# neighbouring resolutions is used as the stability signal.)
+STABLE_RATIO = 0.97
+
+
+def _norm(text: str) -> str:
+    t = (text or "").replace("_OCR_", "")
+    return re.sub(r"\s+", " ", t).strip().upper()
+
+
+def sample_paths(pdf_paths: Sequence[Path], n: int) -> List[Path]:
+    """Pick n paths spread evenly over the list (first file always included)."""
+    if n <= 0 or not pdf_paths:
+        return []
+    if len(pdf_paths) <= n:
+        return list(pdf_paths)
+    step = len(pdf_paths) / n
+    return [pdf_paths[int(i * step)] for i in range(n)]
+
+
+def _stable_dpi(ocr: OcrAdapter, page: "fitz.Page", clip: "fitz.Rect", ladder: Sequence[int]) -> Optional[int]:
+    """
+    OCR the clip at ascending DPIs and return the lowest DPI whose text matches the
+    next step up. None when the area stayed blank at every resolution.
+    """
+    prev_dpi, prev_txt = None, None
+    for dpi in ladder:
+        try:
+            txt = _norm(ocr.ocr_clip_to_text(page, tuple(clip), dpi, None))
+        except Exception as exc:
+            logger.debug("DPI tuner: OCR failed at %s DPI: %s", dpi, exc)
+            txt = ""
+        if prev_txt and txt:
+            if difflib.SequenceMatcher(None, prev_txt, txt).ratio() >= STABLE_RATIO:
+                return prev_dpi
+        prev_dpi, prev_txt = dpi, txt
+    # never stabilised: keep the highest resolution that produced anything
+    return prev_dpi if prev_txt else None
+
+
+def calibrate_area_dpis(req: ExtractionRequest, sample_size: Optional[int] = None) -> ExtractionRequest:
+    """
+    Return a copy of `req` whose areas carry their own `ocr_dpi`, chosen as the
+    cheapest stable resolution over a few sampled PDFs. Areas that already have
+    an explicit DPI are left alone; areas with no OCR-able content keep the global DPI.
+    """
+    sample_size = sample_size or int(os.getenv("OCR_DPI_SAMPLES", "3"))
+    max_dpi = max(1, int(req.ocr.dpi or 150))
+    ladder = [d for d in DPI_LADDER if d <= max_dpi] or [max_dpi]
+    if max_dpi > ladder[-1]:
+        ladder.append(max_dpi)
+
+    pending = [i for i, a in enumerate(req.areas) if not a.ocr_dpi]
+    if not pending:
+        return req
+
+    pdf = PdfAdapter()
+    ocr = OcrAdapter(req.ocr.tessdata_dir, binarize=req.ocr.binarize)
+    votes: dict[int, list[int]] = {i: [] for i in pending}
+
+    for path in sample_paths([Path(p) for p in req.pdf_paths], sample_size):
+        try:
+            with pdf.open(path, req.layers_include, req.layers_exclude) as doc:
+                if doc.page_count == 0:
+                    continue
+                page = doc[0]
+                for i in pending:
+                    clip = fitz.Rect(req.areas[i].rect).normalize() & page.rect
+                    if clip.is_empty or clip.width < 2 or clip.height < 2:
+                        continue
+                    dpi = _stable_dpi(ocr, page, clip, ladder)
+                    if dpi is not None:
+                        votes[i].append(dpi)
+        except Exception as exc:
+            logger.warning("DPI tuner: skipping sample %s: %s", path, exc)
+
+    areas = list(req.areas)
+    for i, dpis in votes.items():
+        # the most demanding sample wins so small-font pages stay readable
+        chosen = max(dpis) if dpis else max_dpi
+        areas[i] = dataclasses.replace(areas[i], ocr_dpi=chosen)
+        logger.info("DPI tuner: area '%s' -> %s DPI (samples=%s)", areas[i].title, chosen, dpis)
+
+    return dataclasses.replace(req, areas=areas)
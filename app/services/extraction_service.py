@@ -1,21 +1,31 @@
 # app/services/extraction_service.py
 from __future__ import annotations
-import csv, gc, os, secrets, shutil
+import csv, gc, logging, os, secrets, shutil, tempfile, threading, time
 from datetime import datetime
 from pathlib import Path
 from typing import Callable, Iterable, Optional, Tuple
 
-from app.domain.models import ExtractionRequest, AreaSpec
-from app.infra.pdf_adapter import PdfAdapter
+from app.domain.models import ExtractionRequest, AreaSpec, InlineResult
+from app.domain.events import ExtractionEvent, FileDone, FileFailed, PhaseChanged, Progress, RunStarted, RunSummary, RunWarning
+from app.infra.pdf_adapter import PAGE_SCANNED, READ_MODE, PdfAdapter, ReadAhead, install_read_ahead, warm_os_cache
 from app.infra.ocr_adapter import OcrAdapter
 from app.services.revision_parser import RevisionParser
-from app.infra.excel_writer import write_from_csv
+from app.infra.spool_cache import SpoolCache, SpoolIndex, close_indexes
+from app.infra.staging import staged_path, stager_for
+from app.services.area_strategy import AreaStrategy, run_summary
+from app.services.table_layout import TableLayout, TableLayoutLearner, layout_key
 
 from app.common.geometry import adjust_coordinates_for_rotation
+from app.worker import Cancelled, cancel_requested, install_cancel, task_started, worker_context
+from app.services.task_runner import OneShotPools, TaskRunner, is_transient, run_with_retries, task_key
+from app.services.run_manifest import RunManifest, sweep_stale, valid_token
+from app.services.spool import all_bases, disk_base, find_run
 
 
 import pymupdf as fitz
 
+logger = logging.getLogger(__name__)
+
 # ===== Helpers (kept top-level for Windows pickling) =====
 
 def _open_temp_writers(temp_dir: Path, unid_prefix: str):
@@ -30,12 +40,54 @@ def _process_single_pdf_star(args):
     Safe wrapper for pool: never raises; returns dict with only primitives.
     """
     pdf_path, req, temp_dir, prefix = args
+    if cancel_requested():
+        return {"ok": False, "cancelled": True, "path": str(pdf_path)}  # queued before the cancel
+    task_started(task_key(temp_dir, prefix))
+    if req.get("read_next"):
+        warm_os_cache(req["read_next"])  # a later task's PDF, for whichever worker gets it
+    t0 = time.perf_counter()
     try:
         pages = _process_single_pdf(pdf_path, req, temp_dir, prefix)
-        return {"ok": True, "pages": int(pages)}
+        return {"ok": True, "pages": int(pages), "path": str(pdf_path), "prefix": prefix,
+                "seconds": time.perf_counter() - t0, "cancelled": cancel_requested()}
+    except MemoryError as e:
+        return {"ok": False, "error": f"MemoryError: {e}", "path": str(pdf_path), "oom": True}
     except Exception as e:
         # strip to a plain string so it's 100% picklable
-        return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        return {"ok": False, "error": f"{type(e).__name__}: {e}", "path": str(pdf_path),
+                "transient": is_transient(e)}
+
+class _CancelWatch:
+    """Polls should_cancel on a thread and sets `event`, which workers check between pages."""
+    def __init__(self, should_cancel: Optional[Callable[[], bool]], event, interval: float = 0.1):
+        self.should_cancel = should_cancel
+        self.event = event
+        self.interval = interval
+        self._stop = threading.Event()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if self.should_cancel():
+                    self.event.set()
+                    return
+            except Exception:
+                return
+
+    def __enter__(self):
+        if self.should_cancel is not None:
+            threading.Thread(target=self._run, name="cancel-watch", daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+
+def _notify(on_event: Optional[Callable[[ExtractionEvent], None]], ev: ExtractionEvent) -> None:
+    if on_event:
+        try:
+            on_event(ev)
+        except Exception:
+            pass
 
 def _sanitize_clip(clip: tuple, page_rect: tuple[float, float, float, float]) -> Optional[tuple[float, float, float, float]]:
     """
@@ -63,6 +115,19 @@ def _sanitize_clip(clip: tuple, page_rect: tuple[float, float, float, float]) ->
     except Exception:
         return None
 
+def _parse_rows_cached(parser: RevisionParser, cache: Optional[SpoolIndex], fingerprint: Optional[str],
+                       tag: str, rows: list, **kwargs) -> list:
+    """parse_table_rows() memoised on the table's content fingerprint (+ how it was parsed)."""
+    key = f"{fingerprint}|{tag}" if (cache is not None and fingerprint) else None
+    hit = cache.get(key) if key else None
+    if isinstance(hit, dict):
+        parser.last_indices = tuple(hit.get("idx") or (None, None, None))
+        return hit.get("revs") or []
+    revs = parser.parse_table_rows(rows, **kwargs)
+    if key:
+        cache.put(key, {"revs": revs, "idx": list(parser.last_indices)})
+    return revs
+
 def _rel_folder(pdf_path: Path, root: Path) -> str:
     try:
         return os.path.relpath(pdf_path.parent, root)
@@ -106,25 +171,258 @@ def _prepare_headers(areas: Iterable[AreaSpec]) -> Tuple[list[str], dict]:
         unique[i] = u
     return headers, unique
 
+class _PageReader:
+    """Readers and settings of one PDF's task; read() does the area and revision reads of a page."""
+
+    def __init__(self, req: dict, temp_dir: Path, pdf_path: Path):
+        self.revision_rect: Optional[tuple] = req.get("rev_area_rect")
+        # identical title blocks (same words in the revision clip) are detected/parsed once per run
+        self.pdf = PdfAdapter(SpoolIndex.shared(temp_dir, "tables") if self.revision_rect else None)
+        self.parsed_cache = SpoolIndex.shared(temp_dir, "parsed") if self.revision_rect else None
+        self.ocr = OcrAdapter(req["ocr_tess"], binarize=bool(req.get("ocr_binarize")))
+        self.parser = RevisionParser(req.get("rev_regex"))
+        self.manual_rev_idx = req.get("rev_column_index")
+        self.manual_desc_idx = req.get("rev_description_index")
+        self.manual_date_idx = req.get("rev_date_index")
+
+        self.areas_rects: list[tuple] = list(req["areas_rects"])
+        self.areas_dpis: list = list(req.get("areas_dpis") or [None] * len(self.areas_rects))
+        self.ocr_mode = req["ocr_mode"]
+        self.dpi = max(1, int(req["ocr_dpi"] or 150))
+        self.scale = req.get("ocr_scale")
+        # revision-table templates shared by all workers through the spool dir
+        self.layouts = TableLayoutLearner(SpoolCache.shared(temp_dir, "layouts")) if self.revision_rect else None
+        # which text tiers pay off per area (pooled across workers)
+        self.strategy = AreaStrategy(len(self.areas_rects), SpoolCache.shared(temp_dir, "strategy"))
+
+        self.temp_dir = temp_dir
+        self.pdf_path = pdf_path
+        self.image_gc_counter = 0
+
+    def read(self, page, page_no: int, page_rect: tuple, rotation: int, skip=()) -> Tuple[list, list]:
+        """(area_texts, revisions) of the page; areas in `skip` come back as None."""
+        return (self.read_areas(page, page_no, page_rect, rotation, skip),
+                self.read_revisions(page, page_rect, rotation))
+
+    def read_areas(self, page, page_no: int, page_rect: tuple, rotation: int, skip=()) -> list:
+        pdf, ocr, strategy = self.pdf, self.ocr, self.strategy
+        ocr_mode, dpi, scale = self.ocr_mode, self.dpi, self.scale
+        pw, ph = (page_rect[2] - page_rect[0], page_rect[3] - page_rect[1])
+        shx_annots = None  # SHX annotations, collected once per page on first need
+
+        # scanned pages skip the text layer; everything else keeps the OCR
+        # fallback (SHX text drawn as linework has no text layer either)
+        scanned = ocr_mode in ("Default", "Text1st+Image-beta") and \
+            pdf.classify_page(page) == PAGE_SCANNED
+
+        area_texts: list[str] = []
+        for idx, raw in enumerate(self.areas_rects):
+            if idx in skip:
+                area_texts.append(None)  # filled from the document value on write
+                continue
+
+            # Text should use rotation-adjusted rect
+            adj = adjust_coordinates_for_rotation(raw, rotation, ph, pw)
+
+            clip_img = _sanitize_clip(raw, page_rect)  # for pixmap & OCR (raw like legacy)
+            area_dpi = self.areas_dpis[idx] or dpi
+
+            text_area = ""
+            try:
+                if ocr_mode == "Default":
+                    # tiers this area still runs (all of them during warm-up / re-checks)
+                    plan = strategy.plan(idx)
+                    tried, hit = [], None
+
+                    # scans have no text layer: straight to OCR
+                    if not scanned and plan["text"]:
+                        tried.append("text")
+                        text_area = pdf.get_text(page, adj)
+                        hit = "text" if text_area.strip() else None
+
+                    if not hit and not scanned and plan["shx"]:
+                        # AutoCAD SHX text: real strings live in annotations
+                        if shx_annots is None:
+                            shx_annots = pdf.shx_annotations(page)
+                        tried.append("shx")
+                        text_area = pdf.get_shx_text(page, adj, shx_annots)
+                        hit = "shx" if text_area.strip() else None
+
+                    if not hit and clip_img and (scanned or plan["ocr"]):
+                        # OCR on the image crop (raw coords)
+                        tried.append("ocr")
+                        text_area = ocr.ocr_clip_to_text(page, clip_img, area_dpi, scale)
+                        hit = "ocr" if text_area.strip() else None
+
+                    if not scanned:
+                        strategy.record(idx, tried, hit)
+
+                elif ocr_mode == "OCR-All":
+                    if clip_img:
+                        text_area = ocr.ocr_clip_to_text(page, clip_img, area_dpi, scale)
+                    else:
+                        text_area = ""
+
+                elif ocr_mode == "Text1st+Image-beta":
+                    # 1) text first with adjusted rect
+
+                    plan = strategy.plan(idx)
+                    tried, hit = [], None
+                    if not scanned and plan["text"]:
+                        tried.append("text")
+                        text_area = pdf.get_text(page, adj)
+                        hit = "text" if text_area.strip() else None
+                    if not hit and not scanned and plan["shx"]:
+                        if shx_annots is None:
+                            shx_annots = pdf.shx_annotations(page)
+                        tried.append("shx")
+                        text_area = pdf.get_shx_text(page, adj, shx_annots)
+                        hit = "shx" if text_area.strip() else None
+
+                    # 2) always save image using the raw rect (visual orientation)
+                    if clip_img:
+                        try:
+                            pix = pdf.render_pixmap(page, clip_img, dpi=dpi, scale=scale)
+                            out_img = self.temp_dir / f"{self.pdf_path.name}_page{page_no + 1}_area{idx}.png"
+                            pix.save(str(out_img))
+                        finally:
+                            try:
+                                del pix
+                            except Exception:
+                                pass
+                            self.image_gc_counter += 1
+                            if self.image_gc_counter % 20 == 0:
+                                try:
+                                    gc.collect()
+                                except Exception:
+                                    pass
+                        # 30MB guard
+                        try:
+                            if out_img.stat().st_size > 30 * 1024 * 1024:
+                                out_img.unlink(missing_ok=True)
+                        except Exception:
+                            pass
+
+                    # 3) OCR fallback on the same image crop (raw rect)
+                    if not hit and clip_img and (scanned or plan["ocr"]):
+                        tried.append("ocr")
+                        try:
+                            text_area = ocr.ocr_clip_to_text(page, clip_img, area_dpi, scale)
+                            hit = "ocr" if text_area.strip() else None
+                        except Cancelled:
+                            raise
+                        except Exception:
+                            text_area = "OCR_ERROR"
+                    if not scanned:
+                        strategy.record(idx, tried, hit)
+
+                else:
+                    # Fallback mode: plain text with adjusted rect
+                    text_area = pdf.get_text(page, adj)
+
+            except Cancelled:
+                raise
+            except Exception:
+                text_area = ""
+
+            area_texts.append(_clean_text(text_area) if text_area.strip() else "")
+        return area_texts
+
+    def read_revisions(self, page, page_rect: tuple, rotation: int) -> list:
+        if not self.revision_rect:
+            return []
+        pdf, parser, layouts = self.pdf, self.parser, self.layouts
+        manual_rev_idx, manual_desc_idx, manual_date_idx = self.manual_rev_idx, self.manual_desc_idx, self.manual_date_idx
+        try:
+            # do NOT call page.remove_rotation(); rotate the rect instead
+            # pr2 = tuple(pdf.page_rect(page))
+            # pw2, ph2 = (pr2[2] - pr2[0], pr2[3] - pr2[1])
+            # rotation = getattr(page, "rotation", 0)
+            # adj_rev = adjust_coordinates_for_rotation(revision_rect, rotation, ph2, pw2)
+            # rclip = _sanitize_clip(adj_rev, pr2)
+
+            rclip = tuple(self.revision_rect)
+            if not rclip:
+                return []
+            lkey = layout_key(page_rect, rotation, rclip)
+            revisions = None
+
+            # a) learned template: slice by known columns, no detection
+            tpl = layouts.template(lkey) if layouts else None
+            if tpl is not None:
+                sliced = pdf.slice_table(page, rclip, tpl.col_edges, tpl.row_rulings)
+                if sliced and len(sliced.rows) >= 2:
+                    revs = _parse_rows_cached(
+                        parser, self.parsed_cache, sliced.fingerprint,
+                        f"tpl:{tpl.rev_idx},{tpl.desc_idx},{tpl.date_idx}", sliced.rows,
+                        manual_rev_idx=manual_rev_idx if manual_rev_idx is not None else tpl.rev_idx,
+                        manual_desc_idx=manual_desc_idx if manual_desc_idx is not None else tpl.desc_idx,
+                        manual_date_idx=manual_date_idx if manual_date_idx is not None else tpl.date_idx,
+                        skip_detection=True,
+                    )
+                    if revs and parser.rev_column_ratio(sliced.rows, parser.last_indices[0]) >= 0.5:
+                        revisions = revs
+                # no reject yet: sheets without a revision block (covers, notes) fail here too
+
+            # b) full detection
+            if revisions is None:
+                revisions = []
+                table = pdf.find_table(page, rclip)
+                if table and table.rows:
+                    revisions = _parse_rows_cached(
+                        parser, self.parsed_cache, table.fingerprint, "detect", table.rows,
+                        manual_rev_idx=manual_rev_idx,
+                        manual_desc_idx=manual_desc_idx,
+                        manual_date_idx=manual_date_idx,
+                    )
+                    ncols = max(len(r) for r in table.rows)
+                    if revisions and layouts and len(table.col_edges) == ncols + 1:
+                        r_i, d_i, dt_i = parser.last_indices
+                        found = TableLayout(list(table.col_edges), r_i, d_i, dt_i, table.row_ruled)
+                        if tpl is None:
+                            layouts.observe(lkey, found)
+                        elif not tpl.matches(found):
+                            layouts.reject(lkey)  # a real table the template gets wrong
+
+                # free big locals
+                try:
+                    del table
+                except Exception:
+                    pass
+            return revisions
+        except Exception:
+            return []
+
+
 def _process_single_pdf(pdf_path: Path, req: dict, temp_dir: Path, unid_prefix: str) -> int:
-    pdf = PdfAdapter()
-    ocr = OcrAdapter(req["ocr_tess"])
-    parser = RevisionParser(req.get("rev_regex"))
-    manual_rev_idx = req.get("rev_column_index")
-    manual_desc_idx = req.get("rev_description_index")
-    manual_date_idx = req.get("rev_date_index")
-
-    areas_rects: list[tuple] = list(req["areas_rects"])
-    revision_rect: Optional[tuple] = req.get("rev_area_rect")
-    ocr_mode = req["ocr_mode"]
-    dpi = max(1, int(req["ocr_dpi"] or 150))
-    scale = req.get("ocr_scale")
+    reader = _PageReader(req, temp_dir, pdf_path)
+    pdf = reader.pdf
+    areas_rects = reader.areas_rects
     pdf_root = Path(req["pdf_root"])
+    # page fingerprint -> results of its first occurrence in the run
+    # (not in image mode: every row needs its own area images)
+    dedupe = os.getenv("PAGE_DEDUPE", "1") == "1" and reader.ocr_mode != "Text1st+Image-beta"
+    pages_seen = SpoolIndex.shared(temp_dir, "pages") if dedupe else None
+    own_fps: set = set()  # fingerprints this attempt stored (entries of an earlier attempt are stale)
+    # document-scope areas: read until one page yields text, then copied to every row of the PDF
+    scopes = list(req.get("areas_scopes") or ["page"] * len(areas_rects))
+    doc_idxs = [i for i, sc in enumerate(scopes) if sc == "document"]
+    doc_values: dict[int, str] = {}
+    doc_tried = {i: 0 for i in doc_idxs}
+    doc_max_pages = int(os.getenv("DOC_AREA_MAX_PAGES", "5"))
+    pending_rows: list[list] = []  # rows waiting for a document-scope value
+
+    def _doc_done(i: int) -> bool:
+        return i in doc_values or doc_tried[i] >= doc_max_pages
+
+    def _emit(row: list) -> None:
+        for i in doc_idxs:
+            row[7 + i] = doc_values.get(i, "")
+        csv_w.writerow(row)
 
     # open temp writers once, write per page
     csv_w, csv_f = _open_temp_writers(temp_dir, unid_prefix)
     pages_written = 0
-    image_gc_counter = 0
 
     try:
         try:
@@ -137,113 +435,61 @@ def _process_single_pdf(pdf_path: Path, req: dict, temp_dir: Path, unid_prefix:
         folder = _rel_folder(pdf_path, pdf_root)
         filename = pdf_path.name
 
-        with pdf.open(pdf_path) as doc:
+        # local copy from the parent's prefetch stage, if it got there first
+        source = staged_path(req.get("staging_dir"), unid_prefix) or pdf_path
+
+        with pdf.open(source, req.get("layers_include"), req.get("layers_exclude")) as doc:
             page_count = doc.page_count
 
             for page_no in range(page_count):
+                if cancel_requested():
+                    break  # rows so far are flushed and the CSV closed below
                 page = doc[page_no]
 
                 page_rect = tuple(pdf.page_rect(page))  # (x0,y0,x1,y1)
                 pw, ph = (page_rect[2] - page_rect[0], page_rect[3] - page_rect[1])
                 rotation = getattr(page, "rotation", 0)
 
-                # ---- areas ----
-                area_texts: list[str] = []
-                for idx, raw in enumerate(areas_rects):
-                    # Text should use rotation-adjusted rect
-                    adj = adjust_coordinates_for_rotation(raw, rotation, ph, pw)
-
-                    clip_img = _sanitize_clip(raw, page_rect)  # for pixmap & OCR (raw like legacy)
-
-                    text_area = ""
-                    try:
-                        if ocr_mode == "Default":
-
-                            text_area = pdf.get_text(page, adj)
-
-                            if (not text_area.strip()) and clip_img:
-                                # OCR on the image crop (raw coords)
-                                text_area = ocr.ocr_clip_to_text(page, clip_img, dpi, scale)
-
-                        elif ocr_mode == "OCR-All":
-                            if clip_img:
-                                text_area = ocr.ocr_clip_to_text(page, clip_img, dpi, scale)
-                            else:
-                                text_area = ""
-
-                        elif ocr_mode == "Text1st+Image-beta":
-                            # 1) text first with adjusted rect
-
-                            text_area = pdf.get_text(page, adj)
-
-                            # 2) always save image using the raw rect (visual orientation)
-                            if clip_img:
-                                try:
-                                    pix = pdf.render_pixmap(page, clip_img, dpi=dpi, scale=scale)
-                                    out_img = temp_dir / f"{pdf_path.name}_page{page_no + 1}_area{idx}.png"
-                                    pix.save(str(out_img))
-                                finally:
-                                    try:
-                                        del pix
-                                    except Exception:
-                                        pass
-                                    image_gc_counter += 1
-                                    if image_gc_counter % 20 == 0:
-                                        try:
-                                            gc.collect()
-                                        except Exception:
-                                            pass
-                                # 30MB guard
-                                try:
-                                    if out_img.stat().st_size > 30 * 1024 * 1024:
-                                        out_img.unlink(missing_ok=True)
-                                except Exception:
-                                    pass
-
-                            # 3) OCR fallback on the same image crop (raw rect)
-                            if (not text_area.strip()) and clip_img:
-                                try:
-                                    text_area = ocr.ocr_clip_to_text(page, clip_img, dpi, scale)
-                                except Exception:
-                                    text_area = "OCR_ERROR"
-
-                        else:
-                            # Fallback mode: plain text with adjusted rect
-                            text_area = pdf.get_text(page, adj)
-
-                    except Exception:
-                        text_area = ""
-
-                    area_texts.append(_clean_text(text_area) if text_area.strip() else "")
-                # ---- revision table ----
-                revisions = []
-                if revision_rect:
+                # ---- duplicate pages: copy the first occurrence's results ----
+                page_fp = pdf.page_fingerprint(page) if pages_seen is not None else None
+                dup = pages_seen.get(page_fp) if page_fp else None
+                if isinstance(dup, dict) and page_fp not in own_fps and \
+                        str(dup.get("unid", "")).startswith(f"{unid_prefix}-"):
+                    dup = None  # our own entry from an earlier attempt (retry / resume)
+                duplicate_of = ""
+                if isinstance(dup, dict):
+                    duplicate_of = dup.get("unid", "")
+                    area_texts = list(dup.get("areas") or [""] * len(areas_rects))
+                    revisions = list(dup.get("revisions") or [])
+                    for i in doc_idxs:
+                        if _doc_done(i):
+                            area_texts[i] = None
+                    # doc areas the first occurrence never read: read them here
+                    unread = [i for i in doc_idxs if area_texts[i] is None and not _doc_done(i)]
+                    if unread:
+                        try:
+                            fresh = reader.read_areas(
+                                page, page_no, page_rect, rotation,
+                                skip={i for i in range(len(areas_rects)) if i not in unread},
+                            )
+                        except Cancelled:
+                            break  # half-read page: no row, nothing cached
+                        for i in unread:
+                            area_texts[i] = fresh[i]
+                else:
                     try:
-                        # do NOT call page.remove_rotation(); rotate the rect instead
-                        # pr2 = tuple(pdf.page_rect(page))
-                        # pw2, ph2 = (pr2[2] - pr2[0], pr2[3] - pr2[1])
-                        # rotation = getattr(page, "rotation", 0)
-                        # adj_rev = adjust_coordinates_for_rotation(revision_rect, rotation, ph2, pw2)
-                        # rclip = _sanitize_clip(adj_rev, pr2)
-
-                        rclip = tuple(revision_rect)
-                        if rclip:
-                            rows = pdf.find_table_rows(page, rclip)
-                            if rows:
-                                revisions = parser.parse_table_rows(
-                                    rows,
-                                    manual_rev_idx=manual_rev_idx,
-                                    manual_desc_idx=manual_desc_idx,
-                                    manual_date_idx=manual_date_idx,
-                                )
-
-                                # free big locals
-                                try:
-                                    del rows
-                                except Exception:
-                                    pass
-                    except Exception:
-                        revisions = []
+                        area_texts, revisions = reader.read(
+                            page, page_no, page_rect, rotation, skip={i for i in doc_idxs if _doc_done(i)}
+                        )
+                    except Cancelled:
+                        break  # half-read page: no row, nothing cached
+
+                # ---- document-scope areas ----
+                for i in doc_idxs:
+                    if area_texts[i] is not None:  # read on this page
+                        doc_tried[i] += 1
+                        if area_texts[i]:
+                            doc_values.setdefault(i, area_texts[i])
 
                 # ---- final row (write immediately) ----
                 page_size_str = f"{pw:.1f} x {ph:.1f}"
@@ -256,6 +502,10 @@ def _process_single_pdf(pdf_path: Path, req: dict, temp_dir: Path, unid_prefix:
                     latest_date = last.get("date", "")
 
                 unid = f"{unid_prefix}-{page_no+1}"
+                if page_fp and not duplicate_of:
+                    pages_seen.put(page_fp, {"unid": unid, "areas": area_texts, "revisions": revisions})
+                    own_fps.add(page_fp)
+
                 flat_revisions: list[str] = []
                 if isinstance(revisions, list):
                     for it in revisions:
@@ -267,8 +517,14 @@ def _process_single_pdf(pdf_path: Path, req: dict, temp_dir: Path, unid_prefix:
                         else:
                             flat_revisions.append("" if it is None else str(it))
 
-                row = [unid, size, last_mod, folder, filename, page_no+1, page_size_str] + area_texts + [latest_rev, latest_desc, latest_date] + flat_revisions
-                csv_w.writerow(row)
+                row = [unid, size, last_mod, folder, filename, page_no+1, page_size_str] + area_texts + [latest_rev, latest_desc, latest_date, duplicate_of] + flat_revisions
+                if not all(_doc_done(i) for i in doc_idxs):
+                    pending_rows.append(row)
+                else:
+                    for prow in pending_rows:
+                        _emit(prow)
+                    pending_rows.clear()
+                    _emit(row)
 
                 pages_written += 1
 
@@ -288,15 +544,66 @@ def _process_single_pdf(pdf_path: Path, req: dict, temp_dir: Path, unid_prefix:
 
 
     finally:
+        try:
+            for prow in pending_rows:
+                _emit(prow)
+        except Exception:
+            pass
         try:
             csv_f.close()
         except Exception:
             pass
+        try:
+            reader.strategy.flush()
+        except Exception:
+            pass
+        close_indexes()  # this PDF's new fingerprints go out in one append per cache
 
 
 
     return pages_written if pages_written > 0 else 1
 
+# modes whose areas may go to Tesseract (anything else reads the text layer only)
+OCR_MODES = ("Default", "OCR-All", "Text1st+Image-beta")
+
+# runs with at most this many PDFs (and pages / MB) skip the pool and the workbook (0 = never)
+INLINE_MAX_PDFS = int(os.getenv("INLINE_MAX_PDFS", "20"))
+INLINE_MAX_PAGES = int(os.getenv("INLINE_MAX_PAGES", "300"))
+INLINE_MAX_MB = int(os.getenv("INLINE_MAX_MB", "100"))
+
+
+def is_small_job(req: ExtractionRequest) -> bool:
+    """Small enough to run in-process; image mode needs the workbook and resumes need the spool."""
+    paths = list(req.pdf_paths)
+    if not (0 < len(paths) <= INLINE_MAX_PDFS) or req.ocr.mode == "Text1st+Image-beta" or req.resume_token:
+        return False
+    # few PDFs can still be a big job: sizes first (cheap), then page counts
+    total = 0
+    for p in paths:
+        try:
+            total += os.path.getsize(p)
+        except OSError:
+            pass  # the run reports it
+    if total > INLINE_MAX_MB * 1024 * 1024:
+        return False
+    pdf, pages = PdfAdapter(), 0
+    for p in paths:
+        try:
+            pages += pdf.page_count(p)
+        except Exception:
+            pass
+        if pages > INLINE_MAX_PAGES:
+            return False
+    return True
+
+
+def pool_shape(rev_mode: bool) -> tuple[int, int, int]:
+    """(processes, maxtasksperchild, batch_size) for a run."""
+    if rev_mode:
+        # conservative in rev mode; each worker handles 1 PDF then dies (kills leaks)
+        return max(1, (os.cpu_count() or 3) - 2), 1, int(os.getenv("PDF_BATCH_SIZE", "30"))
+    return max(1, os.cpu_count() or 1), 25, int(os.getenv("PDF_BATCH_SIZE", "500"))
+
 # ===== Main Service =====
 
 class ExtractionService:
@@ -307,14 +614,19 @@ class ExtractionService:
     def __init__(self):
         self.pdf = PdfAdapter()
 
-    def extract(self, req: ExtractionRequest, on_progress: Optional[Callable[[int, int], None]] = None, should_cancel: Optional[Callable[[], bool]] = None,) -> Path:
-        # temp dir under app folder (secure random suffix)
-        app_dir = Path(getattr(__import__("sys"), "executable", __file__)).parent \
-            if getattr(__import__("sys"), "frozen", False) else Path(__file__).parent
-        base_temp = app_dir / "temp"
-        base_temp.mkdir(exist_ok=True)
-        temp_dir = base_temp / secrets.token_hex(8)
+    def _prepare(self, req: ExtractionRequest, on_progress: Optional[Callable[[int, int], None]],
+                 on_event: Optional[Callable[[ExtractionEvent], None]] = None):
+        """Temp dir, headers, page total and the worker request dict shared by both run paths."""
+        _notify(on_event, PhaseChanged("discovery"))
+        # temp (spool) dir, named by the run's resume token: a resumed run reuses its
+        # dir wherever it is, a new one goes to the spool base
+        for base in all_bases(req.spool_dir):
+            sweep_stale(base)
+        temp_dir = find_run(req.resume_token, req.spool_dir) if valid_token(req.resume_token) else None
+        if temp_dir is None:
+            temp_dir = disk_base(req.spool_dir) / secrets.token_hex(8)
         temp_dir.mkdir(exist_ok=True, parents=True)
+        _notify(on_event, RunStarted(temp_dir.name, resumed=temp_dir.name == req.resume_token))
 
         # compute pdf_root
         pdf_paths = [Path(p) for p in req.pdf_paths]
@@ -330,7 +642,17 @@ class ExtractionService:
         except Exception:
             total_pages = len(pdf_paths)  # fallback
 
-        processed = 0
+        if on_progress:
+            on_progress(0, total_pages)
+        _notify(on_event, Progress(0, total_pages))
+
+        # per-area DPI calibration on a few sampled PDFs (OCR modes only)
+        if req.ocr.auto_dpi and req.ocr.tessdata_dir and req.ocr.mode in OCR_MODES:
+            try:
+                from app.services.dpi_tuner import calibrate_area_dpis
+                req = calibrate_area_dpis(req)
+            except Exception as e:
+                _notify(on_event, RunWarning(f"Auto DPI calibration skipped: {type(e).__name__}: {e}"))
 
         areas_rects = [tuple(a.rect) for a in req.areas]
         rev_area_rect = tuple(req.revision_area.rect) if req.revision_area else None
@@ -343,37 +665,65 @@ class ExtractionService:
 
         req_dict = {
             "areas_rects": areas_rects,
+            "areas_dpis": [a.ocr_dpi for a in req.areas],
+            "areas_scopes": [getattr(a, "scope", "page") or "page" for a in req.areas],
             "rev_area_rect": rev_area_rect,
             "rev_regex": rev_pattern,  # <-- use clean pattern here
             "ocr_mode": req.ocr.mode,
             "ocr_dpi": req.ocr.dpi,
             "ocr_scale": req.ocr.scale,
             "ocr_tess": str(req.ocr.tessdata_dir) if req.ocr.tessdata_dir else None,
+            "ocr_binarize": req.ocr.binarize,
             "pdf_root": str(pdf_root),
             "rev_column_index": req.revision_column_index,
             "rev_description_index": req.revision_description_index,
             "rev_date_index": req.revision_date_index,
+            "layers_include": list(req.layers_include) if req.layers_include else None,
+            "layers_exclude": list(req.layers_exclude) if req.layers_exclude else None,
         }
+        return req, temp_dir, pdf_paths, pdf_root, unique_headers, total_pages, req_dict
+
+    def extract(self, req: ExtractionRequest, on_progress: Optional[Callable[[int, int], None]] = None, should_cancel: Optional[Callable[[], bool]] = None,
+                pools=None, on_event: Optional[Callable[[ExtractionEvent], None]] = None) -> Path:
+        """
+        pools: provider with lease(processes, maxtasksperchild) -> (pool, channels) and
+        release(pool, healthy); the extraction host lends warm ones, else a one-shot pool.
+        Cancelling sets the channels' event: workers stop at the next page or OCR tile,
+        close their CSVs, and the rows so far still make it into the workbook.
+        Each PDF runs under the task_runner watchdog (timeouts, retries, quarantine).
+        on_event receives app.domain.events as the run goes.
+        """
+        req, temp_dir, pdf_paths, pdf_root, unique_headers, total_pages, req_dict = self._prepare(req, on_progress, on_event)
+        _notify(on_event, PhaseChanged("extract"))
+        processed = 0
 
-        import multiprocessing as mp
-        ctx = mp.get_context("spawn")
+        # forkserver (preloaded) on Linux, spawn elsewhere; never imports the GUI
+        ctx = worker_context()
 
         rev_mode = req.revision_area is not None
 
         # Pool sizing & worker lifetime
-        if rev_mode:
-            procs = max(1, os.cpu_count() - 2)  # conservative in rev mode
-            maxtasks = 1  # each worker handles 1 PDF then dies (kills leaks)
-            batch_size = int(os.getenv("PDF_BATCH_SIZE", "30"))
-        else:
-            procs = max(1, os.cpu_count())
-            maxtasks = 25
-            batch_size = int(os.getenv("PDF_BATCH_SIZE", "500"))
-
-
-        # Build jobs once
-        jobs = [(p, req_dict, temp_dir, str(10000 + i)) for i, p in enumerate(pdf_paths)]
+        procs, maxtasks, batch_size = pool_shape(rev_mode)
+
+        # Build jobs once; PDFs a resumed run already finished keep their segments
+        manifest = RunManifest(temp_dir)
+        prefixes = manifest.plan(pdf_paths)
+        done = manifest.completed()
+        # PDFs on a network share are copied locally a few files ahead of the workers
+        stager = stager_for(pdf_root, temp_dir.name)
+        if stager:
+            req_dict = dict(req_dict, staging_dir=str(stager.root))
+        jobs = [(p, req_dict, temp_dir, prefixes[str(p)]) for p in pdf_paths if str(p) not in done]
+        if READ_MODE == "memory" and not stager:
+            # a worker cannot know its own next task; each task names the PDF about one
+            # pool round later, and the worker reads that into the OS cache meanwhile
+            jobs = [(p, dict(rd, read_next=str(jobs[i + procs][0])) if i + procs < len(jobs) else rd, td, pre)
+                    for i, (p, rd, td, pre) in enumerate(jobs)]
         errors: list[str] = []
+        if done:
+            processed = sum(int(done[str(p)].get("pages", 0)) for p in pdf_paths if str(p) in done)
+            logger.info("Resuming run %s: %s PDF(s) already done", temp_dir.name, len(pdf_paths) - len(jobs))
+            _notify(on_event, Progress(processed, total_pages))
 
         # Helper: chunk jobs
         def _chunked(seq, n):
@@ -383,59 +733,83 @@ class ExtractionService:
         cancelled = False
 
         # ---- run batches ----
-        pool = ctx.Pool(processes=procs, maxtasksperchild=maxtasks)
+        pools = pools or OneShotPools(ctx)
+        pool, channels = pools.lease(procs, maxtasks)
+        runner = TaskRunner(pool, channels, _process_single_pdf_star, slots=procs * 2)
+        if stager:
+            stager.stage((j[0], j[3]) for j in jobs)
         try:
-            for bidx, batch in enumerate(_chunked(jobs, batch_size), 1):
-                if cancelled:
-                    break
-
-                for res in pool.imap_unordered(_process_single_pdf_star, batch, chunksize=1):
-                    if should_cancel and should_cancel():
-                        cancelled = True
+            with _CancelWatch(should_cancel, channels.cancel):
+                for bidx, batch in enumerate(_chunked(jobs, batch_size), 1):
+                    if cancelled:
+                        break
+                    # after a cancel the rest of the batch comes back at once as skipped,
+                    # so the pool is left idle and every CSV closed
+                    for res in runner.run(batch):
+                        cancelled = cancelled or bool(res.get("cancelled")) or channels.cancel.is_set()
+                        if stager:
+                            stager.release(prefixes.get(res.get("path"), ""))
+                        self._take_result(res, errors, on_event)
+                        if res.get("ok"):
+                            if not res.get("cancelled"):
+                                manifest.record(res["path"], res["prefix"], res["pages"])
+                            processed += res["pages"]
+                            if on_progress:
+                                on_progress(processed, total_pages)
+                            _notify(on_event, Progress(processed, total_pages))
+
+                    if cancelled:
                         break
 
-                    if not res.get("ok"):
-                        errors.append(res.get("error", "Unknown worker error"))
-                        continue
-
-                    processed += res["pages"]
-                    if on_progress:
-                        on_progress(processed, total_pages)
-
-                if cancelled:
-                    break
-
-                # Hard memory reset between batches
-                try:
-                    fitz.TOOLS.store_shrink(100)  # trim MuPDF global store
-                except Exception:
-                    pass
-                try:
-                    gc.collect()  # free Python objects
-                except Exception:
-                    pass
+                    # Hard memory reset between batches
+                    try:
+                        fitz.TOOLS.store_shrink(100)  # trim MuPDF global store
+                    except Exception:
+                        pass
+                    try:
+                        gc.collect()  # free Python objects
+                    except Exception:
+                        pass
         finally:
+            pools.release(pool, healthy=not runner.tainted)
+            if stager:
+                stager.close()
+                logger.info("Prefetch: %s of %s PDF(s) staged locally", stager.staged, len(jobs))
+
+        if runner.quarantined:
+            qlog = req.output_excel.with_suffix(".quarantine.txt")
             try:
-                if cancelled:
-                    pool.terminate()
-                else:
-                    pool.close()
-            finally:
-                try:
-                    pool.join()
-                except Exception:
-                    pass
+                qlog.write_text("\n".join(f"{p}\t{why}" for p, why in runner.quarantined), encoding="utf-8")
+            except Exception:
+                pass
+            for p, why in runner.quarantined:
+                _notify(on_event, RunWarning(f"Quarantined ({why})", path=p))
+                # its partial (possibly torn) rows stay out of the merge
+                prefix = prefixes.get(str(p))
+                if prefix:
+                    try:
+                        (temp_dir / f"temp_{prefix}.csv").unlink(missing_ok=True)
+                    except Exception:
+                        pass
 
         # combine temp CSVs
+        _notify(on_event, PhaseChanged("merge"))
         combined_csv = temp_dir / "streamed_output.csv"
-        max_revisions = self._combine_temp_files(temp_dir, combined_csv, unique_headers)
-
-        # write final Excel (streamed)
+        # only this selection's segments and those of PDFs finished earlier in the run
+        # (a resumed dir may hold segments of PDFs that are no longer selected)
+        segments = {prefixes[str(p)] for p in pdf_paths} | {e.get("prefix") for e in done.values()}
+        max_revisions = self._combine_temp_files(temp_dir, combined_csv, unique_headers, segments)
+
+        # write final Excel (streamed); openpyxl stays out of the workers
+        _notify(on_event, PhaseChanged("write"))
+        from app.infra.excel_writer import write_from_csv
         needs_images = (req.ocr.mode == "Text1st+Image-beta")
         excel_out = write_from_csv(
             combined_csv, req.output_excel, temp_dir, unique_headers, needs_images, pdf_root, max_revisions
         )
 
+        self._summarize(temp_dir, unique_headers, on_event)
+
         if errors:
             errlog = req.output_excel.with_suffix(".errors.txt")
             try:
@@ -443,20 +817,135 @@ class ExtractionService:
             except Exception:
                 pass
 
-        # cleanup temp dir
-        try:
+        # cleanup temp dir; an incomplete run keeps it so it can be resumed (or its
+        # failed files re-run) with the same token
+        if cancelled or errors:
+            logger.info("Run %s incomplete; resume token kept: %s", temp_dir.name, temp_dir)
+        else:
             shutil.rmtree(temp_dir, ignore_errors=True)
-        except Exception:
-            pass
 
         return excel_out
 
-    def _combine_temp_files(self, temp_dir: Path, combined_csv: Path, unique_headers: dict) -> int:
+    def extract_inline(self, req: ExtractionRequest, on_progress: Optional[Callable[[int, int], None]] = None,
+                       should_cancel: Optional[Callable[[], bool]] = None,
+                       on_event: Optional[Callable[[ExtractionEvent], None]] = None) -> InlineResult:
+        """
+        Small-job path: same per-PDF worker, run sequentially in this process (meant for a
+        background thread) and returned as rows instead of a workbook.
+        """
+        req, temp_dir, pdf_paths, pdf_root, unique_headers, total_pages, req_dict = self._prepare(req, on_progress, on_event)
+        _notify(on_event, PhaseChanged("extract"))
+        processed = 0
+        errors: list[str] = []
+        cancelled = False
+        stop = threading.Event()
+        install_cancel(stop)  # one run at a time per process; the worker code checks it per page
+        stager = stager_for(pdf_root, temp_dir.name)
+        if stager:
+            req_dict = dict(req_dict, staging_dir=str(stager.root))
+            stager.stage((p, str(10000 + i)) for i, p in enumerate(pdf_paths))
+        # memory mode: read PDF i+1 while PDF i is processed (the stager already reads ahead)
+        read_ahead = ReadAhead() if READ_MODE == "memory" and not stager else None
+        install_read_ahead(read_ahead)
+        try:
+            with _CancelWatch(should_cancel, stop):
+                for i, p in enumerate(pdf_paths):
+                    if read_ahead:
+                        read_ahead.want(p)
+                        if i + 1 < len(pdf_paths):
+                            read_ahead.want(pdf_paths[i + 1])
+                    res = run_with_retries(_process_single_pdf_star, (p, req_dict, temp_dir, str(10000 + i)))
+                    if stager:
+                        stager.release(str(10000 + i))
+                    cancelled = cancelled or bool(res.get("cancelled"))
+                    self._take_result(res, errors, on_event)
+                    if res.get("ok"):
+                        processed += res["pages"]
+                        if on_progress:
+                            on_progress(processed, total_pages)
+                        _notify(on_event, Progress(processed, total_pages))
+                    if cancelled:
+                        break
+
+            _notify(on_event, PhaseChanged("merge"))
+            combined_csv = temp_dir / "streamed_output.csv"
+            max_revisions = self._combine_temp_files(temp_dir, combined_csv, unique_headers)
+            self._summarize(temp_dir, unique_headers, on_event)
+            with open(combined_csv, "r", encoding="utf-8") as f:
+                reader = csv.reader(f)
+                headers = next(reader, [])
+                rows = [row for row in reader]
+        finally:
+            install_cancel(None)
+            install_read_ahead(None)
+            if read_ahead:
+                read_ahead.close()
+            if stager:
+                stager.close()
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+        return InlineResult(
+            headers=headers,
+            rows=rows,
+            area_headers=[unique_headers[i] for i in range(len(unique_headers))],
+            max_revisions=max_revisions,
+            pdf_root=pdf_root,
+            pages=processed,
+            errors=errors,
+            cancelled=cancelled,
+        )
+
+    @staticmethod
+    def _summarize(temp_dir: Path, unique_headers: dict, on_event) -> None:
+        """Run summary: what the per-area strategy learned (log + RunSummary for the GUI)."""
+        try:
+            titles = [unique_headers[i] for i in range(len(unique_headers))]
+            lines = run_summary(SpoolCache.shared(temp_dir, "strategy"), titles)
+        except Exception:
+            return
+        for line in lines:
+            logger.info("Area strategy | %s", line)
+        if lines:
+            _notify(on_event, RunSummary(tuple(lines)))
+
+    @staticmethod
+    def _take_result(res: dict, errors: list[str], on_event) -> None:
+        """Record one worker result: failures and finished files become events; skipped ones are dropped."""
+        if res.get("ok"):
+            if not res.get("cancelled"):  # a file cut short by a cancel is not "done"
+                _notify(on_event, FileDone(res.get("path", ""), res["pages"], res.get("seconds", 0.0)))
+        elif not res.get("cancelled"):
+            err = res.get("error", "Unknown worker error")
+            errors.append(f"{res.get('path', '')}\t{err}")  # .errors.txt lines: <path>\t<error>
+            _notify(on_event, FileFailed(res.get("path", ""), err))
+
+    def export_inline(self, result: InlineResult, output_excel: Path) -> Path:
+        """Write an in-memory result to Excel through the normal (streamed) writer."""
+        from app.infra.excel_writer import write_from_csv
+
+        tmp = Path(tempfile.mkdtemp(prefix="xtractor_export_"))
+        try:
+            combined_csv = tmp / "streamed_output.csv"
+            with open(combined_csv, "w", newline="", encoding="utf-8") as f:
+                w = csv.writer(f)
+                w.writerow(result.headers)
+                w.writerows(result.rows)
+            headers = {i: h for i, h in enumerate(result.area_headers)}
+            return write_from_csv(combined_csv, Path(output_excel), tmp, headers, False,
+                                  result.pdf_root, result.max_revisions)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def _combine_temp_files(self, temp_dir: Path, combined_csv: Path, unique_headers: dict,
+                            segments: Optional[set] = None) -> int:
+        """segments: unid prefixes to merge (None = every temp_*.csv in the dir)."""
         import glob
 
         temp_csvs = sorted(Path(p) for p in glob.glob(str(temp_dir / "temp_*.csv")))
+        if segments is not None:
+            temp_csvs = [f for f in temp_csvs if f.stem[len("temp_"):] in segments]
         area_headers = [unique_headers[i] for i in range(len(unique_headers))]
-        base_fixed = 1 + 6 + len(area_headers) + 3  # UNID + base + areas + latest trio
+        base_fixed = 1 + 6 + len(area_headers) + 4  # UNID + base + areas + latest trio + duplicate of
 
         body_path = temp_dir / "combined_body.csv"
         max_revisions = 0
@@ -471,10 +960,6 @@ class ExtractionService:
                         rev_cols = max(0, len(row) - base_fixed)
                         if rev_cols > max_revisions:
                             max_revisions = rev_cols
-                try:
-                    f.unlink()
-                except Exception:
-                    pass
 
         revision_headers = [f"Rev{i+1}" for i in range(max_revisions)]
         with open(combined_csv, "w", newline="", encoding="utf-8") as outf:
@@ -487,7 +972,7 @@ class ExtractionService:
                 "Filename",
                 "Page No",
                 "Page Size",
-            ] + area_headers + ["Latest Revision", "Latest Description", "Latest Date"] + revision_headers)
+            ] + area_headers + ["Latest Revision", "Latest Description", "Latest Date", "Duplicate Of"] + revision_headers)
 
             with open(body_path, "r", encoding="utf-8") as body_file:
                 reader = csv.reader(body_file)
@@ -0,0 +1,157 @@
+# app/services/revision_detection.py
+"""
+Revision pattern and column detection over a sample of the selected PDFs.
+Each sampled PDF contributes the table found in the revision area of its first
+page (for the PDF on screen, of the page being shown). Column indices are voted
+on per sample, and every REVISION_PATTERNS entry is scored on the agreed revision
+column across all samples.
+"""
+from __future__ import annotations
+import logging
+import os
+import re
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+from app.domain.models import PatternScore, RevisionDetection
+from app.domain.revision_patterns import REVISION_PATTERNS
+from app.infra.pdf_adapter import PdfAdapter
+from app.services.dpi_tuner import sample_paths
+from app.services.revision_parser import RevisionParser
+
+logger = logging.getLogger(__name__)
+
+# PDFs sampled per detection run
+DETECT_SAMPLES = int(os.getenv("REV_DETECT_SAMPLES", "8"))
+
+_REV_HEADER = re.compile(r"\brev(ision)?", re.IGNORECASE)
+
+
+def pick_samples(pdf_paths: Sequence[Path], n: Optional[int] = None, first: Optional[Path] = None) -> List[Path]:
+    """n paths spread over the selection; `first` (e.g. the PDF on screen) always leads."""
+    n = n or DETECT_SAMPLES
+    paths = [Path(p) for p in pdf_paths]
+    if first is not None:
+        first = Path(first)
+        paths = [p for p in paths if p != first]
+        return [first] + sample_paths(paths, n - 1)
+    return sample_paths(paths, n)
+
+
+def sample_table_rows(args) -> dict:
+    """
+    Pool task: revision-area table of one PDF's page (path, clip[, page_no]); page 0
+    unless given. Never raises; returns only primitives so it pickles on Windows.
+    """
+    path, clip = args[0], args[1]
+    page_no = args[2] if len(args) > 2 else 0
+    try:
+        pdf = PdfAdapter()
+        with pdf.open(path) as doc:
+            if doc.page_count == 0:
+                return {"ok": True, "path": str(path), "rows": []}
+            page_no = min(max(int(page_no or 0), 0), doc.page_count - 1)
+            rows = pdf.find_table_rows(doc.load_page(page_no), tuple(clip)) or []
+        return {"ok": True, "path": str(path), "rows": [[str(c or "") for c in r] for r in rows]}
+    except Exception as e:
+        return {"ok": False, "path": str(path), "error": f"{type(e).__name__}: {e}"}
+
+
+def _rev_values(rows: List[List[str]], rev_idx: Optional[int]) -> List[str]:
+    """Whitespace-free cells of the rev column, header cells dropped (same rules as the manual detect)."""
+    cells = []
+    for row in rows:
+        if not row:
+            continue
+        if isinstance(rev_idx, int) and 0 <= rev_idx < len(row):
+            cell = str(row[rev_idx]).strip()
+        else:
+            cell = str(row[0]).strip()
+        if cell:
+            cells.append(cell)
+    data = [c for c in cells if not _REV_HEADER.search(c)] or cells
+    return [v for v in (re.sub(r"\s+", "", c) for c in data) if v]
+
+
+def required_ratio(total: int) -> float:
+    return 1.0 if total <= 2 else 0.6
+
+
+def build_consensus(
+    tables: Sequence[List[List[str]]],
+    samples_total: Optional[int] = None,
+    rev_idx: Optional[int] = None,
+) -> RevisionDetection:
+    """
+    Vote column indices over the sampled tables, then score every pattern on the agreed
+    rev column (or on `rev_idx` when the user picked a different one).
+    """
+    tables = [t for t in tables if t]
+    samples_total = samples_total if samples_total is not None else len(tables)
+    parser = RevisionParser(None)
+
+    picks: List[Tuple[Optional[int], Optional[int], Optional[int]]] = []
+    for rows in tables:
+        try:
+            picks.append(parser.detect_column_indices(rows))
+        except Exception:
+            picks.append((None, None, None))
+
+    columns: List[Optional[int]] = []
+    confidence: List[float] = []
+    for k in range(3):
+        votes = Counter(p[k] for p in picks if p[k] is not None)
+        if votes:
+            idx, n = votes.most_common(1)[0]
+            columns.append(idx)
+            confidence.append(n / len(tables))
+        else:
+            columns.append(None)
+            confidence.append(0.0)
+    if rev_idx is None:
+        rev_idx = columns[0]
+
+    values = [_rev_values(rows, rev_idx) for rows in tables]
+    scores: List[PatternScore] = []
+    for key, info in REVISION_PATTERNS.items():
+        try:
+            regex = re.compile(info["pattern"], re.IGNORECASE)
+        except re.error:
+            continue
+        matches = total = agreeing = 0
+        for vals in values:
+            hit = sum(1 for v in vals if regex.fullmatch(v))
+            matches += hit
+            total += len(vals)
+            if vals and hit / len(vals) >= required_ratio(len(vals)):
+                agreeing += 1
+        scores.append(PatternScore(key=key, matches=matches, total=total, samples=agreeing))
+
+    # same ranking as the single-page detect: ratio first, then raw matches
+    scores.sort(key=lambda s: (s.confidence, s.matches), reverse=True)
+    best = scores[0] if scores and scores[0].matches else None
+    pattern_key = best.key if best and best.confidence >= required_ratio(best.total) else None
+
+    # show the user a table that agrees with the vote (first sample otherwise)
+    sample_rows: List[List[str]] = []
+    for rows, pick in zip(tables, picks):
+        if pick[0] == rev_idx:
+            sample_rows = rows
+            break
+    if not sample_rows and tables:
+        sample_rows = tables[0]
+
+    logger.info(
+        "Revision detection: %s/%s samples, columns=%s (conf=%s), pattern=%s",
+        len(tables), samples_total, tuple(columns), tuple(round(c, 2) for c in confidence), pattern_key,
+    )
+    return RevisionDetection(
+        pattern_key=pattern_key,
+        patterns=scores,
+        columns=(columns[0], columns[1], columns[2]),
+        column_confidence=(confidence[0], confidence[1], confidence[2]),
+        sample_rows=sample_rows,
+        samples_used=len(tables),
+        samples_total=samples_total,
+    )
@@ -1,16 +1,51 @@
 # app/services/revision_parser.py
 from __future__ import annotations
-from typing import List, Optional, Tuple
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Tuple
+import logging
 import re
 from app.domain.revision_rules import DATE_REGEX, DESC_KEYWORDS, REVISION_REGEX_FALLBACK
 
+logger = logging.getLogger(__name__)
+
 WORD_REV = re.compile(r"\brev(?:ision)?\b", re.IGNORECASE)
+_WS = re.compile(r"\s+")
+_TOKEN_SPLIT = re.compile(r"[^A-Za-z0-9]+")
+_EXPLICIT_REV = re.compile(r"\brev(?:ision)?\s*[:\-]?\s*([A-Za-z0-9]{1,4})", re.IGNORECASE)
+_HAS_LETTER = re.compile(r"[A-Za-z]")
+_MOSTLY_CODE = re.compile(r"[A-Za-z]{0,3}\d{0,3}")
+_HEADERISH = re.compile(r"\b(revision|rev\b|date\b|description|chk.?d|checked|approved|no\.)")
+
+# distinct cell texts memoised per parser (revision tables repeat the same cells page after page)
+CELL_CACHE_SIZE = 4096
+
+
+class CellInfo(NamedTuple):
+    """Everything the scoring/filtering/parsing phases need from one cell, computed once."""
+    text: str                 # normalized text
+    has_date: bool
+    has_rev_word: bool
+    rev_token: Optional[str]  # candidate revision token (already upper-cased)
+    looks_desc: bool
+    headerish: bool
+
+
+_EMPTY_CELL = CellInfo("", False, False, None, False, False)
 
 class RevisionParser:
-    def __init__(self, revision_regex: str | None, certainty_lock: bool = True, fill_missing: bool = True):
+    def __init__(
+        self,
+        revision_regex: str | None,
+        certainty_lock: bool = True,
+        fill_missing: bool = True,
+        cell_cache_size: int = CELL_CACHE_SIZE,
+    ):
         self.rev_re = re.compile(revision_regex, re.IGNORECASE) if revision_regex else REVISION_REGEX_FALLBACK
         self.certainty_lock = certainty_lock
         self.fill_missing = fill_missing
+        # (rev, desc, date) indices used by the last parse_table_rows() call
+        self.last_indices: Tuple[Optional[int], Optional[int], Optional[int]] = (None, None, None)
+        self._cell_cached = lru_cache(maxsize=cell_cache_size)(self._analyse_cell)
 
 
     # ---------- helpers ----------
@@ -21,26 +56,38 @@ class RevisionParser:
         t = str(text)
         # normalize dashes & whitespace
         t = t.replace("—", "-").replace("–", "-")
-        t = re.sub(r"\s+", " ", t)
+        t = _WS.sub(" ", t)
         return t.strip()
 
-    def _extract_rev_token(self, text: str) -> Optional[str]:
-        """
-        Extract a plausible revision token, prioritizing tokens that start with a letter.
-        Avoid numeric-only tokens when the same cell looks like a date, unless the
-        cell explicitly contains 'rev'/'revision'.
-        """
-        if not text:
-            return None
-        t = self._norm(text)
+    def cell(self, raw) -> CellInfo:
+        """Analyse one cell (memoised on the raw text)."""
+        if raw is None:
+            return _EMPTY_CELL
+        return self._cell_cached(raw if isinstance(raw, str) else str(raw))
+
+    def _analyse_cell(self, raw: str) -> CellInfo:
+        t = self._norm(raw)
+        if not t:
+            return _EMPTY_CELL
+        has_date = DATE_REGEX.search(t) is not None
+        has_rev_word = WORD_REV.search(t) is not None
+        return CellInfo(
+            text=t,
+            has_date=has_date,
+            has_rev_word=has_rev_word,
+            rev_token=self._rev_token(t, has_date, has_rev_word),
+            looks_desc=self._looks_like_desc(t),
+            headerish=_HEADERISH.search(t.lower()) is not None,
+        )
 
+    def _rev_token(self, t: str, looks_like_date: bool, has_rev_word: bool) -> Optional[str]:
         # tokenization
-        tokens = [c for c in re.split(r"[^A-Za-z0-9]+", t) if c]
+        tokens = [c for c in _TOKEN_SPLIT.split(t) if c]
         if not tokens:
             return None
 
         # explicit "rev: X" capture gets highest priority
-        m = re.search(r"\brev(?:ision)?\s*[:\-]?\s*([A-Za-z0-9]{1,4})", t, re.IGNORECASE)
+        m = _EXPLICIT_REV.search(t)
         explicit = [m.group(1)] if m else []
 
         # prioritize tokens that begin with a letter (A, B2, C03, P01...)
@@ -52,8 +99,6 @@ class RevisionParser:
 
         # numeric-only tokens – only allow if the cell is NOT a date,
         # or if the cell explicitly mentions "rev"
-        looks_like_date = bool(DATE_REGEX.search(t))
-        has_rev_word = bool(WORD_REV.search(t))
         numeric_only = [tok for tok in tokens if tok.isdigit()]
         numeric_ok = numeric_only if (not looks_like_date or has_rev_word) else []
 
@@ -64,6 +109,16 @@ class RevisionParser:
                 return cand.upper()
         return None
 
+    def _extract_rev_token(self, text: str) -> Optional[str]:
+        """
+        Extract a plausible revision token, prioritizing tokens that start with a letter.
+        Avoid numeric-only tokens when the same cell looks like a date, unless the
+        cell explicitly contains 'rev'/'revision'.
+        """
+        if not text:
+            return None
+        return self.cell(text).rev_token
+
     @staticmethod
     def _looks_like_desc(text: str) -> bool:
         if not text:
@@ -73,15 +128,18 @@ class RevisionParser:
         # positive signals
         kw_hit = any(kw in low for kw in DESC_KEYWORDS)
         has_space = " " in t
-        has_letters = re.search(r"[A-Za-z]", t) is not None
+        has_letters = _HAS_LETTER.search(t) is not None
         longish = len(t) >= 6
         # negative signals (avoid short pure codes)
-        mostly_code = re.fullmatch(r"[A-Za-z]{0,3}\d{0,3}", t) is not None
+        mostly_code = _MOSTLY_CODE.fullmatch(t) is not None
         return (kw_hit or (has_space and has_letters and longish)) and not mostly_code
 
     # ---------- detection ----------
     def detect_column_indices(self, rows: List[List[str]], max_rows: int = 4) -> Tuple[Optional[int], Optional[int], Optional[int]]:
-        print(f"[DetectPattern] RevisionParser.detect_column_indices on {len(rows)} rows (max_rows={max_rows}).")
+        logger.debug("[DetectPattern] RevisionParser.detect_column_indices on %s rows (max_rows=%s).", len(rows), max_rows)
+        return self._detect_records([[self.cell(c) for c in row] for row in rows[:max_rows]])
+
+    def _detect_records(self, records: List[List[CellInfo]]) -> Tuple[Optional[int], Optional[int], Optional[int]]:
         scores: dict[int, dict[str, int]] = {}  # idx -> {'rev': int, 'date': int, 'desc': int}
 
         def bump(i, k, v=1):
@@ -89,15 +147,14 @@ class RevisionParser:
             scores[i][k] += v
 
         # ----- SCORING PASS -----
-        for row in rows[:max_rows]:
-            for idx, raw in enumerate(row):
-                txt = self._norm(raw)
-                if not txt:
+        for row in records:
+            for idx, info in enumerate(row):
+                if not info.text:
                     continue
 
-                has_date = bool(DATE_REGEX.search(txt))
-                has_rev_word = bool(WORD_REV.search(txt))
-                rev_tok = self._extract_rev_token(txt)
+                has_date = info.has_date
+                has_rev_word = info.has_rev_word
+                rev_tok = info.rev_token
 
                 # REV signal (heavy) – don't count from date-looking cells unless labeled “rev”
                 if rev_tok and (not has_date or has_rev_word):
@@ -112,16 +169,16 @@ class RevisionParser:
                     bump(idx, "date", 2)
 
                 # DESC signal
-                if self._looks_like_desc(txt):
+                if info.looks_desc:
                     bump(idx, "desc", 1)
 
         if not scores:
-            print("[DetectPattern] RevisionParser: no scoring signals detected in provided rows.")
+            logger.debug("[DetectPattern] RevisionParser: no scoring signals detected in provided rows.")
             return (None, None, None)
 
         # keep an immutable copy for fallbacks
         scores_all = {i: sc.copy() for i, sc in scores.items()}
-        print(f"[DetectPattern] RevisionParser: initial scores {scores_all}.")
+        logger.debug("[DetectPattern] RevisionParser: initial scores %s.", scores_all)
 
         # ----- OPTIONAL CERTAINTY LOCK (before picking) -----
         if getattr(self, "certainty_lock", False):
@@ -134,7 +191,7 @@ class RevisionParser:
                 # strong rev column (with no date hints) should not be considered date
                 if sc["rev"] >= REV_STRONG and sc["date"] == 0:
                     sc["date"] = -999
-        print(f"[DetectPattern] RevisionParser: adjusted scores {scores}.")
+        logger.debug("[DetectPattern] RevisionParser: adjusted scores %s.", scores)
 
         # ----- PRIMARY EXCLUSIVE PICKS -----
         # Work on a mutable copy so we can pop selected columns
@@ -156,9 +213,8 @@ class RevisionParser:
         r_idx = pick_exclusive("rev")
         d_idx = pick_exclusive("desc")
         dt_idx = pick_exclusive("date")
-        print(
-            "[DetectPattern] RevisionParser: exclusive picks",
-            f"rev={r_idx}, desc={d_idx}, date={dt_idx}"
+        logger.debug(
+            "[DetectPattern] RevisionParser: exclusive picks rev=%s, desc=%s, date=%s", r_idx, d_idx, dt_idx
         )
 
         # ----- FALLBACK FILL (avoid blanks if possible) -----
@@ -209,75 +265,70 @@ class RevisionParser:
             r_idx = fallback("rev", r_idx)
             d_idx = fallback("desc", d_idx)
             dt_idx = fallback("date", dt_idx)
-            print(
-                "[DetectPattern] RevisionParser: after fallback",
-                f"rev={r_idx}, desc={d_idx}, date={dt_idx}"
+            logger.debug(
+                "[DetectPattern] RevisionParser: after fallback rev=%s, desc=%s, date=%s", r_idx, d_idx, dt_idx
             )
 
-        print(
-            "[DetectPattern] RevisionParser: final column indices",
-            f"rev={r_idx}, desc={d_idx}, date={dt_idx}"
+        logger.debug(
+            "[DetectPattern] RevisionParser: final column indices rev=%s, desc=%s, date=%s", r_idx, d_idx, dt_idx
         )
         return (r_idx, d_idx, dt_idx)
 
     # ---------- row filtering ----------
     def is_footer_or_header_row(self, row: List[str], rev_idx: Optional[int]) -> bool:
-        normed = [self._norm(c).lower() for c in row]
+        return self._is_header_records([self.cell(c) for c in row])
+
+    @staticmethod
+    def _is_header_records(recs: List[CellInfo]) -> bool:
         # mostly empty -> skip
-        if sum(1 for c in normed if not c) >= max(1, int(len(normed) * 0.75)):
+        if sum(1 for c in recs if not c.text) >= max(1, int(len(recs) * 0.75)):
             return True
 
         # if it contains a valid rev token anywhere, treat as data
-        if any(self._extract_rev_token(c) for c in normed if c):
+        if any(c.rev_token for c in recs if c.text):
             return False
 
         # classic header junk, but avoid killing real descriptions that say "revised"
-        headerish = any(
-            re.search(r"\b(revision|rev\b|date\b|description|chk.?d|checked|approved|no\.)", c)
-            for c in normed if c
-        )
-        return headerish
+        return any(c.headerish for c in recs if c.text)
 
     # ---------- parsing ----------
     def parse_row(self, row: List[str], rev_idx, desc_idx, date_idx):
+        return self._parse_records(row, [self.cell(c) for c in row], rev_idx, desc_idx, date_idx)
+
+    def _parse_records(self, row: List[str], recs: List[CellInfo], rev_idx, desc_idx, date_idx):
         def get(idx):
-            return self._norm(row[idx]) if idx is not None and idx < len(row) else ""
+            return recs[idx] if idx is not None and idx < len(recs) else _EMPTY_CELL
 
-        rev  = get(rev_idx)
-        desc = get(desc_idx)
-        date = get(date_idx)
+        rev_c, desc_c, date_c = get(rev_idx), get(desc_idx), get(date_idx)
+        rev, desc, date = rev_c.text, desc_c.text, date_c.text
 
         # salvage rev/date/desc if column guess failed
         if not rev:
             # scan entire row for a rev token
-            for c in row:
-                tok = self._extract_rev_token(self._norm(c))
-                if tok:
-                    rev = tok
+            for c in recs:
+                if c.rev_token:
+                    rev = c.rev_token
                     break
-        else:
+        elif rev_c.rev_token:
             # clean to the token if cell had extra words
-            tok = self._extract_rev_token(rev)
-            if tok:
-                rev = tok
+            rev = rev_c.rev_token
 
-        if date and not DATE_REGEX.search(date):
+        if date and not date_c.has_date:
             date = ""
         if not date:
-            for c in row:
-                c2 = self._norm(c)
-                if DATE_REGEX.search(c2):
-                    date = c2
+            for c in recs:
+                if c.has_date:
+                    date = c.text
                     break
 
         if not desc:
             # pick the longest “sentence-like” cell that isn't clearly a date or rev token
-            candidates = [self._norm(c) for c in row if c]
-            candidates = [c for c in candidates if not DATE_REGEX.search(c) and not self._extract_rev_token(c)]
+            candidates = [c for raw, c in zip(row, recs) if raw]
+            candidates = [c for c in candidates if not c.has_date and not c.rev_token]
             if candidates:
                 # prefer one that "looks like description"
-                desc_like = [c for c in candidates if self._looks_like_desc(c)]
-                desc = max(desc_like or candidates, key=len)
+                desc_like = [c.text for c in candidates if c.looks_desc]
+                desc = max(desc_like or [c.text for c in candidates], key=len)
 
         rev  = rev or None
         desc = desc or None
@@ -291,7 +342,13 @@ class RevisionParser:
         manual_rev_idx: Optional[int] = None,
         manual_desc_idx: Optional[int] = None,
         manual_date_idx: Optional[int] = None,
+        skip_detection: bool = False,
     ) -> List[dict]:
+        """
+        Parse table rows into revision dicts (latest last).
+        With skip_detection=True the given indices are trusted as-is (learned layouts)
+        and detect_column_indices() is never run.
+        """
         if not rows:
             return []
 
@@ -311,31 +368,33 @@ class RevisionParser:
         manual_desc_idx = _normalize(manual_desc_idx, max_columns) if max_columns else None
         manual_date_idx = _normalize(manual_date_idx, max_columns) if max_columns else None
 
-        # work bottom-up (latest last)
+        # work bottom-up (latest last); every cell is analysed once up front and the
+        # detection, filtering and parsing passes below only read the records
         rows_rev = rows[::-1]
+        recs_rev = [[self.cell(c) for c in r] for r in rows_rev]
 
         # ----- identify working indices for filtering -----
         det_r = det_d = det_dt = None
-        if manual_rev_idx is None or manual_desc_idx is None or manual_date_idx is None:
-            det_r, det_d, det_dt = self.detect_column_indices(rows_rev)
+        if not skip_detection and (manual_rev_idx is None or manual_desc_idx is None or manual_date_idx is None):
+            det_r, det_d, det_dt = self._detect_records(recs_rev[:4])
 
         tmp_r_idx = manual_rev_idx if manual_rev_idx is not None else det_r
         tmp_d_idx = manual_desc_idx if manual_desc_idx is not None else det_d
         tmp_dt_idx = manual_date_idx if manual_date_idx is not None else det_dt
-        print(
-            "[DetectPattern] RevisionParser: using preliminary indices for filtering:",
-            f"rev={tmp_r_idx}, desc={tmp_d_idx}, date={tmp_dt_idx}"
+        logger.debug(
+            "[DetectPattern] RevisionParser: using preliminary indices for filtering: rev=%s, desc=%s, date=%s",
+            tmp_r_idx, tmp_d_idx, tmp_dt_idx
         )
 
-        filtered = [r for r in rows_rev if not self.is_footer_or_header_row(r, tmp_r_idx)]
+        filtered = [(r, rec) for r, rec in zip(rows_rev, recs_rev) if not self._is_header_records(rec)]
 
         # ----- determine final indices -----
         r_idx = manual_rev_idx
         d_idx = manual_desc_idx
         dt_idx = manual_date_idx
 
-        if r_idx is None or d_idx is None or dt_idx is None:
-            det2_r, det2_d, det2_dt = self.detect_column_indices(filtered)
+        if not skip_detection and (r_idx is None or d_idx is None or dt_idx is None):
+            det2_r, det2_d, det2_dt = self._detect_records([rec for _, rec in filtered[:4]])
             if r_idx is None:
                 r_idx = det2_r
             if d_idx is None:
@@ -343,16 +402,18 @@ class RevisionParser:
             if dt_idx is None:
                 dt_idx = det2_dt
 
-        print(
-            "[DetectPattern] RevisionParser: final indices after manual overrides:",
-            f"rev={r_idx}, desc={d_idx}, date={dt_idx}"
+        logger.debug(
+            "[DetectPattern] RevisionParser: final indices after manual overrides: rev=%s, desc=%s, date=%s",
+            r_idx, d_idx, dt_idx
         )
 
+        self.last_indices = (r_idx, d_idx, dt_idx)
+
         out: List[dict] = []
-        for row in filtered:
+        for row, rec in filtered:
             if not any(row):
                 continue
-            rev, desc, date = self.parse_row(row, r_idx, d_idx, dt_idx)
+            rev, desc, date = self._parse_records(row, rec, r_idx, d_idx, dt_idx)
 
             # keep partials: prefer rows with a rev; else keep (desc+date)
             if rev or (desc and date):
@@ -362,3 +423,14 @@ class RevisionParser:
                 if date: item["date"] = date
                 out.append(item)
         return out
+
+    def rev_column_ratio(self, rows: List[List[str]], rev_idx: Optional[int]) -> float:
+        """Share of data rows whose rev column holds a valid revision token (layout validation)."""
+        if rev_idx is None:
+            return 0.0
+        data = [rec for rec in ([self.cell(c) for c in r] for r in rows if any(r))
+                if not self._is_header_records(rec)]
+        if not data:
+            return 0.0
+        hits = sum(1 for rec in data if rev_idx < len(rec) and rec[rev_idx].rev_token)
+        return hits / len(data)
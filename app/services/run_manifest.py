@@ -0,0 +1,148 @@
+# app/services/run_manifest.py
+"""
+Checkpoint of an extraction run inside its temp dir, so an interrupted run can be
+resumed with the same token. plan.json fixes each PDF's unid prefix (and so its
+temp_<prefix>.csv segment); manifest.jsonl gets one line per finished PDF.
+The last run kept for resuming is noted in the spool base, so a restarted GUI can
+still offer it.
+"""
+from __future__ import annotations
+import json
+import logging
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.services.spool import disk_base, find_run
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.jsonl"
+PLAN = "plan.json"
+LAST_INCOMPLETE = "last_incomplete.json"
+# interrupted runs older than this are swept from the temp base (0 = keep)
+KEEP_DAYS = float(os.getenv("SPOOL_KEEP_DAYS", "7"))
+
+_TOKEN = re.compile(r"[0-9a-f]{16}")
+
+
+def valid_token(token) -> bool:
+    return isinstance(token, str) and bool(_TOKEN.fullmatch(token))
+
+
+def sweep_stale(base: Path) -> None:
+    """Drop temp dirs of interrupted runs nobody resumed."""
+    if KEEP_DAYS <= 0:
+        return
+    cutoff = time.time() - KEEP_DAYS * 86400
+    try:
+        for d in base.iterdir():
+            if d.is_dir() and valid_token(d.name) and d.stat().st_mtime < cutoff:
+                shutil.rmtree(d, ignore_errors=True)
+    except Exception:
+        pass
+
+
+def _stamp(path: Path) -> List[float]:
+    try:
+        st = path.stat()
+        return [st.st_size, round(st.st_mtime, 3)]
+    except OSError:
+        return [-1, -1]
+
+
+class RunManifest:
+    def __init__(self, temp_dir: Path):
+        self.temp_dir = Path(temp_dir)
+        self.path = self.temp_dir / MANIFEST
+
+    def plan(self, pdf_paths: Iterable[Path]) -> Dict[str, str]:
+        """path -> unid prefix; stable across resumes, new PDFs get fresh prefixes."""
+        plan_file = self.temp_dir / PLAN
+        try:
+            plan = json.loads(plan_file.read_text(encoding="utf-8"))
+        except Exception:
+            plan = {}
+        nxt = max((int(v) for v in plan.values()), default=9999) + 1
+        changed = False
+        for p in pdf_paths:
+            if str(p) not in plan:
+                plan[str(p)] = str(nxt)
+                nxt += 1
+                changed = True
+        if changed:
+            plan_file.write_text(json.dumps(plan), encoding="utf-8")
+        return plan
+
+    def completed(self) -> Dict[str, dict]:
+        """Finished PDFs whose segment is still there and whose file did not change since."""
+        done: Dict[str, dict] = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        e = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line after a crash
+                    done[e["path"]] = e
+        except FileNotFoundError:
+            return {}
+        return {
+            p: e for p, e in done.items()
+            if (self.temp_dir / e.get("csv", "")).is_file() and _stamp(Path(p)) == e.get("stamp")
+        }
+
+    def record(self, path: str, prefix: str, pages: int) -> None:
+        entry = {"path": path, "prefix": prefix, "pages": pages, "csv": f"temp_{prefix}.csv",
+                 "stamp": _stamp(Path(path))}
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+        except Exception:
+            logger.exception("Could not checkpoint %s", path)
+
+
+def remember_incomplete(token: str, signature: str, spool_dir: Optional[Path] = None) -> None:
+    """Note the last kept run and the settings it ran with."""
+    try:
+        base = disk_base(spool_dir)
+        base.mkdir(parents=True, exist_ok=True)
+        (base / LAST_INCOMPLETE).write_text(json.dumps({"token": token, "signature": signature}),
+                                           encoding="utf-8")
+    except Exception:
+        logger.exception("Could not note incomplete run %s", token)
+
+
+def last_incomplete(spool_dir: Optional[Path] = None) -> Optional[Tuple[str, str]]:
+    """(token, signature) of the last kept run, if its dir is still around."""
+    try:
+        e = json.loads((disk_base(spool_dir) / LAST_INCOMPLETE).read_text(encoding="utf-8"))
+        token, signature = e["token"], e["signature"]
+    except Exception:
+        return None
+    if not valid_token(token) or find_run(token, spool_dir) is None:
+        return None
+    return token, signature
+
+
+def forget_incomplete(spool_dir: Optional[Path] = None) -> None:
+    try:
+        (disk_base(spool_dir) / LAST_INCOMPLETE).unlink(missing_ok=True)
+    except Exception:
+        pass
+
+
+def failed_paths(errors_file: Path) -> List[Path]:
+    """PDFs listed in a run's .errors.txt (lines are '<path>\\t<error>')."""
+    out: List[Path] = []
+    try:
+        for line in Path(errors_file).read_text(encoding="utf-8").splitlines():
+            path, sep, _ = line.partition("\t")
+            if sep and path.strip():
+                out.append(Path(path.strip()))
+    except OSError:
+        pass
+    return list(dict.fromkeys(out))
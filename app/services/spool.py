@@ -0,0 +1,44 @@
+# app/services/spool.py
+"""
+Where a run's temp (spool) dir lives: ExtractionRequest.spool_dir, else
+XTRACTOR_SPOOL_DIR, else the OS temp dir. Always a disk: the manifest in it is what
+makes an interrupted run resumable, and it has to survive a power loss.
+"""
+from __future__ import annotations
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import List, Optional
+
+SPOOL_DIR = os.getenv("XTRACTOR_SPOOL_DIR", "")
+
+_NAME = "xtractor-spool"
+
+
+def disk_base(spool_dir: Optional[Path] = None) -> Path:
+    if spool_dir:
+        return Path(spool_dir)
+    if SPOOL_DIR:
+        return Path(SPOOL_DIR)
+    return Path(tempfile.gettempdir()) / _NAME
+
+
+def _legacy_bases() -> List[Path]:
+    # before the spool moved out of the install: <app>/temp (or next to the frozen exe);
+    # runs of older builds may also still sit in tmpfs
+    app_temp = Path(sys.executable).parent / "temp" if getattr(sys, "frozen", False) else Path(__file__).parent / "temp"
+    return [app_temp, Path("/dev/shm") / _NAME]
+
+
+def all_bases(spool_dir: Optional[Path] = None) -> List[Path]:
+    """Every place a run's dir may be in (for resume lookups and the stale sweep)."""
+    out = [disk_base(spool_dir)] + _legacy_bases()
+    return [b for i, b in enumerate(out) if b not in out[:i]]
+
+
+def find_run(token: str, spool_dir: Optional[Path] = None) -> Optional[Path]:
+    for base in all_bases(spool_dir):
+        if (base / token).is_dir():
+            return base / token
+    return None
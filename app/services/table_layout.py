@@ -0,0 +1,94 @@
+# app/services/table_layout.py
+"""
+Learned revision-table layouts. Within a drawing set every sheet's revision block
+sits at the same place with the same column x-positions, so once a few pages agree
+on the column edges and the rev/desc/date assignment, later pages with the same
+page size are sliced by that template instead of re-running table and column
+detection. A page the template fails on goes through full detection; the template
+is only dropped (and learning starts over) when that finds a table with other
+columns. Sheets without a revision block in the clip leave it alone.
+"""
+from __future__ import annotations
+import os
+from dataclasses import asdict, dataclass
+from typing import List, Optional, Sequence
+
+from app.infra.spool_cache import SpoolCache
+
+# agreeing pages needed before a layout becomes a template
+LEARN_PAGES = int(os.getenv("REV_LAYOUT_LEARN_PAGES", "2"))
+# column edges within this distance (pt) are the same edge
+EDGE_TOL = 2.0
+# give up on a key after this many rejected templates (layout is not stable)
+MAX_GENERATIONS = 3
+
+
+@dataclass
+class TableLayout:
+    col_edges: List[float]
+    rev_idx: Optional[int]
+    desc_idx: Optional[int]
+    date_idx: Optional[int]
+    row_rulings: bool = True
+
+    def matches(self, other: "TableLayout") -> bool:
+        if len(self.col_edges) != len(other.col_edges):
+            return False
+        if (self.rev_idx, self.desc_idx, self.date_idx) != (other.rev_idx, other.desc_idx, other.date_idx):
+            return False
+        return all(abs(a - b) <= EDGE_TOL for a, b in zip(self.col_edges, other.col_edges))
+
+
+def layout_key(page_rect: Sequence[float], rotation: int, clip: Sequence[float]) -> str:
+    w = round(page_rect[2] - page_rect[0])
+    h = round(page_rect[3] - page_rect[1])
+    c = ",".join(f"{v:.0f}" for v in clip)
+    return f"{w}x{h}r{int(rotation) % 360}@{c}"
+
+
+class TableLayoutLearner:
+    """
+    Slot per key in the spool cache: {"gen": n, "layout": {...} | None}.
+    Observations are appended per generation so concurrent workers never clobber
+    each other; a rejected template bumps the generation and old votes are ignored.
+    """
+    def __init__(self, cache: SpoolCache, learn_pages: int = LEARN_PAGES):
+        self.cache = cache
+        self.learn_pages = max(1, learn_pages)
+
+    def _slot(self, key: str) -> dict:
+        slot = self.cache.get(key)
+        return slot if isinstance(slot, dict) else {"gen": 0, "layout": None}
+
+    def template(self, key: str) -> Optional[TableLayout]:
+        data = self._slot(key).get("layout")
+        if not data:
+            return None
+        try:
+            return TableLayout(**data)
+        except TypeError:
+            return None
+
+    def observe(self, key: str, layout: TableLayout) -> bool:
+        """Record a successfully parsed page; returns True once the layout became the template."""
+        slot = self._slot(key)
+        gen = int(slot.get("gen", 0))
+        if slot.get("layout") or gen >= MAX_GENERATIONS or len(layout.col_edges) < 3:
+            return False
+        obs_key = f"{key}:obs:{gen}"
+        self.cache.append(obs_key, asdict(layout))
+        agreeing = 0
+        for item in self.cache.collect(obs_key):
+            try:
+                if TableLayout(**item).matches(layout):
+                    agreeing += 1
+            except TypeError:
+                continue
+        if agreeing >= self.learn_pages:
+            self.cache.put(key, {"gen": gen, "layout": asdict(layout)})
+            return True
+        return False
+
+    def reject(self, key: str) -> None:
+        gen = int(self._slot(key).get("gen", 0))
+        self.cache.put(key, {"gen": gen + 1, "layout": None})
@@ -0,0 +1,255 @@
+# app/services/task_runner.py
+"""
+Per-PDF task scheduling on a worker pool with a wall-clock watchdog.
+
+Workers report each task start (pid, time) through WorkerChannels.heartbeat. A task
+whose worker has been on it longer than TASK_TIMEOUT_S, or whose worker died, is
+killed/abandoned and earns the PDF a strike; a PDF with HANG_STRIKES strikes is
+quarantined instead of retried. Transient I/O errors (file in use, share hiccups)
+are retried with exponential backoff.
+"""
+from __future__ import annotations
+import errno
+import logging
+import os
+import time
+from collections import Counter, deque
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from app.worker import WorkerChannels, worker_init
+
+logger = logging.getLogger(__name__)
+
+# wall-clock limit per PDF in seconds (0 = none)
+TASK_TIMEOUT_S = float(os.getenv("TASK_TIMEOUT_S", "900"))
+# retries for transient I/O errors, first wait, doubling each time
+RETRY_ATTEMPTS = int(os.getenv("TASK_RETRIES", "3"))
+RETRY_BACKOFF_S = float(os.getenv("TASK_RETRY_BACKOFF_S", "0.5"))
+# hangs/crashes/out-of-memory before a PDF is quarantined
+HANG_STRIKES = 2
+# a worker that vanished this long ago without a result is taken as crashed
+_CRASH_GRACE_S = 2.0
+
+_TRANSIENT_ERRNOS = {errno.EACCES, errno.EBUSY, errno.EAGAIN, errno.ETIMEDOUT, errno.ECONNRESET, errno.EIO}
+# Windows: sharing/lock violation, network path/name gone, semaphore timeout
+_TRANSIENT_WINERRORS = {32, 33, 53, 59, 64, 67, 121}
+_TRANSIENT_TEXT = ("being used by another process", "permission denied", "resource temporarily unavailable",
+                   "network name is no longer available", "semaphore timeout")
+
+
+def is_transient(exc: BaseException) -> bool:
+    """I/O errors worth retrying: locked files and flaky shares."""
+    if isinstance(exc, OSError):
+        if getattr(exc, "winerror", None) in _TRANSIENT_WINERRORS or exc.errno in _TRANSIENT_ERRNOS:
+            return True
+    # MuPDF reports open failures as RuntimeError with the OS message inside
+    msg = str(exc).lower()
+    return any(t in msg for t in _TRANSIENT_TEXT)
+
+
+def task_key(temp_dir, prefix: str) -> str:
+    """Heartbeat key: unique per run (temp dir) and PDF (unid prefix)."""
+    return f"{Path(temp_dir).name}:{prefix}"
+
+
+# ===== pool providers =====
+
+class OneShotPools:
+    """Pool for a single run: created on lease, closed (or terminated if tainted) on release."""
+    def __init__(self, ctx):
+        self.ctx = ctx
+
+    def lease(self, procs: int, maxtasks: int):
+        channels = WorkerChannels(self.ctx)
+        pool = self.ctx.Pool(processes=procs, maxtasksperchild=maxtasks,
+                             initializer=worker_init, initargs=(channels,))
+        return pool, channels
+
+    def release(self, pool, healthy: bool) -> None:
+        try:
+            if healthy:
+                pool.close()
+            else:
+                pool.terminate()  # a killed task stays in the pool's cache; close() would wait on it
+        finally:
+            try:
+                pool.join()
+            except Exception:
+                pass
+
+
+class WarmPools(OneShotPools):
+    """Pools kept between runs (one per shape), all sharing one set of channels."""
+    def __init__(self, ctx):
+        super().__init__(ctx)
+        self.channels = WorkerChannels(ctx)
+        self.pools: dict = {}
+
+    def lease(self, procs: int, maxtasks: int):
+        key = (procs, maxtasks)
+        if key not in self.pools:
+            self.pools[key] = self.ctx.Pool(processes=procs, maxtasksperchild=maxtasks,
+                                            initializer=worker_init, initargs=(self.channels,))
+        return self.pools[key], self.channels
+
+    def release(self, pool, healthy: bool) -> None:
+        if healthy:
+            return
+        for key, p in list(self.pools.items()):
+            if p is pool:
+                del self.pools[key]
+        super().release(pool, healthy=False)
+
+    def close(self) -> None:
+        for p in self.pools.values():
+            super().release(p, healthy=True)
+        self.pools.clear()
+
+
+# ===== runner =====
+
+class TaskRunner:
+    """
+    Feeds (pdf_path, req, temp_dir, prefix) tasks to `fn` on the pool, at most `slots`
+    in flight, and yields each result dict. Results of abandoned tasks are synthesised:
+    {"ok": False, "path", "error", "quarantined"?}.
+    """
+    def __init__(self, pool, channels: WorkerChannels, fn: Callable[[tuple], dict], slots: int,
+                 timeout: float = TASK_TIMEOUT_S, retries: int = RETRY_ATTEMPTS, backoff: float = RETRY_BACKOFF_S):
+        self.pool = pool
+        self.channels = channels
+        self.fn = fn
+        self.slots = max(1, slots)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.tainted = False  # a worker was killed/lost: the pool must not be close()d
+        self.strikes: Counter = Counter()
+        self.quarantined: List[Tuple[str, str]] = []  # (path, reason)
+        self._started: dict = {}  # key -> (pid, start time)
+        self._gone: dict = {}     # key -> when its worker was first seen dead
+
+    def _read_heartbeats(self) -> None:
+        hb = self.channels.heartbeat
+        try:
+            while not hb.empty():
+                key, pid, t0 = hb.get()
+                self._started[key] = (pid, t0)
+        except Exception:
+            pass
+
+    def _workers(self) -> dict:
+        try:
+            return {p.pid: p for p in self.pool._pool}
+        except Exception:
+            return {}
+
+    def _check(self, key: str) -> Optional[str]:
+        """Reason to abandon the running task `key`, if any."""
+        if key not in self._started:
+            return None  # still queued
+        pid, t0 = self._started[key]
+        workers = self._workers()
+        if self.timeout > 0 and time.time() - t0 > self.timeout:
+            proc = workers.get(pid)
+            if proc is not None:
+                try:
+                    proc.kill()
+                except Exception:
+                    pass
+            return f"timed out after {self.timeout:.0f}s"
+        proc = workers.get(pid)
+        if workers and (proc is None or proc.exitcode is not None):
+            first = self._gone.setdefault(key, time.time())
+            if time.time() - first > _CRASH_GRACE_S:
+                return "worker crashed"
+        return None
+
+    def _strike(self, task: tuple, reason: str) -> Optional[dict]:
+        """Count a hang/crash/OOM; the result to yield once the PDF is quarantined, else None (retry)."""
+        path = str(task[0])
+        self.strikes[path] += 1
+        if self.strikes[path] < HANG_STRIKES:
+            logger.warning("Retrying %s (%s)", path, reason)
+            return None
+        self.quarantined.append((path, reason))
+        logger.warning("Quarantined %s (%s)", path, reason)
+        return {"ok": False, "path": path, "error": f"Quarantined: {reason}", "quarantined": True}
+
+    def run(self, tasks: List[tuple]) -> Iterator[dict]:
+        pending = deque((t, 0) for t in tasks)  # (task, transient retries so far)
+        delayed: list = []  # (ready_at, task, attempt)
+        running: dict = {}  # key -> (AsyncResult, task, attempt)
+
+        while pending or delayed or running:
+            if self.channels.cancel.is_set():
+                # nothing new starts; queued work comes back as skipped
+                for t, _ in pending:
+                    yield {"ok": False, "cancelled": True, "path": str(t[0])}
+                for _, t, _ in delayed:
+                    yield {"ok": False, "cancelled": True, "path": str(t[0])}
+                pending.clear()
+                delayed.clear()
+
+            now = time.monotonic()
+            for item in [d for d in delayed if d[0] <= now]:
+                delayed.remove(item)
+                pending.append((item[1], item[2]))
+
+            while pending and len(running) < self.slots:
+                task, attempt = pending.popleft()
+                key = task_key(task[2], task[3])
+                self._started.pop(key, None)
+                self._gone.pop(key, None)
+                running[key] = (self.pool.apply_async(self.fn, (task,)), task, attempt)
+
+            self._read_heartbeats()
+            progressed = False
+            for key, (ar, task, attempt) in list(running.items()):
+                if ar.ready():
+                    del running[key]
+                    progressed = True
+                    try:
+                        res = ar.get()
+                    except Exception as e:
+                        res = {"ok": False, "path": str(task[0]), "error": f"{type(e).__name__}: {e}"}
+                    if res.get("transient") and attempt < self.retries:
+                        wait = self.backoff * (2 ** attempt)
+                        logger.info("Transient error on %s, retry in %.1fs: %s", task[0], wait, res.get("error"))
+                        delayed.append((time.monotonic() + wait, task, attempt + 1))
+                        continue
+                    if res.get("oom"):
+                        out = self._strike(task, res.get("error", "out of memory"))
+                        if out is None:
+                            pending.append((task, attempt))
+                            continue
+                        res = out
+                    yield res
+                    continue
+
+                reason = self._check(key)
+                if reason:
+                    # the pool never completes this job; drop it and mark the pool
+                    del running[key]
+                    self.tainted = True
+                    progressed = True
+                    out = self._strike(task, reason)
+                    if out is None:
+                        pending.append((task, attempt))
+                    else:
+                        yield out
+
+            if not progressed:
+                time.sleep(0.05)
+
+
+def run_with_retries(fn: Callable[[tuple], dict], task: tuple, retries: int = RETRY_ATTEMPTS,
+                     backoff: float = RETRY_BACKOFF_S) -> dict:
+    """In-process variant (no watchdog: a thread cannot be killed): transient retries only."""
+    for attempt in range(retries + 1):
+        res = fn(task)
+        if not res.get("transient") or attempt == retries:
+            return res
+        time.sleep(backoff * (2 ** attempt))
+    return res
@@ -16,8 +16,10 @@ from PIL import Image  # Make sure this is at the top
 
 from app.ui.pdf_viewer import PDFViewer
 from app.domain.models import OcrSettings, ExtractionRequest
+from app.domain.events import FileDone, FileFailed, PhaseChanged, RunWarning
+from app.services.run_manifest import failed_paths, forget_incomplete, last_incomplete, remember_incomplete
 from app.controllers.extract_controller import ExtractController
-from app.infra.pdf_adapter import PdfAdapter
+from app.controllers.detect_controller import DetectController
 from pathlib import Path
 
 from app.ui.ui_utils import create_tooltip, EditableTreeview, CTkOptionMenuNoArrow
@@ -121,6 +123,10 @@ class XtractorGUI:
         self.root = root
 
         self.extractor = ExtractController()
+        # start the extraction host (warm worker pool) once the window is up
+        self.root.after(1500, self.extractor.warm_up)
+        self.detector = DetectController()
+        self._detect_job = None
 
         # compute UI scale from Tk (dpi-aware thanks to main.py)
         self._ui_scale = float(self.root.tk.call('tk', 'scaling')) / (96 / 72)  # = 1.0 at 96 DPI
@@ -152,6 +158,15 @@ class XtractorGUI:
                 self.extractor.cancel(self._job)
         except Exception:
             pass
+        try:
+            if self._detect_job:
+                self.detector.cancel(self._detect_job)
+        except Exception:
+            pass
+        try:
+            self.extractor.shutdown()
+        except Exception:
+            pass
         self.root.destroy()
 
     # inside class XtractorGUI
@@ -184,10 +199,11 @@ class XtractorGUI:
             wb = Workbook()
             ws_area = wb.active
             ws_area.title = "Rectangles"
-            ws_area.append(["Title", "x0", "y0", "x1", "y1"])
+            ws_area.append(["Title", "x0", "y0", "x1", "y1", "Scope"])
             for area in self.pdf_viewer.areas:
                 title, (x0, y0, x1, y1) = _area_get_title_and_coords(area)
-                ws_area.append([title, x0, y0, x1, y1])
+                scope = area.get("scope", "page") if isinstance(area, dict) else getattr(area, "scope", "page")
+                ws_area.append([title, x0, y0, x1, y1, scope])
 
             if self.pdf_viewer.revision_area:
                 ws_rev = wb.create_sheet("RevisionTable")
@@ -218,10 +234,13 @@ class XtractorGUI:
             # always store GUI dicts in PDFViewer.areas
             areas = []
             for row in ws_area.iter_rows(min_row=2, values_only=True):
-                title, x0, y0, x1, y1 = row
+                title, x0, y0, x1, y1 = row[:5]
                 if None in (x0, y0, x1, y1):
                     continue
-                areas.append({"title": title or "Area", "coordinates": [float(x0), float(y0), float(x1), float(y1)]})
+                # optional 6th column (older exports have none)
+                scope = "document" if len(row) > 5 and str(row[5] or "").strip().lower() == "document" else "page"
+                areas.append({"title": title or "Area", "coordinates": [float(x0), float(y0), float(x1), float(y1)],
+                              "scope": scope})
             self.pdf_viewer.set_gui_areas(areas)
 
             # Revision area (optional)
@@ -258,10 +277,11 @@ class XtractorGUI:
         self.treeview_item_ids = {}
         for index, area in enumerate(self.pdf_viewer.areas):
             title, (x0, y0, x1, y1) = _area_get_title_and_coords(area)
-            item_id = self.areas_tree.insert("", "end", values=(title, x0, y0, x1, y1))
+            tags = ("doc_scope",) if isinstance(area, dict) and area.get("scope") == "document" else ()
+            item_id = self.areas_tree.insert("", "end", values=(title, x0, y0, x1, y1), tags=tags)
             self.treeview_item_ids[item_id] = index
 
-    def _prompt_revision_columns(self, rows):
+    def _prompt_revision_columns(self, rows, suggested=None):
         if not rows:
             print("[DetectPattern] _prompt_revision_columns called with no rows.")
             return None
@@ -272,10 +292,11 @@ class XtractorGUI:
             messagebox.showinfo("Detect Pattern", "Revision pattern could not be identified.")
             return None
 
-        parser = RevisionParser(None)
-        suggested_rev, suggested_desc, suggested_date = parser.detect_column_indices(rows)
+        if suggested is None:
+            suggested = RevisionParser(None).detect_column_indices(rows)
+        suggested_rev, suggested_desc, suggested_date = suggested
         print(
-            "[DetectPattern] Suggested column indices from parser:",
+            "[DetectPattern] Suggested column indices:",
             f"rev={suggested_rev}, desc={suggested_desc}, date={suggested_date}"
         )
 
@@ -283,7 +304,9 @@ class XtractorGUI:
         prev_desc = self.revision_column_selection.get("desc") if self.revision_column_selection else None
         prev_date = self.revision_column_selection.get("date") if self.revision_column_selection else None
 
-        default_rev_idx = prev_rev if isinstance(prev_rev, int) and 0 <= prev_rev < column_count else None
+        default_rev_idx = prev_rev if isinstance(prev_rev, int) and 0 <= prev_rev < column_count else suggested_rev
+        if default_rev_idx is not None and not (0 <= default_rev_idx < column_count):
+            default_rev_idx = None
         if column_count <= 0:
             default_rev_idx = 0
         elif default_rev_idx is None:
@@ -391,6 +414,16 @@ class XtractorGUI:
 
         return result.get("selection")
 
+    def _checked_pdf_paths(self) -> list:
+        paths = []
+        for iid in self.files_tree_widget.get_checked():
+            item = self.files_tree_widget.item(iid)
+            if item and "values" in item and item["values"]:
+                path = item["values"][0]
+                if path.lower().endswith(".pdf"):
+                    paths.append(Path(path))
+        return paths
+
     def detect_revision_pattern(self):
         rev_area = self.pdf_viewer.revision_area
         pdf_path = getattr(self.pdf_viewer, "current_pdf_path", None) or self.recent_pdf_path
@@ -409,34 +442,68 @@ class XtractorGUI:
             messagebox.showinfo("Detect Pattern", "Revision pattern could not be identified.")
             return
 
-        adapter = PdfAdapter()
+        if getattr(self, "_detect_job", None):
+            return
+
+        # sample the checked files (the PDF on screen always counts); runs in a process pool
         try:
-            with adapter.open(pdf_path) as doc:
-                if doc.page_count == 0:
-                    print("[DetectPattern] PDF appears to have no pages.")
-                    raise ValueError("PDF has no pages")
-                page_number = getattr(getattr(self.pdf_viewer, "page", None), "number", 0) or 0
-                page_number = min(max(page_number, 0), doc.page_count - 1)
-                print(
-                    f"[DetectPattern] Analysing PDF '{pdf_path}' page {page_number + 1}/{doc.page_count}"
-                )
-                page = doc.load_page(page_number)
-                rows = adapter.find_table_rows(page, tuple(coords))
-                print(
-                    "[DetectPattern] PdfAdapter returned",
-                    f"{len(rows) if rows else 0} rows"
-                )
+            paths = self._checked_pdf_paths()
+        except Exception:
+            paths = []
+        try:
+            page_number = getattr(getattr(self.pdf_viewer, "page", None), "number", 0) or 0
+            self._detect_job = self.detector.start(paths, tuple(coords), first=Path(pdf_path),
+                                                   first_page=page_number)
         except Exception as exc:
-            print(f"[DetectPattern] Exception during table detection: {exc}")
+            print(f"[DetectPattern] Exception while starting detection: {exc}")
             messagebox.showerror("Detect Pattern", f"Failed to analyse revision table: {exc}")
             return
 
+        print(f"[DetectPattern] Sampling {len(self._detect_job.futures)} PDF(s) in the background.")
+        self.detect_revision_pattern_button.configure(state="disabled", text="Detecting…")
+
+        def _tick():
+            job = self._detect_job
+            if job is None:
+                return
+            polled = self.detector.poll(job)
+            if polled is not None:
+                done, total = polled
+                self.detect_revision_pattern_button.configure(text=f"Detecting {done}/{total}")
+                self.root.after(150, _tick)
+                return
+            self._detect_job = None
+            self.detect_revision_pattern_button.configure(text="Detect")
+            self.update_revision_pattern_controls()
+            try:
+                result = self.detector.finish(job)
+            except Exception as exc:
+                print(f"[DetectPattern] Exception during table detection: {exc}")
+                messagebox.showerror("Detect Pattern", f"Failed to analyse revision table: {exc}")
+                return
+            self._apply_revision_detection(job, result)
+
+        self.root.after(150, _tick)
+
+    def _apply_revision_detection(self, job, result):
+        print(
+            "[DetectPattern] Tables found in",
+            f"{result.samples_used}/{result.samples_total} sampled PDFs;",
+            f"columns={result.columns} confidence={tuple(round(c, 2) for c in result.column_confidence)}"
+        )
+        for score in result.patterns:
+            print(
+                f"[DetectPattern]   {score.key}: {score.matches}/{score.total}",
+                f"({score.confidence:.0%}, {score.samples} sample(s) agree)"
+            )
+
+        rows = result.sample_rows
         if not rows:
             print("[DetectPattern] No rows extracted from detected table region.")
             messagebox.showinfo("Detect Pattern", "Revision pattern could not be identified.")
             return
 
-        selection = self._prompt_revision_columns(rows)
+        selection = self._prompt_revision_columns(rows, suggested=result.columns)
         if selection is None:
             print("[DetectPattern] User cancelled or dialog failed to return column selection.")
             return
@@ -444,69 +511,13 @@ class XtractorGUI:
         rev_idx, desc_idx, date_idx = selection
         self.revision_column_selection = {"rev": rev_idx, "desc": desc_idx, "date": date_idx}
 
-        first_column = []
-        for row in rows:
-            if not row:
-                continue
-            cell = ""
-            if isinstance(rev_idx, int) and 0 <= rev_idx < len(row):
-                cell = str(row[rev_idx]).strip()
-            elif row:
-                cell = str(row[0]).strip()
-            if not cell:
-                continue
-            first_column.append(cell)
-
-        if not first_column:
-            print("[DetectPattern] Extracted rows had no usable revision values.")
-            messagebox.showinfo("Detect Pattern", "Revision pattern could not be identified.")
-            return
-
-        data_values = [c for c in first_column if not re.search(r"\brev(ision)?", c, re.IGNORECASE)]
-        if not data_values:
-            data_values = first_column
-
-        normalized_values = []
-        for value in data_values:
-            cleaned = re.sub(r"\s+", "", value)
-            if cleaned:
-                normalized_values.append(cleaned)
-
-        if not normalized_values:
-            print("[DetectPattern] No normalized revision values available for pattern matching.")
-            messagebox.showinfo("Detect Pattern", "Revision pattern could not be identified.")
-            return
-
-        total = len(normalized_values)
-        best_key = None
-        best_ratio = 0.0
-        best_matches = 0
-
-        for key, info in REVISION_PATTERNS.items():
-            try:
-                regex = re.compile(info["pattern"], re.IGNORECASE)
-            except re.error:
-                continue
-            matches = sum(1 for value in normalized_values if regex.fullmatch(value))
-            if not matches:
-                continue
-            ratio = matches / total if total else 0
-            if (ratio > best_ratio) or (abs(ratio - best_ratio) < 1e-9 and matches > best_matches):
-                best_key = key
-                best_ratio = ratio
-                best_matches = matches
+        # the user may have picked another rev column than the vote: rescore on that one
+        if rev_idx != result.columns[0]:
+            result = self.detector.rescore(job, rev_idx)
 
+        best_key = result.pattern_key
         if best_key is None:
-            print("[DetectPattern] Pattern matching found no candidates.")
-            messagebox.showinfo("Detect Pattern", "Revision pattern could not be identified.")
-            return
-
-        required_ratio = 1.0 if total <= 2 else 0.6
-        if best_ratio < required_ratio:
-            print(
-                "[DetectPattern] Best match ratio",
-                f"{best_ratio:.2f} below threshold {required_ratio:.2f}"
-            )
+            print("[DetectPattern] No pattern cleared the match threshold across the samples.")
             messagebox.showinfo("Detect Pattern", "Revision pattern could not be identified.")
             return
 
@@ -518,7 +529,11 @@ class XtractorGUI:
 
         self.revision_pattern_var.set(display_value)
         self.revision_pattern_menu.set(display_value)
-        print(f"Detected revision pattern '{best_key}' using {best_matches}/{total} samples.")
+        best = result.patterns[0]
+        print(
+            f"Detected revision pattern '{best_key}' using {best.matches}/{best.total} values",
+            f"from {result.samples_used} PDF(s)."
+        )
 
     def update_revision_pattern_controls(self):
         if not hasattr(self, "detect_revision_pattern_button"):
@@ -526,7 +541,8 @@ class XtractorGUI:
 
         has_revision_area = bool(self.pdf_viewer.revision_area)
         pdf_available = bool(getattr(self.pdf_viewer, "current_pdf_path", None) or self.recent_pdf_path)
-        state = "normal" if (has_revision_area and pdf_available) else "disabled"
+        detecting = bool(getattr(self, "_detect_job", None))
+        state = "normal" if (has_revision_area and pdf_available and not detecting) else "disabled"
         self.detect_revision_pattern_button.configure(state=state)
 
     def on_revision_area_changed(self):
@@ -841,6 +857,8 @@ class XtractorGUI:
         for col in ("x0", "y0", "x1", "y1"):
             self.areas_tree.heading(col, text=col)
             self.areas_tree.column(col, width=40, anchor="center")
+        # document-scope areas (read once per PDF) in italics
+        self.areas_tree.tag_configure("doc_scope", font=(BUTTON_FONT, 9, "italic"))
         self.areas_tree.pack(side="left", fill="both", expand=True)
 
         scrollbar = ctk.CTkScrollbar(self.areas_frame, orientation="vertical", command=self.areas_tree.yview)
@@ -1319,7 +1337,7 @@ class XtractorGUI:
         self.dpi_wrap.grid_propagate(False)
 
         # values with newlines
-        dpi_values = [f"{v}\nDPI" for v in ["50", "75", "150", "300", "450", "600"]]
+        dpi_values = [f"{v}\nDPI" for v in ["50", "75", "150", "300", "450", "600", "Auto"]]
         self.dpi_var = ctk.StringVar(value="150\nDPI")
 
         self.dpi_menu = CTkOptionMenuNoArrow(
@@ -1934,6 +1952,13 @@ class XtractorGUI:
         print("OCR mode:", self.ocr_settings['enable_ocr'])
 
     def dpi_callback(self, dpi_value):
+        # "Auto" calibrates a per-area DPI at extraction time, capped at 600
+        if str(dpi_value).split()[0].lower() == "auto":
+            self.ocr_settings['auto_dpi'] = True
+            self.ocr_settings['dpi_value'] = 600
+            print("DPI set to: Auto (max 600)")
+            return
+        self.ocr_settings['auto_dpi'] = False
         # Accept both plain numbers and labels like "150 DPI"
         try:
             num = int(str(dpi_value).split()[0])
@@ -1977,7 +2002,8 @@ class XtractorGUI:
         zoom_level = float(value)
         self.pdf_viewer.set_zoom(zoom_level)  # Update zoom in PDFViewer
 
-    def start_extraction(self):
+    def start_extraction(self, only_paths=None, resume_token=None):
+        """only_paths/resume_token: re-run just these PDFs inside an earlier (incomplete) run."""
         # --- guards (unchanged) ---
         if not self.pdf_viewer.areas:
             messagebox.showerror("Extraction Error", "No areas defined. Please select areas before extracting.")
@@ -1994,14 +2020,7 @@ class XtractorGUI:
 
 
         # collect checked PDFs
-        checked = self.files_tree_widget.get_checked()
-        selected_paths = []
-        for iid in checked:
-            item = self.files_tree_widget.item(iid)
-            if item and "values" in item and item["values"]:
-                path = item["values"][0]
-                if path.lower().endswith(".pdf"):
-                    selected_paths.append(Path(path))
+        selected_paths = list(only_paths) if only_paths else self._checked_pdf_paths()
         if not selected_paths:
             messagebox.showerror("No Files Selected", "Please check at least one PDF to extract.")
             return
@@ -2018,6 +2037,7 @@ class XtractorGUI:
         # progress UI
         self.start_time = time.time()
         self.progress_window = ctk.CTkToplevel(self.root)
+        self.progress_errors = None  # live error list, created on the first error
         self.progress_window.title("Progress")
         self.progress_window.geometry("320x150")
         self.progress_window.transient(self.root)
@@ -2060,7 +2080,8 @@ class XtractorGUI:
             except Exception:
                 pass
             title, (x0, y0, x1, y1) = _area_get_title_and_coords(a)
-            areas_spec.append(AreaSpec(title=title, rect=(x0, y0, x1, y1)))
+            scope = a.get("scope", "page") if isinstance(a, dict) else "page"
+            areas_spec.append(AreaSpec(title=title, rect=(x0, y0, x1, y1), scope=scope))
 
         # Revision area
         rev_spec = None
@@ -2082,6 +2103,7 @@ class XtractorGUI:
             ocr=OcrSettings(
                 mode=self.ocr_settings['enable_ocr'],
                 dpi=int(self.ocr_settings['dpi_value']),
+                auto_dpi=bool(self.ocr_settings.get('auto_dpi')),
                 tessdata_dir=Path(self.ocr_settings['tessdata_folder']) if self.ocr_settings.get(
                     'tessdata_folder') else None
             ),
@@ -2090,10 +2112,29 @@ class XtractorGUI:
             revision_date_index=self.revision_column_selection.get("date"),
         )
 
+        # offer to continue the last incomplete run if it used the same settings
+        signature = repr((sorted(str(p) for p in req.pdf_paths), req.areas, req.revision_area,
+                          req.revision_regex, req.ocr.mode, req.ocr.dpi, req.ocr.auto_dpi,
+                          str(req.ocr.tessdata_dir or ""), req.layers_include, req.layers_exclude,
+                          req.revision_column_index, req.revision_description_index, req.revision_date_index))
+        pending = last_incomplete()  # noted in the spool base, so it survives a restart
+        forget_incomplete()
+        if resume_token is None and pending and pending[1] == signature:
+            if messagebox.askyesno("Resume extraction",
+                                   "The last extraction did not finish.\n"
+                                   "Resume it? PDFs it already finished are skipped."):
+                resume_token = pending[0]
+        self._run_signature = signature
+        if resume_token:
+            from dataclasses import replace
+            req = replace(req, resume_token=resume_token)
+
         # start job via controller
         self._job = self.extractor.start(req)
 
         def _tick():
+            for ev in self.extractor.events(self._job):
+                self._on_extraction_event(ev)
             polled = self.extractor.poll(self._job)
             if polled is not None:
                 processed, total = polled
@@ -2105,10 +2146,6 @@ class XtractorGUI:
                         except Exception:
                             pass
                         self._progress_is_indeterminate = False
-                        try:
-                            self.progress_label.configure(text="Processing PDFs…")
-                        except Exception:
-                            pass
                     self.total_files_label.configure(text=f"Processed pages: {processed}/{total}")
                     self.progress_var.set(processed / max(total, 1))
                 else:
@@ -2135,26 +2172,137 @@ class XtractorGUI:
                 except Exception:
                     pass
 
-                out = self.extractor.finish(self._job)  # Path | None
+                job = self._job
+                out = self.extractor.finish(job)  # Path | None
                 self._job = None
 
                 end_time = time.time()
                 elapsed = end_time - self.start_time
                 formatted = time.strftime("%H:%M:%S", time.gmtime(elapsed))
 
+                if job.inline is not None:
+                    # small run done in-process: show rows, export on request
+                    self._show_inline_results(job.inline, formatted, job.summary)
+                    return
+
+                # incomplete runs keep their spool; remember the token for a resume
+                if job.resume_token and (job.cancelled or job.error or job.failures):
+                    remember_incomplete(job.resume_token, getattr(self, "_run_signature", ""))
+
                 if not out or not out.exists():
                     # treat as cancelled or failed (controller does not return a separate status)
                     messagebox.showinfo("Stopped", f"Extraction was cancelled or failed after {formatted}.")
                     return
 
-                if messagebox.askyesno("Extraction Complete", f"Completed in {formatted}.\nOpen the Excel file?"):
+                failed = f"\n{len(job.failures)} file(s) failed (see the .errors.txt next to it)." if job.failures else ""
+                if job.cancelled:
+                    title, text = "Extraction Stopped", f"Cancelled after {formatted}; rows read so far were saved."
+                else:
+                    title, text = "Extraction Complete", f"Completed in {formatted}."
+                learned = ("\n\nArea strategy:\n" + "\n".join(job.summary)) if job.summary else ""
+                if messagebox.askyesno(title, f"{text}{failed}{learned}\nOpen the Excel file?"):
                     try:
                         os.startfile(out)
                     except Exception as e:
                         messagebox.showerror("Error", f"Could not open the Excel file: {e}")
 
+                if job.failures and job.resume_token and not job.cancelled:
+                    errlog = Path(self.output_excel_path).with_suffix(".errors.txt")
+                    retry = failed_paths(errlog) or [Path(f.path) for f in job.failures]
+                    if messagebox.askyesno("Retry failed files",
+                                           f"Re-run the {len(retry)} failed file(s)?\n"
+                                           "Rows of the files that worked are reused."):
+                        self.start_extraction(only_paths=retry, resume_token=job.resume_token)
+
         self.root.after(100, _tick)
 
+    _PHASE_TEXT = {
+        "discovery": "Counting pages… (waiting for remote PDFs if needed)",
+        "extract": "Processing PDFs…",
+        "merge": "Merging results…",
+        "write": "Writing Excel…",
+    }
+
+    def _on_extraction_event(self, ev):
+        """Live updates for the progress window (phase text, last file, error list)."""
+        try:
+            if isinstance(ev, PhaseChanged):
+                self.progress_label.configure(text=self._PHASE_TEXT.get(ev.phase, ev.phase))
+            elif isinstance(ev, FileDone) and self._job and self._job.phase == "extract":
+                self.progress_label.configure(text=f"Processing PDFs… {Path(ev.path).name} ({ev.seconds:.1f}s)")
+            elif isinstance(ev, (FileFailed, RunWarning)):
+                box = getattr(self, "progress_errors", None)
+                if box is None or not box.winfo_exists():
+                    self.progress_window.geometry("420x300")
+                    box = self.progress_errors = ctk.CTkTextbox(self.progress_window, height=120)
+                    box.pack(fill="both", expand=True, padx=10, pady=(0, 8))
+                if isinstance(ev, FileFailed):
+                    line = f"{Path(ev.path).name}: {ev.error}"
+                else:
+                    line = f"Warning: {ev.message}"
+                box.insert("end", line + "\n")
+                box.see("end")
+        except Exception:
+            pass
+
+    def _show_inline_results(self, result, formatted: str, summary=()):
+        win = ctk.CTkToplevel(self.root)
+        win.title("Extraction Results")
+        win.geometry("900x420")
+        win.transient(self.root)
+
+        n_pdfs = len({(r[3], r[4]) for r in result.rows if len(r) > 4})
+        status = f"{len(result.rows)} row(s) from {n_pdfs} PDF(s) in {formatted}"
+        if result.cancelled:
+            status += " (cancelled)"
+        if result.errors:
+            status += f" | {len(result.errors)} error(s)"
+        ctk.CTkLabel(win, text=status, anchor="w").pack(fill="x", padx=12, pady=(10, 4))
+        if summary:
+            ctk.CTkLabel(win, text="Area strategy: " + " | ".join(summary), anchor="w", justify="left",
+                         wraplength=860).pack(fill="x", padx=12, pady=(0, 4))
+
+        frame = ctk.CTkFrame(win, fg_color="transparent")
+        frame.pack(fill="both", expand=True, padx=12, pady=(0, 6))
+        cols = [str(i) for i in range(len(result.headers))]
+        tree = ttk.Treeview(frame, columns=cols, show="headings")
+        for i, h in enumerate(result.headers):
+            tree.heading(str(i), text=h)
+            tree.column(str(i), width=110, anchor="w", stretch=False)
+        for row in result.rows:
+            tree.insert("", "end", values=[str(v) for v in row])
+        ysb = ttk.Scrollbar(frame, orient="vertical", command=tree.yview)
+        xsb = ttk.Scrollbar(frame, orient="horizontal", command=tree.xview)
+        tree.configure(yscrollcommand=ysb.set, xscrollcommand=xsb.set)
+        tree.grid(row=0, column=0, sticky="nsew")
+        ysb.grid(row=0, column=1, sticky="ns")
+        xsb.grid(row=1, column=0, sticky="ew")
+        frame.grid_rowconfigure(0, weight=1)
+        frame.grid_columnconfigure(0, weight=1)
+
+        if result.errors:
+            err_box = ctk.CTkTextbox(win, height=60)
+            err_box.insert("end", "\n".join(result.errors))
+            err_box.configure(state="disabled")
+            err_box.pack(fill="x", padx=12, pady=(0, 6))
+
+        def export():
+            try:
+                out = self.extractor.export(result, Path(self.output_excel_path))
+            except Exception as e:
+                messagebox.showerror("Export Error", f"Could not write the Excel file: {e}", parent=win)
+                return
+            if messagebox.askyesno("Export Complete", f"Saved to {out.name}.\nOpen the Excel file?", parent=win):
+                try:
+                    os.startfile(out)
+                except Exception as e:
+                    messagebox.showerror("Error", f"Could not open the Excel file: {e}", parent=win)
+
+        buttons = ctk.CTkFrame(win, fg_color="transparent")
+        buttons.pack(fill="x", padx=12, pady=(0, 10))
+        ctk.CTkButton(buttons, text="Close", width=80, command=win.destroy).pack(side="right")
+        ctk.CTkButton(buttons, text="Export to Excel", width=120, command=export).pack(side="right", padx=(0, 8))
+
     def on_cancel_extraction(self):
         if hasattr(self, "_job") and self._job:
             if messagebox.askyesno("Cancel extraction", "Stop the extraction now?"):
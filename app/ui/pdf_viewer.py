@@ -10,6 +10,11 @@ from app.ui.constants import *
 from tkinter.simpledialog import askstring  # For custom title input
 
 
+def _area_scope(a) -> str:
+    """'document' for areas read once per PDF, else 'page' (dicts or AreaSpec)."""
+    scope = a.get("scope") if isinstance(a, dict) else getattr(a, "scope", None)
+    return "document" if scope == "document" else "page"
+
 
 class PDFViewer:
     def __init__(self, parent, master):
@@ -184,7 +189,8 @@ class PDFViewer:
             try:
                 coords = self._area_coords(a)
                 title = self._area_title(a, "Area")
-                out.append({"title": title, "coordinates": [float(c) for c in coords]})
+                out.append({"title": title, "coordinates": [float(c) for c in coords],
+                            "scope": _area_scope(a)})
             except Exception:
                 pass
         return out
@@ -195,7 +201,7 @@ class PDFViewer:
         for a in areas or []:
             coords = self._area_coords(a)
             title = self._area_title(a, "Area")
-            norm.append({"title": title, "coordinates": [float(c) for c in coords]})
+            norm.append({"title": title, "coordinates": [float(c) for c in coords], "scope": _area_scope(a)})
         self.areas = norm
         self.update_rectangles()
 
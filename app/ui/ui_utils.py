@@ -18,6 +18,7 @@ class EditableTreeview(ttk.Treeview):
 
         self.context_menu = tk.Menu(self, tearoff=0)
         self.context_menu.add_command(label="Remove Row", command=self.remove_row)
+        self.context_menu.add_command(label="Toggle Document Scope", command=self.toggle_document_scope)
 
         # --- drag-to-reorder state ---
         self._drag_iid = None
@@ -81,6 +82,21 @@ class EditableTreeview(ttk.Treeview):
             self.root_window.pdf_viewer.update_rectangles()
             print("Removed rectangle and updated canvas.")
 
+    def toggle_document_scope(self):
+        """Document-scope areas are read once per PDF and copied to every page row."""
+        item = self.focus()
+        if item:
+            tags = set(self.item(item, "tags") or ())
+            tags ^= {"doc_scope"}
+            self.item(item, tags=tuple(tags))
+            self.update_areas_list()
+            self.root_window.update_areas_treeview()
+
+    def _row_area(self, row_id) -> dict:
+        title, x0, y0, x1, y1 = self.item(row_id, "values")
+        scope = "document" if "doc_scope" in (self.item(row_id, "tags") or ()) else "page"
+        return {"title": title, "coordinates": [float(x0), float(y0), float(x1), float(y1)], "scope": scope}
+
     def edit_cell(self, item, col, _):
         def on_ok():
             new_value = entry_var.get()
@@ -136,10 +152,7 @@ class EditableTreeview(ttk.Treeview):
 
     def update_areas_list(self):
         """Write current rows (in current on-screen order) back to the model and redraw."""
-        updated_areas = []
-        for row_id in self.get_children():
-            title, x0, y0, x1, y1 = self.item(row_id, "values")
-            updated_areas.append({"title": title, "coordinates": [float(x0), float(y0), float(x1), float(y1)]})
+        updated_areas = [self._row_area(row_id) for row_id in self.get_children()]
         self.root_window.pdf_viewer.areas = updated_areas
         self.root_window.pdf_viewer.update_rectangles()
 
@@ -199,14 +212,9 @@ class EditableTreeview(ttk.Treeview):
         """Sync current on-screen order -> model, redraw rectangles, and rebuild the table mapping."""
         updated_areas = []
         for row_id in self.get_children():
-            vals = self.item(row_id, "values")
-            if not vals:
+            if not self.item(row_id, "values"):
                 continue
-            title, x0, y0, x1, y1 = vals
-            updated_areas.append({
-                "title": title,
-                "coordinates": [float(x0), float(y0), float(x1), float(y1)]
-            })
+            updated_areas.append(self._row_area(row_id))
 
         # write back to domain
         self.root_window.pdf_viewer.areas = updated_areas
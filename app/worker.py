@@ -0,0 +1,114 @@
+# app/worker.py
+"""
+Process context for extraction/detection pools. Nothing here (or in what the
+workers import) touches the GUI stack, so children never load customtkinter,
+PIL or tkdnd. On Linux workers fork from a forkserver that has pymupdf and the
+services imported once; elsewhere they are spawned.
+"""
+from __future__ import annotations
+import multiprocessing as mp
+import os
+import sys
+import time
+
+# imported once by the forkserver; forked workers inherit them
+WORKER_PRELOAD = ["pymupdf", "app.services.extraction_service"]
+
+# "spawn" | "forkserver" | "fork"; empty = forkserver on Linux, spawn elsewhere
+START_METHOD = os.getenv("WORKER_START_METHOD", "").strip().lower()
+
+# modules a worker should never have loaded (checked by the startup benchmark)
+GUI_MODULES = ("customtkinter", "tkinter", "tkinterdnd2", "ttkwidgets", "PIL", "app.ui")
+
+
+def worker_context():
+    method = START_METHOD or ("forkserver" if sys.platform.startswith("linux") else "spawn")
+    if method not in mp.get_all_start_methods():
+        method = "spawn"
+    ctx = mp.get_context(method)
+    if method == "forkserver":
+        try:
+            ctx.set_forkserver_preload(WORKER_PRELOAD)
+        except Exception:
+            pass
+    return ctx
+
+
+# address-space cap per pool worker in MB (0 = none; only where RLIMIT_AS exists)
+MEM_LIMIT_MB = int(os.getenv("WORKER_MEM_LIMIT_MB", "0"))
+
+# run-wide cancel flag (mp.Event in pool workers, threading.Event for inline runs)
+_CANCEL = None
+# task-start heartbeats for the parent's watchdog (pool workers only)
+_HEARTBEAT = None
+
+
+class WorkerChannels:
+    """What every pool worker gets through worker_init: the cancel flag and a heartbeat queue."""
+    def __init__(self, ctx):
+        self.cancel = ctx.Event()
+        # SimpleQueue writes straight to the pipe, so a start heartbeat survives a hard crash
+        self.heartbeat = ctx.SimpleQueue()
+
+
+def install_cancel(event) -> None:
+    global _CANCEL
+    _CANCEL = event
+
+
+class Cancelled(Exception):
+    """Raised by a step that stopped half-way for a cancel; its partial result must not be kept."""
+
+
+def cancel_requested() -> bool:
+    """Checked by tasks between pages and OCR tiles."""
+    ev = _CANCEL
+    try:
+        return ev is not None and ev.is_set()
+    except Exception:
+        return False
+
+
+def task_started(key: str) -> None:
+    """Tell the parent which task this worker (pid) just picked up."""
+    if _HEARTBEAT is not None:
+        try:
+            _HEARTBEAT.put((key, os.getpid(), time.time()))
+        except Exception:
+            pass
+
+
+def _limit_memory() -> None:
+    if MEM_LIMIT_MB <= 0:
+        return
+    try:
+        import resource
+        cap = MEM_LIMIT_MB * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (cap, cap))
+    except Exception:
+        pass  # Windows: no RLIMIT_AS, the wall-clock watchdog still applies
+
+
+def worker_init(channels: "WorkerChannels | None" = None) -> None:
+    """
+    Pool initializer: install the pool's channels, cap memory, and import the task
+    modules up front (the imports are a no-op under the preloaded forkserver).
+    """
+    global _HEARTBEAT
+    install_cancel(channels.cancel if channels else None)
+    _HEARTBEAT = channels.heartbeat if channels else None
+    _limit_memory()
+    import importlib
+    for name in WORKER_PRELOAD:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass
+
+
+def worker_probe(_=None) -> dict:
+    """Pool task: import what a real task needs, report pid and any GUI modules loaded."""
+    import importlib
+    for name in WORKER_PRELOAD:
+        importlib.import_module(name)
+    return {"pid": os.getpid(), "gui": sorted(m for m in GUI_MODULES if m in sys.modules)}
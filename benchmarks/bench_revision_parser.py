@@ -0,0 +1,62 @@
+# benchmarks/bench_revision_parser.py
+"""
+Micro-benchmark for RevisionParser on synthetic revision tables.
+
+    python -m benchmarks.bench_revision_parser [rows] [rows_per_table]
+
+Runs the same tables through a parser with the cell memo and one without it
+(cell_cache_size=0) and prints rows/s for both.
+"""
+from __future__ import annotations
+import random
+import sys
+import time
+
+from app.services.revision_parser import RevisionParser
+
+DESCRIPTIONS = [
+    "ISSUED FOR CONSTRUCTION", "ISSUED FOR TENDER", "REVISED PER COMMENTS",
+    "SCHEMATIC DESIGN", "DETAILED DESIGN SUBMISSION", "ADDENDUM 1", "RESUBMISSION",
+]
+HEADER = ["REV", "DESCRIPTION", "DATE", "CHK'D"]
+
+
+def make_tables(n_rows: int, per_table: int, seed: int = 0) -> list[list[list[str]]]:
+    rnd = random.Random(seed)
+    tables, made = [], 0
+    while made < n_rows:
+        k = min(per_table, n_rows - made)
+        rows = [HEADER]
+        for i in range(k):
+            rev = f"{chr(ord('A') + i % 26)}{rnd.randint(0, 9) if rnd.random() < 0.3 else ''}"
+            date = f"{rnd.randint(1, 28):02d}/{rnd.randint(1, 12):02d}/20{rnd.randint(10, 25)}"
+            rows.append([rev, rnd.choice(DESCRIPTIONS), date, rnd.choice(["AB", "JK", "MN"])])
+        tables.append(rows)
+        made += k
+    return tables
+
+
+def run(parser: RevisionParser, tables) -> tuple[float, int]:
+    t0 = time.perf_counter()
+    parsed = 0
+    for rows in tables:
+        parsed += len(parser.parse_table_rows(rows))
+    return time.perf_counter() - t0, parsed
+
+
+def main(argv: list[str]) -> None:
+    n_rows = int(argv[1]) if len(argv) > 1 else 1_000_000
+    per_table = int(argv[2]) if len(argv) > 2 else 8
+    tables = make_tables(n_rows, per_table)
+    print(f"{n_rows:,} rows in {len(tables):,} tables of <= {per_table} rows")
+
+    for label, parser in (
+        ("memoised", RevisionParser(None)),
+        ("no memo ", RevisionParser(None, cell_cache_size=0)),
+    ):
+        secs, parsed = run(parser, tables)
+        print(f"{label}: {secs:7.2f}s  {n_rows / secs:12,.0f} rows/s  ({parsed:,} revisions)")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,68 @@
+# benchmarks/bench_worker_startup.py
+"""
+Worker startup cost for the extraction pool.
+
+    python -m benchmarks.bench_worker_startup [rounds]
+
+For each start method, times pool creation up to the first finished task (what a
+revision-mode run pays per PDF, since those workers die after one file) and
+lists any GUI modules the worker loaded. Also times a fresh interpreter
+re-importing main.py the way spawn does (as __mp_main__).
+"""
+from __future__ import annotations
+import multiprocessing as mp
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from app.worker import WORKER_PRELOAD, worker_probe
+
+ROOT = Path(__file__).resolve().parents[1]
+
+_MAIN_REIMPORT = (
+    "import runpy, sys, time; t = time.perf_counter(); "
+    "runpy.run_path({main!r}, run_name='__mp_main__'); "
+    "print(round((time.perf_counter() - t) * 1000, 1), "
+    "[m for m in ('customtkinter', 'tkinterdnd2', 'PIL', 'app.ui.gui') if m in sys.modules])"
+)
+
+
+def time_pool(method: str, rounds: int) -> tuple[list[float], list[str]]:
+    ctx = mp.get_context(method)
+    if method == "forkserver":
+        ctx.set_forkserver_preload(WORKER_PRELOAD)
+    times, gui = [], []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        # maxtasksperchild=1 like revision mode: one fresh worker per task
+        with ctx.Pool(processes=1, maxtasksperchild=1) as pool:
+            res = pool.apply(worker_probe)
+        times.append((time.perf_counter() - t0) * 1000)
+        gui = res["gui"]
+    return times, gui
+
+
+def main_reimport() -> str:
+    code = _MAIN_REIMPORT.format(main=str(ROOT / "main.py"))
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+    if out.returncode:
+        return "failed: " + (out.stderr.strip().splitlines() or ["?"])[-1]
+    return out.stdout.strip() + " ms"
+
+
+def main() -> None:
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"main.py re-import (spawn child): {main_reimport()}")
+    for method in ("spawn", "forkserver"):
+        if method not in mp.get_all_start_methods():
+            continue
+        times, gui = time_pool(method, rounds)
+        # first forkserver round includes starting the server itself
+        print(f"{method:>10}: first {times[0]:7.1f} ms, median {statistics.median(times):7.1f} ms, "
+              f"GUI modules in worker: {gui or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
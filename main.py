@@ -7,14 +7,8 @@ import threading
 import sys
 from pathlib import Path
 import os
-import customtkinter as ctk
-from app.ui.gui import CTkDnD, XtractorGUI   # CTkDnD ensures tkdnd is loaded
-from app.ui.constants import (
-    INITIAL_WIDTH, INITIAL_HEIGHT,
-    INITIAL_X_POSITION, INITIAL_Y_POSITION,
-    VERSION_TEXT
-)
-from app.ui.dpi_utils import init_windows_dpi_awareness, apply_scaling, install_dpi_watcher
+# GUI imports live inside the functions below: spawned workers re-import this
+# module as __mp_main__ and must not pay for customtkinter/PIL/tkdnd.
 
 
 from app.logging_setup import configure_logging, log_file_path
@@ -68,6 +62,7 @@ def asset(rel_name: str) -> str:
 # ────────────────────────────────────────────────────────────
 def create_splash(master):
     """Returns (splash_window, cancel_animation_callable)."""
+    import customtkinter as ctk
     splash = ctk.CTkToplevel(master)
     splash.overrideredirect(True)
 
@@ -138,6 +133,14 @@ def warm_up(event, errors):
 #  Build and show main UI (called after warm-up)
 # ────────────────────────────────────────────────────────────
 def _build_and_show(root, splash, cancel_anim):
+    from app.ui.gui import XtractorGUI
+    from app.ui.constants import (
+        INITIAL_WIDTH, INITIAL_HEIGHT,
+        INITIAL_X_POSITION, INITIAL_Y_POSITION,
+        VERSION_TEXT
+    )
+    from app.ui.dpi_utils import apply_scaling, install_dpi_watcher
+
     # Window meta
     root.title("Xtractor " + VERSION_TEXT)
     root.geometry(f"{INITIAL_WIDTH}x{INITIAL_HEIGHT}+{INITIAL_X_POSITION}+{INITIAL_Y_POSITION}")
@@ -172,6 +175,10 @@ def _build_and_show(root, splash, cancel_anim):
 #  Program entry-point
 # ────────────────────────────────────────────────────────────
 def main():
+    import customtkinter as ctk
+    from app.ui.gui import CTkDnD   # CTkDnD ensures tkdnd is loaded
+    from app.ui.dpi_utils import init_windows_dpi_awareness, apply_scaling
+
     # A) DPI awareness BEFORE any Tk window is created
     init_windows_dpi_awareness()
 
@@ -0,0 +1,73 @@
+# tests/test_table_layout.py
+"""Learned revision-table templates on a mixed drawing set (revision sheets + covers)."""
+import pymupdf as fitz
+
+from app.services.extraction_service import _PageReader
+from app.services.table_layout import MAX_GENERATIONS, layout_key
+
+CLIP = (490, 390, 790, 490)
+ROWS = [("REV", "DESCRIPTION", "DATE"), ("A", "First issue", "2024-01-01"),
+        ("B", "Second issue", "2024-02-01"), ("C", "Third issue", "2024-03-01")]
+
+
+def _revision_sheet(doc, cols=(500, 540, 700, 780), order=(0, 1, 2)):
+    page = doc.new_page(width=842, height=595)
+    y0 = 400
+    for i, row in enumerate(ROWS):
+        for j, text in enumerate(row[k] for k in order):
+            page.insert_text((cols[j] + 3, y0 + i * 20 + 14), text, fontsize=9)
+    for i in range(len(ROWS) + 1):
+        page.draw_line((cols[0], y0 + i * 20), (cols[-1], y0 + i * 20))
+    for x in cols:
+        page.draw_line((x, y0), (x, y0 + 20 * len(ROWS)))
+
+
+def _cover_sheet(doc):
+    # same size, nothing in the revision clip
+    page = doc.new_page(width=842, height=595)
+    page.insert_text((100, 100), "COVER SHEET", fontsize=24)
+
+
+def _read_all(tmp_path, build):
+    doc = fitz.open()
+    build(doc)
+    pdf_path = tmp_path / "set.pdf"
+    doc.save(pdf_path)
+    req = {"areas_rects": [], "rev_area_rect": CLIP, "rev_regex": r"^[A-Z]\d{0,2}[a-zA-Z]?$",
+           "ocr_mode": "Default", "ocr_dpi": 150, "ocr_tess": None}
+    reader = _PageReader(req, tmp_path, pdf_path)
+    out = []
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            out.append(reader.read_revisions(page, tuple(page.rect), page.rotation))
+    key = layout_key((0, 0, 842, 595), 0, CLIP)
+    return out, reader.layouts._slot(key)
+
+
+def test_cover_sheets_keep_the_template(tmp_path):
+    kinds = "RRCRCCCCRCR"
+
+    def build(doc):
+        for k in kinds:
+            _revision_sheet(doc) if k == "R" else _cover_sheet(doc)
+
+    revisions, slot = _read_all(tmp_path, build)
+    for k, revs in zip(kinds, revisions):
+        if k == "R":
+            assert [r["rev"] for r in revs] == ["C", "B", "A"]
+        else:
+            assert revs == []
+    assert slot["layout"] is not None
+    assert slot["gen"] == 0
+
+
+def test_other_columns_drop_the_template(tmp_path):
+    def build(doc):
+        _revision_sheet(doc)
+        _revision_sheet(doc)
+        _revision_sheet(doc, cols=(500, 660, 700, 780), order=(1, 0, 2))
+
+    revisions, slot = _read_all(tmp_path, build)
+    assert [r["rev"] for r in revisions[2]] == ["C", "B", "A"]
+    assert slot["layout"] is None
+    assert 0 < slot["gen"] < MAX_GENERATIONS